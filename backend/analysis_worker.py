@@ -0,0 +1,292 @@
+"""
+🔮 ANALYSIS WORKER - BACKGROUND REFRESHES, STALE-WHILE-REVALIDATE SERVING
+One thread computes analyses; requests always read the last finished snapshot
+"""
+
+import uuid
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+from metrics import metrics, SamplingProfiler
+
+# Derived views kept per snapshot; least recently used ones are dropped (and rebuilt if needed again)
+MAX_DERIVED_VIEWS = 256
+
+class AnalysisSnapshot:
+    """A finished analysis; never modified once published"""
+    
+    def __init__(self, version: int, analysis: Dict, job_id: str, created_at: str = None, restored: bool = False):
+        self.version = version
+        self.analysis = analysis
+        self.job_id = job_id
+        self.created_at = created_at or now_iso()
+        # Loaded from disk at start-up rather than computed by this process
+        self.restored = restored
+        self._derived = OrderedDict()
+        self._derived_lock = threading.Lock()
+        # One lock per view being built, so only callers of the same key wait for each other
+        self._building = {}
+    
+    def derived(self, key: str, build: Callable[[Dict], Any]) -> Any:
+        """
+        A view of this snapshot (index, encoded response, ...) built on first use.
+        
+        Views live and die with their snapshot, so they never need
+        invalidating; concurrent first uses of a key build it only once,
+        and builds of different keys run side by side. At most
+        MAX_DERIVED_VIEWS are kept, so parameterized views can't grow
+        without bound.
+        """
+        view = self._derived.get(key)
+        building = None
+        if view is None:
+            with self._derived_lock:
+                view = self._derived.get(key)
+                building = self._building.setdefault(key, threading.Lock()) if view is None else None
+        if building is not None:
+            with building:
+                view = self._derived.get(key)
+                if view is None:
+                    metrics.inc('cache_misses_total', cache='snapshot_view')
+                    try:
+                        view = build(self.analysis)
+                    finally:
+                        with self._derived_lock:
+                            if view is not None:
+                                self._derived[key] = view
+                                while len(self._derived) > MAX_DERIVED_VIEWS:
+                                    self._derived.popitem(last=False)
+                                    metrics.inc('cache_evictions_total', cache='snapshot_view')
+                            self._building.pop(key, None)
+                    return view
+        try:
+            self._derived.move_to_end(key)
+        except KeyError:
+            pass  # evicted by a concurrent build; the view we hold is still valid
+        metrics.inc('cache_hits_total', cache='snapshot_view')
+        return view
+
+class AnalysisWorker:
+    """
+    Runs analysis jobs on a single background thread.
+    
+    Jobs are single-flight: while a job is queued, further submissions
+    join it instead of starting another upstream fetch (a full rebuild
+    absorbs an incremental refresh). A submission that arrives while a job
+    is already running queues exactly one follow-up, so data published
+    after the running fetch began is still picked up.
+    
+    Readers never wait for a job: they get the last published snapshot,
+    and a new snapshot replaces it with one reference assignment.
+    
+    A job submitted with profile=True runs under a SamplingProfiler; its
+    collapsed stacks are kept for as long as the job itself.
+    
+    With a `restore` callable, the snapshot a previous process saved is
+    served (once loaded, on start-up or on the first read) until the
+    first job of this process publishes a fresh one.
+    """
+    
+    def __init__(self, compute: Callable[[str], Dict], prepare: Callable[[AnalysisSnapshot], None] = None,
+                 on_publish: Callable[[AnalysisSnapshot, AnalysisSnapshot], None] = None, job_history: int = 50,
+                 restore: Callable[[], AnalysisSnapshot] = None):
+        # compute(kind) -> analysis dict, or None when fetching/analysis failed
+        self.compute = compute
+        # prepare(snapshot) builds derived views before the snapshot goes live
+        self.prepare = prepare
+        # on_publish(previous, snapshot) is told about each new snapshot once it is live
+        self.on_publish = on_publish
+        # restore() -> the saved snapshot, or None
+        self.restore = restore
+        self.job_history = job_history
+        self.snapshot = None
+        self.jobs = {}
+        self.profiles = {}
+        self._queued = None
+        self._running = None
+        self._last_finished = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread = None
+        self._restored = restore is None
+        self._restore_lock = threading.Lock()
+    
+    def submit(self, kind: str = 'incremental', profile: bool = False) -> Dict:
+        """Request an analysis ('incremental' or 'full'); returns the job that will serve it"""
+        with self._lock:
+            job = self._queued
+            if job is None:
+                job = self._new_job(kind)
+                self._queued = job
+                self._changed.notify_all()
+            elif kind == 'full':
+                job['kind'] = 'full'
+            if profile:
+                job['profile'] = True
+            
+            self._start_thread()
+            return dict(job)
+    
+    def ensure_snapshot(self) -> AnalysisSnapshot:
+        """
+        The current snapshot; with none yet, makes sure a job is on its way and returns None.
+        
+        A restored snapshot is returned as well, but the first read of one
+        also makes sure this process computes a fresh analysis.
+        """
+        snapshot = self.snapshot
+        if snapshot is None and not self._restored:
+            snapshot = self.restore_saved()
+        if snapshot is None or snapshot.restored:
+            with self._lock:
+                in_flight = self._queued is not None or self._running is not None
+                refreshed = self._last_finished is not None
+            if not in_flight and (snapshot is None or not refreshed):
+                self.submit()
+        return snapshot
+    
+    def restore_saved(self) -> AnalysisSnapshot:
+        """Load the saved snapshot and serve it until a job publishes (tried only once)"""
+        with self._restore_lock:
+            if self._restored:
+                return self.snapshot
+            try:
+                snapshot = self.restore()
+            except Exception as e:
+                print(f"⚠️  Could not restore the saved snapshot: {type(e).__name__}: {e}")
+                snapshot = None
+            
+            with self._lock:
+                self._restored = True
+                # A job may have published while the saved snapshot was loading
+                if snapshot is not None and self.snapshot is None:
+                    self.snapshot = snapshot
+                    print(f"💾 Serving saved snapshot {snapshot.version} ({snapshot.created_at})")
+                return self.snapshot
+    
+    def job(self, job_id: str) -> Dict:
+        """Status of one job (None if unknown or long gone)"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def profile(self, job_id: str) -> str:
+        """Collapsed stacks of a profiled job (None until it has finished)"""
+        with self._lock:
+            return self.profiles.get(job_id)
+    
+    def in_flight(self) -> Dict:
+        """The job the next snapshot will come from, if any"""
+        with self._lock:
+            job = self._queued or self._running
+            return dict(job) if job else None
+    
+    def wait(self, job_id: str, timeout: float = None) -> Dict:
+        """Block until a job has finished (or timeout); returns its status"""
+        with self._lock:
+            self._changed.wait_for(lambda: self.jobs.get(job_id, {}).get('status') in ('done', 'failed', None),
+                                   timeout)
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def status(self) -> Dict:
+        """Snapshot version plus the running, queued and last finished jobs"""
+        snapshot = self.snapshot
+        with self._lock:
+            return {
+                'snapshot_version': snapshot.version if snapshot else None,
+                'snapshot_created_at': snapshot.created_at if snapshot else None,
+                'snapshot_restored': snapshot.restored if snapshot else False,
+                'running_job': dict(self._running) if self._running else None,
+                'queued_job': dict(self._queued) if self._queued else None,
+                'last_finished_job': dict(self._last_finished) if self._last_finished else None
+            }
+    
+    def _new_job(self, kind: str) -> Dict:
+        job = {
+            'job_id': uuid.uuid4().hex[:12],
+            'kind': kind,
+            'status': 'queued',
+            'submitted_at': now_iso(),
+            'started_at': None,
+            'finished_at': None,
+            'snapshot_version': None,
+            'error': None,
+            'profile': False
+        }
+        self.jobs[job['job_id']] = job
+        
+        # Forget the oldest finished jobs (dicts keep insertion order)
+        while len(self.jobs) > self.job_history:
+            oldest = next(iter(self.jobs))
+            if self.jobs[oldest]['status'] in ('queued', 'running'):
+                break
+            del self.jobs[oldest]
+            self.profiles.pop(oldest, None)
+        return job
+    
+    def _start_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='analysis-worker', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                self._changed.wait_for(lambda: self._queued is not None)
+                job, self._queued = self._queued, None
+                self._running = job
+                job['status'] = 'running'
+                job['started_at'] = now_iso()
+                kind = job['kind']
+                profiler = SamplingProfiler().start() if job['profile'] else None
+            
+            print(f"⚙️  Analysis job {job['job_id']} ({kind}) started")
+            error = None
+            snapshot = None
+            try:
+                with metrics.stage('analysis'):
+                    analysis = self.compute(kind)
+                    if analysis is None:
+                        error = 'Failed to fetch or analyze data'
+                    else:
+                        version = self.snapshot.version + 1 if self.snapshot else 1
+                        snapshot = AnalysisSnapshot(version, analysis, job['job_id'])
+                        if self.prepare is not None:
+                            with metrics.stage('prepare'):
+                                self.prepare(snapshot)
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+            
+            stacks = profiler.stop() if profiler is not None else None
+            metrics.inc('analysis_jobs_total', kind=kind, status='failed' if error else 'done')
+            
+            with self._lock:
+                if stacks is not None:
+                    self.profiles[job['job_id']] = stacks
+                previous = self.snapshot
+                if error is None:
+                    self.snapshot = snapshot
+                    job['status'] = 'done'
+                    job['snapshot_version'] = snapshot.version
+                else:
+                    job['status'] = 'failed'
+                    job['error'] = error
+                job['finished_at'] = now_iso()
+                self._running = None
+                self._last_finished = job
+                self._changed.notify_all()
+            
+            if error is None:
+                print(f"✅ Analysis job {job['job_id']} published snapshot {job['snapshot_version']}")
+                if self.on_publish is not None:
+                    try:
+                        self.on_publish(previous, snapshot)
+                    except Exception as e:
+                        print(f"⚠️  Publish hook failed: {type(e).__name__}: {e}")
+            else:
+                print(f"❌ Analysis job {job['job_id']} failed: {error}")
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
@@ -3,39 +3,85 @@
 This serves the fraud detection results to the frontend dashboard
 """
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, redirect
 from flask_cors import CORS
-import requests
 import json
-from fraud_detector import FraudDetector
-from data_processor import DataProcessor
+import os
+from analysis_worker import AnalysisWorker
+from snapshot_store import SnapshotStore
+from encoded_response import EncodedResponse
+from event_stream import EventBroker, analysis_deltas
+from metrics import metrics, env_enabled, StartupClock
+
+# NumPy and the analysis modules (fraud_detector, data_processor, upstream,
+# history_cache, ticket_index, trust_scores) are imported where they are first
+# used, so the server is up and serving the saved snapshot before they load
 
 app = Flask(__name__)
 CORS(app)  # Allow frontend to access API
 
 # API Configuration
-BASE_URL = "https://hackutd2025.eog.systems"
-CACHE_FILE = "cached_data.json"
+# (point TRUTH_SERUM_API_URL at fixture_server.py to work offline)
+BASE_URL = os.environ.get('TRUTH_SERUM_API_URL', "https://hackutd2025.eog.systems")
+CACHE_DIR = os.environ.get('TRUTH_SERUM_CACHE_DIR', "cache")
+
+# Server-sent events (/api/stream) are served by an asyncio server on their own port
+STREAM_PORT = int(os.environ.get('TRUTH_SERUM_STREAM_PORT', "5001"))
+
+# Processes used to validate tickets on a full analysis (1 = in-process)
+ANALYSIS_WORKERS = int(os.environ.get('TRUTH_SERUM_WORKERS', "1"))
+
+# Serve the last saved analysis right after a restart (TRUTH_SERUM_FAST_START=off waits for a fresh one)
+FAST_START = env_enabled('TRUTH_SERUM_FAST_START')
+
+# Seconds from process start to imports done, snapshot restored, first answer and first fresh analysis
+startup = StartupClock(metrics)
+
+# Windowed, concurrent fetches over one pooled HTTP session (see get_upstream)
+upstream = None
+
+# Persistent columnar copy of everything fetched so far (see get_history_cache)
+history_cache = None
+
+# The last published analysis, kept on disk for fast starts
+snapshot_store = SnapshotStore(os.path.join(CACHE_DIR, 'snapshot'))
 
-# Global cache for data (so we don't spam the API)
-cached_analysis = None
+# Incremental refresh state: the detector behind the latest snapshot plus
+# high-water marks of what it has already processed (worker thread only)
+detector = None
+processed_ticket_ids = set()
 
-def fetch_data_from_api():
-    """Fetch all required data from HackUTD API"""
+def get_upstream():
+    """The upstream client, created on first use"""
+    global upstream
+    if upstream is None:
+        from upstream import UpstreamClient
+        upstream = UpstreamClient(BASE_URL)
+    return upstream
+
+def get_history_cache():
+    """The on-disk history cache, created on first use"""
+    global history_cache
+    if history_cache is None:
+        from history_cache import HistoryCache
+        history_cache = HistoryCache(CACHE_DIR)
+    return history_cache
+
+def fetch_data_from_api(start_date: int = 0, cauldron_ids=None):
+    """
+    Fetch all required data from HackUTD API (samples from start_date onwards).
+    
+    The history is fetched as concurrent time windows, in parallel with the
+    tickets, and each /api/Data response is streamed straight into columns
+    (in `cauldron_ids` order, or the order of the first sample).
+    """
     print("📡 Fetching data from HackUTD API...")
     
     try:
-        # Fetch historical cauldron data
-        data_response = requests.get(f"{BASE_URL}/api/Data/?start_date=0&end_date=2000000000")
-        data_response.raise_for_status()
-        historical_data = data_response.json()
-        print(f"✅ Fetched {len(historical_data)} historical data points")
-        
-        # Fetch tickets
-        tickets_response = requests.get(f"{BASE_URL}/api/Tickets")
-        tickets_response.raise_for_status()
-        tickets_data = tickets_response.json()
-        tickets = tickets_data['transport_tickets']
+        fetched = get_upstream().fetch(start_date, cauldron_ids)
+        history = fetched['history']
+        tickets = fetched['tickets']
+        print(f"✅ Fetched {len(history)} historical data points")
         print(f"✅ Fetched {len(tickets)} tickets")
         
         # Fetch background data (cauldrons, witches, network)
@@ -44,7 +90,7 @@ def fetch_data_from_api():
         print(f"✅ Loaded background data")
         
         return {
-            'historical_data': historical_data,
+            'history': history,
             'tickets': tickets,
             'background': background_data
         }
@@ -53,43 +99,350 @@ def fetch_data_from_api():
         print(f"❌ Error fetching data: {e}")
         return None
 
+def compute_analysis(kind: str):
+    """
+    Analysis job body, run on the worker thread.
+    
+    'incremental' folds new samples and tickets into the existing detector
+    (building it first if there is none); 'full' drops the detector and
+    the on-disk history cache and rebuilds everything.
+    """
+    global detector
+    
+    if kind == 'full':
+        detector = None
+        get_history_cache().clear()
+        print("🔄 Cache cleared, fetching fresh data")
+    
+    if detector is None:
+        return run_fraud_analysis()
+    return update_fraud_analysis()
+
 def run_fraud_analysis():
     """Run the complete fraud detection analysis"""
-    global cached_analysis
-    
-    # Check if we already have cached results
-    if cached_analysis is not None:
-        print("📦 Using cached analysis")
-        return cached_analysis
+    global detector, processed_ticket_ids
+    from data_processor import DataProcessor
+    from fraud_detector import FraudDetector
+    from route_optimizer import RoutingNetwork
     
     print("🔮 Running fraud detection analysis...")
     
+    # Start from the on-disk history and only fetch what's newer
+    history_cache = get_history_cache()
+    cached = history_cache.load()
+    if cached is not None:
+        print(f"💾 Loaded {len(cached['timestamps'])} cached data points")
+    metrics.inc('cache_hits_total' if cached is not None else 'cache_misses_total', cache='history')
+    
     # Fetch data
-    data = fetch_data_from_api()
+    if cached is None:
+        data = fetch_data_from_api()
+    else:
+        data = fetch_data_from_api(start_date=next_sample_time(cached['timestamps']),
+                                   cauldron_ids=cached['cauldron_ids'])
+    if data is not None and cached is not None and not cache_matches(cached, data['history']):
+        print("⚠️  Cauldron list changed upstream, re-fetching full history")
+        history_cache.clear()
+        cached = None
+        data = fetch_data_from_api()
     if data is None:
         return None
     
     # Run fraud detection
+    if cached is None:
+        history = data['history']
+        history_cache.append(*history.columns(), history.cauldron_ids or [])
+        # Analyse the cache's float32 memory map, the same data every warm start reads
+        cached = history_cache.load()
+        processor = DataProcessor.from_columns(cached['timestamps'], cached['levels'], cached['cauldron_ids'])
+    else:
+        processor = DataProcessor.from_columns(cached['timestamps'], cached['levels'], cached['cauldron_ids'])
+        append_samples(processor, data['history'])
+    history_cache.save_tickets(data['tickets'])
+    
     detector = FraudDetector(
-        historical_data=data['historical_data'],
-        tickets=data['tickets']
+        historical_data=[],
+        tickets=data['tickets'],
+        processor=processor,
+        network=RoutingNetwork(data['background'])
     )
+    processed_ticket_ids = {ticket['ticket_id'] for ticket in data['tickets']}
     
-    analysis = detector.analyze_all_tickets()
+    analysis = detector.analyze_all_tickets(workers=ANALYSIS_WORKERS)
     
     # Add background data to analysis
     analysis['background'] = data['background']
     
-    # Cache the results
-    cached_analysis = analysis
-    
     print("✅ Fraud analysis complete!")
+    print_summary(analysis)
+    
+    return analysis
+
+def update_fraud_analysis():
+    """Fetch only samples and tickets newer than the last analysis and fold them in"""
+    print("🔮 Updating fraud detection analysis...")
+    
+    data = fetch_data_from_api(start_date=next_sample_time(detector.processor.timestamps),
+                               cauldron_ids=detector.processor.cauldron_ids)
+    if data is None:
+        return None
+    get_history_cache().save_tickets(data['tickets'])
+    
+    new_tickets = [ticket for ticket in data['tickets'] if ticket['ticket_id'] not in processed_ticket_ids]
+    processed_ticket_ids.update(ticket['ticket_id'] for ticket in new_tickets)
+    print(f"   {len(data['history'])} new data points, {len(new_tickets)} new tickets")
+    
+    changed_days = append_samples(detector.processor, data['history'])
+    analysis = detector.apply_changes(changed_days, new_tickets)
+    analysis['background'] = data['background']
+    
+    print("✅ Fraud analysis updated!")
+    print_summary(analysis)
+    
+    return analysis
+
+def next_sample_time(timestamps) -> int:
+    """High-water mark: epoch seconds of the first whole minute after the newest sample"""
+    return int(timestamps[-1] + 1) * 60 if len(timestamps) else 0
+
+def cache_matches(cached, history) -> bool:
+    """Whether freshly fetched samples still have the cached cauldron columns"""
+    if history.sample_cauldron_ids is None:
+        return True
+    return set(history.sample_cauldron_ids) == set(cached['cauldron_ids'])
+
+def append_samples(processor, history) -> set:
+    """Append streamed samples to the processor's store and to the on-disk cache"""
+    if len(history) == 0:
+        return set()
+    if not processor.cauldron_ids:
+        processor.cauldron_ids = list(history.cauldron_ids)
+    
+    timestamps, levels = history.columns()
+    if len(processor.timestamps):
+        newer = timestamps > processor.timestamps[-1]
+        timestamps, levels = timestamps[newer], levels[newer]
+    
+    history_cache = get_history_cache()
+    history_cache.append(timestamps, levels, processor.cauldron_ids)
+    
+    # A memory-mapped store grows by re-mapping the cache files, never by copying
+    combined = None
+    if processor.windowed:
+        cached = history_cache.load()
+        combined = (cached['timestamps'], cached['levels'])
+    return processor.append_columns(timestamps, levels, combined)
+
+def print_summary(analysis):
+    """Log the headline counts of an analysis"""
     print(f"   Total tickets: {analysis['summary']['total_tickets']}")
     print(f"   Valid: {analysis['summary']['valid_count']}")
     print(f"   Suspicious: {analysis['summary']['suspicious_count']}")
     print(f"   Fraudulent: {analysis['summary']['fraudulent_count']}")
+
+# Top-level analysis keys the dashboard loads (tickets are paged separately)
+DASHBOARD_FIELDS = ('background', 'cauldron_fill_rates', 'summary', 'witch_trust_scores')
+
+def prepare_snapshot(snapshot):
+    """Build a new snapshot's ticket index and polled responses before it starts serving"""
+    snapshot.derived('tickets', build_ticket_index)
+    for key, build in (('summary', lambda analysis: analysis['summary']),
+                       ('witches', lambda analysis: analysis['witch_trust_scores']),
+                       ('cauldrons', build_cauldron_list),
+                       (analysis_view_key(DASHBOARD_FIELDS), lambda analysis: project(analysis, DASHBOARD_FIELDS))):
+        encoded_view(snapshot, key, build)
+
+def build_routing_network(analysis):
+    from route_optimizer import RoutingNetwork
+    with metrics.stage('routing_network'):
+        return RoutingNetwork(analysis['background'])
+
+def build_routes(analysis, network, horizon_hours: int, time_budget_ms: int):
+    """Pickup routes from the snapshot's fill rates and latest cauldron levels"""
+    from route_optimizer import optimize_routes
+    levels = analysis.get('cauldron_levels', {})
+    with metrics.stage('route_optimization'):
+        routes = optimize_routes(analysis['background'], analysis['cauldron_fill_rates'], levels.get('levels'),
+                                 horizon_hours, time_budget_ms, network=network)
+    routes['levels_as_of'] = levels.get('as_of')
+    routes['time_budget_ms'] = time_budget_ms
+    return routes
+
+def build_fleet_plan(analysis, network, horizon_hours: int):
+    """Smallest fleet (and its schedule) that keeps the snapshot's cauldrons from overflowing"""
+    from fleet_sizing import size_fleet
+    levels = analysis.get('cauldron_levels', {})
+    with metrics.stage('fleet_sizing'):
+        plan = size_fleet(analysis['background'], analysis['cauldron_fill_rates'], levels.get('levels'),
+                          horizon_hours, network=network)
+    plan['levels_as_of'] = levels.get('as_of')
+    return plan
+
+def build_forecast(analysis, horizon_hours: int):
+    """Every cauldron's projected level and overflow time for the snapshot"""
+    from forecasting import forecast_levels
+    with metrics.stage('forecasting'):
+        return forecast_levels(analysis['background']['cauldrons'], analysis.get('cauldron_levels', {}),
+                               analysis['cauldron_fill_rates'], analysis.get('cauldron_dynamics', {}), horizon_hours)
+
+def build_ticket_index(analysis):
+    from ticket_index import TicketIndex
+    with metrics.stage('ticket_index'):
+        return TicketIndex(analysis['tickets'])
+
+def build_cauldron_list(analysis):
+    """Cauldron info combined with the calculated fill rates"""
+    cauldrons = analysis['background']['cauldrons']
+    fill_rates = analysis['cauldron_fill_rates']
     
-    return analysis
+    cauldron_data = []
+    for cauldron in cauldrons:
+        cauldron_copy = cauldron.copy()
+        cauldron_copy['fill_rate'] = fill_rates.get(cauldron['id'], 0)
+        cauldron_data.append(cauldron_copy)
+    
+    return cauldron_data
+
+def analysis_view_key(fields) -> str:
+    return 'analysis:' + ','.join(fields) if fields is not None else 'analysis'
+
+def project(analysis, fields):
+    return {field: analysis[field] for field in fields}
+
+def encoded_view(snapshot, key, build) -> EncodedResponse:
+    """A snapshot's JSON response, serialized and compressed on first use only"""
+    return snapshot.derived('response:' + key, lambda analysis: EncodedResponse(build(analysis)))
+
+def announce_snapshot(previous, snapshot):
+    """Push what changed since the previous snapshot to /api/stream subscribers, then save it"""
+    startup.mark('first_analysis')
+    deltas = analysis_deltas(previous.analysis if previous else None, snapshot.analysis)
+    stream.publish(snapshot.version, snapshot.analysis['summary'], deltas)
+    if FAST_START:
+        with metrics.stage('snapshot_save'):
+            snapshot_store.save(snapshot)
+
+def restore_snapshot():
+    """The snapshot saved by the previous process (None without one)"""
+    with metrics.stage('snapshot_restore'):
+        snapshot = snapshot_store.load()
+    if snapshot is not None:
+        startup.mark('snapshot_restored')
+    return snapshot
+
+# Live deltas for dashboards and wallboards
+stream = EventBroker()
+
+# Background analysis: routes serve the last snapshot while a refresh runs
+worker = AnalysisWorker(compute_analysis, prepare=prepare_snapshot, on_publish=announce_snapshot,
+                        restore=restore_snapshot if FAST_START else None)
+
+# Read at scrape time by /api/metrics
+metrics.gauge_callback('snapshot_version', 'Version of the analysis snapshot being served',
+                       lambda: worker.snapshot.version if worker.snapshot else None)
+metrics.gauge_callback('snapshot_tickets', 'Tickets in the analysis snapshot being served',
+                       lambda: len(worker.snapshot.analysis['tickets']) if worker.snapshot else None)
+metrics.gauge_callback('history_samples', 'Samples in the analysed cauldron history',
+                       lambda: len(detector.processor.timestamps) if detector else None)
+metrics.gauge_callback('stream_subscribers', 'Connected /api/stream subscribers', lambda: len(stream.subscribers))
+
+startup.mark('imports')
+
+def current_analysis():
+    """The latest analysis snapshot, or None while the first one is being computed"""
+    snapshot = worker.ensure_snapshot()
+    return snapshot.analysis if snapshot is not None else None
+
+def query_tickets(flagged_only: bool = False):
+    """
+    One page of the latest snapshot's tickets, shaped by the query string.
+    
+    Parameters (all optional):
+        status, courier, cauldron  comma-separated values to match
+        date_from, date_to         inclusive YYYY-MM-DD range
+        q                          substring of ticket/cauldron/courier id
+        sort                       field name, '-' prefix for descending
+        fields                     comma-separated fields to return
+        page, page_size            1-based page number and its size
+    """
+    from ticket_index import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+    
+    snapshot = worker.ensure_snapshot()
+    if snapshot is None:
+        return analysis_pending()
+    
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+        if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+        
+        statuses = listed_arg('status')
+        sort = request.args.get('sort')
+        if flagged_only:
+            flagged = ('suspicious', 'fraudulent')
+            statuses = [status for status in statuses if status in flagged] if statuses else list(flagged)
+            # Same order as the flagged list in the full analysis: suspicious first
+            sort = sort or 'status'
+        descending = bool(sort) and sort.startswith('-')
+        
+        result = snapshot.derived('tickets', build_ticket_index).query(
+            statuses=statuses,
+            couriers=listed_arg('courier'),
+            cauldrons=listed_arg('cauldron'),
+            date_from=request.args.get('date_from'),
+            date_to=request.args.get('date_to'),
+            search=request.args.get('q'),
+            sort=sort.lstrip('-') if sort else None,
+            descending=descending,
+            offset=(page - 1) * page_size,
+            limit=page_size,
+            fields=listed_arg('fields')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    startup.mark('first_response')
+    return jsonify({
+        'tickets': result['tickets'],
+        'total': result['total'],
+        'page': page,
+        'page_size': page_size,
+        'pages': -(-result['total'] // page_size),
+        'status_counts': result['status_counts'],
+        'snapshot_version': snapshot.version
+    })
+
+def listed_arg(name: str):
+    """A comma-separated query parameter as a list (None when absent)"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def serve_view(key, build, snapshot=None):
+    """Serve a per-snapshot encoded response (304 when the client's ETag still matches)"""
+    snapshot = snapshot or worker.ensure_snapshot()
+    if snapshot is None:
+        return analysis_pending()
+    response = encoded_view(snapshot, key, build).response(request)
+    startup.mark('first_response')
+    return response
+
+def analysis_pending():
+    """503 answer for requests that arrive before the first analysis is ready"""
+    status = worker.status()
+    last_job = status['last_finished_job']
+    
+    response = jsonify({
+        'status': 'pending',
+        'message': 'Analysis is being computed, try again shortly',
+        'job': worker.in_flight(),
+        'last_error': last_job['error'] if last_job else None
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
 
 # API Endpoints
 
@@ -100,81 +453,222 @@ def health():
 
 @app.route('/api/analysis', methods=['GET'])
 def get_full_analysis():
-    """Get complete fraud detection analysis"""
-    analysis = run_fraud_analysis()
+    """
+    Get complete fraud detection analysis.
+    
+    ?fields=summary,witch_trust_scores,... returns only those top-level
+    keys (the dashboard skips the ticket lists and pages them instead).
+    """
+    analysis = current_analysis()
     
     if analysis is None:
-        return jsonify({'error': 'Failed to fetch or analyze data'}), 500
+        return analysis_pending()
     
-    return jsonify(analysis)
+    fields = listed_arg('fields')
+    if fields is not None:
+        unknown = [field for field in fields if field not in analysis]
+        if unknown:
+            return jsonify({'error': f"Unknown field(s): {', '.join(unknown)}"}), 400
+        # Normalized, so every spelling of a projection shares one cached response
+        fields = tuple(sorted(set(fields)))
+        return serve_view(analysis_view_key(fields), lambda analysis: project(analysis, fields))
+    
+    return serve_view(analysis_view_key(None), lambda analysis: analysis)
 
 @app.route('/api/summary', methods=['GET'])
 def get_summary():
     """Get just the summary statistics"""
-    analysis = run_fraud_analysis()
-    
-    if analysis is None:
-        return jsonify({'error': 'Failed to fetch or analyze data'}), 500
-    
-    return jsonify(analysis['summary'])
+    return serve_view('summary', lambda analysis: analysis['summary'])
 
 @app.route('/api/tickets', methods=['GET'])
 def get_tickets():
-    """Get all validated tickets"""
-    analysis = run_fraud_analysis()
-    
-    if analysis is None:
-        return jsonify({'error': 'Failed to fetch or analyze data'}), 500
-    
-    return jsonify(analysis['tickets'])
+    """Get one page of validated tickets (filters, sorting and fields: see query_tickets)"""
+    return query_tickets()
 
 @app.route('/api/flagged', methods=['GET'])
 def get_flagged_tickets():
-    """Get only suspicious and fraudulent tickets"""
-    analysis = run_fraud_analysis()
-    
-    if analysis is None:
-        return jsonify({'error': 'Failed to fetch or analyze data'}), 500
-    
-    return jsonify(analysis['flagged_tickets'])
+    """Get one page of suspicious and fraudulent tickets"""
+    return query_tickets(flagged_only=True)
 
 @app.route('/api/witches', methods=['GET'])
 def get_witch_scores():
-    """Get witch trust scores"""
-    analysis = run_fraud_analysis()
+    """
+    Get witch trust scores.
     
-    if analysis is None:
-        return jsonify({'error': 'Failed to fetch or analyze data'}), 500
+    ?window=7d|30d|90d scores only the tickets of the last 7/30/90 days
+    (up to the latest ticket day), ?window=decayed weighs every ticket
+    by its age; all-time scores by default.
+    """
+    from trust_scores import TRUST_WINDOWS
     
-    return jsonify(analysis['witch_trust_scores'])
+    window = request.args.get('window')
+    if window is None or window == 'all':
+        return serve_view('witches', lambda analysis: analysis['witch_trust_scores'])
+    if window not in TRUST_WINDOWS and window != 'decayed':
+        return jsonify({'error': f"Unknown window: {window} (use all, {', '.join(TRUST_WINDOWS)} or decayed)"}), 400
+    return serve_view('witches:' + window, lambda analysis: analysis['witch_trust_windows']['scores'][window])
 
 @app.route('/api/cauldrons', methods=['GET'])
 def get_cauldron_info():
     """Get cauldron information and fill rates"""
-    analysis = run_fraud_analysis()
+    return serve_view('cauldrons', build_cauldron_list)
+
+@app.route('/api/routes', methods=['GET'])
+def get_pickup_routes():
+    """
+    Get pickup routes that keep every cauldron below its max volume.
     
-    if analysis is None:
-        return jsonify({'error': 'Failed to fetch or analyze data'}), 500
+    ?horizon_hours= plans that many hours ahead (1-168, default 24) and
+    ?time_budget_ms= caps the route search (10-2000, default 250), snapped
+    down to one of a few budget tiers (50, 250, 1000, 2000). Each plan is
+    computed once per snapshot and served from cache after that.
+    """
+    from route_optimizer import (DEFAULT_HORIZON_HOURS, MAX_HORIZON_HOURS, DEFAULT_TIME_BUDGET_MS,
+                                 MAX_TIME_BUDGET_MS, snap_time_budget)
     
-    cauldrons = analysis['background']['cauldrons']
-    fill_rates = analysis['cauldron_fill_rates']
+    try:
+        horizon_hours = int(request.args.get('horizon_hours', DEFAULT_HORIZON_HOURS))
+        time_budget_ms = int(request.args.get('time_budget_ms', DEFAULT_TIME_BUDGET_MS))
+        if not 1 <= horizon_hours <= MAX_HORIZON_HOURS or not 10 <= time_budget_ms <= MAX_TIME_BUDGET_MS:
+            raise ValueError(f"horizon_hours must be between 1 and {MAX_HORIZON_HOURS} "
+                             f"and time_budget_ms between 10 and {MAX_TIME_BUDGET_MS}")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    time_budget_ms = snap_time_budget(time_budget_ms)
     
-    # Combine cauldron info with calculated fill rates
-    cauldron_data = []
-    for cauldron in cauldrons:
-        cauldron_copy = cauldron.copy()
-        cauldron_copy['fill_rate'] = fill_rates.get(cauldron['id'], 0)
-        cauldron_data.append(cauldron_copy)
+    snapshot = worker.ensure_snapshot()
+    if snapshot is None:
+        return analysis_pending()
+    # Shortest travel times are computed once per snapshot and shared by every plan
+    network = snapshot.derived('routing_network', build_routing_network)
+    return serve_view(f'routes:{horizon_hours}:{time_budget_ms}',
+                      lambda analysis: build_routes(analysis, network, horizon_hours, time_budget_ms), snapshot)
+
+@app.route('/api/fleet', methods=['GET'])
+def get_fleet_size():
+    """
+    Get the fewest witches that keep every cauldron below its max volume.
+    
+    ?horizon_hours= simulates that many hours ahead (1-168, default 24);
+    the answer includes the simulated schedule for that fleet.
+    """
+    from route_optimizer import DEFAULT_HORIZON_HOURS, MAX_HORIZON_HOURS
+    
+    try:
+        horizon_hours = int(request.args.get('horizon_hours', DEFAULT_HORIZON_HOURS))
+        if not 1 <= horizon_hours <= MAX_HORIZON_HOURS:
+            raise ValueError(f"horizon_hours must be between 1 and {MAX_HORIZON_HOURS}")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    snapshot = worker.ensure_snapshot()
+    if snapshot is None:
+        return analysis_pending()
+    network = snapshot.derived('routing_network', build_routing_network)
+    return serve_view(f'fleet:{horizon_hours}', lambda analysis: build_fleet_plan(analysis, network, horizon_hours),
+                      snapshot)
+
+@app.route('/api/forecast', methods=['GET'])
+def get_forecast():
+    """
+    Get every cauldron's projected level and when it will reach max volume.
+    
+    ?horizon= looks that far ahead: hours (24, 48h) or days (7d), up to
+    168 hours (default 24). Each cauldron has the expected level series
+    with a 90% band and the expected, earliest and latest overflow times.
+    """
+    from forecasting import DEFAULT_HORIZON_HOURS, parse_horizon
     
-    return jsonify(cauldron_data)
+    try:
+        horizon_hours = parse_horizon(request.args.get('horizon', DEFAULT_HORIZON_HOURS))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return serve_view(f'forecast:{horizon_hours}', lambda analysis: build_forecast(analysis, horizon_hours))
+
+@app.route('/api/stream', methods=['GET'])
+def get_event_stream():
+    """
+    Live updates as server-sent events (redirects to the stream server).
+    
+    Events: snapshot (version + summary, also sent on connect), summary,
+    witches, status (tickets whose status changed) and tickets (newly
+    validated tickets). ?flagged=true only streams non-valid tickets.
+    """
+    if not stream.running:
+        return jsonify({'error': 'Event stream is not running'}), 503
+    
+    host = request.host.rsplit(':', 1)[0]
+    query = request.query_string.decode('utf-8')
+    return redirect(f"{request.scheme}://{host}:{STREAM_PORT}/api/stream" + (f"?{query}" if query else ""), code=307)
 
 @app.route('/api/refresh', methods=['POST'])
 def refresh_data():
-    """Force refresh of data (clear cache)"""
-    global cached_analysis
-    cached_analysis = None
-    print("🔄 Cache cleared, will fetch fresh data on next request")
-    return jsonify({'message': 'Cache cleared successfully'})
+    """
+    Schedule a background refresh and return its job id immediately.
+    
+    By default only samples and tickets newer than the last analysis are
+    fetched and re-validated; POST /api/refresh?full=true also drops the
+    on-disk history cache and rebuilds everything. The previous analysis
+    keeps being served until the new one is ready.
+    
+    ?profile=true runs the job under the sampling profiler; its stacks are
+    served at profile_url once the job has finished.
+    """
+    full = request.args.get('full', 'false').lower() == 'true'
+    profile = request.args.get('profile', 'false').lower() == 'true'
+    job = worker.submit('full' if full else 'incremental', profile=profile)
+    
+    print(f"🔄 {'Full rebuild' if full else 'Refresh'} requested, job {job['job_id']}")
+    response = {
+        'message': 'Full rebuild scheduled' if full else 'Incremental refresh scheduled',
+        'job_id': job['job_id'],
+        'status_url': f"/api/jobs/{job['job_id']}"
+    }
+    if job['profile']:
+        response['profile_url'] = f"/api/jobs/{job['job_id']}/profile"
+    return jsonify(response), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Status of a refresh job (queued, running, done or failed)"""
+    job = worker.job(job_id)
+    
+    if job is None:
+        return jsonify({'error': f'Unknown job {job_id}'}), 404
+    
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/profile', methods=['GET'])
+def get_job_profile(job_id):
+    """
+    Collapsed stacks of a job run with POST /api/refresh?profile=true.
+    
+    One "thread;caller;...;callee count" line per distinct stack, ready for
+    flamegraph.pl, speedscope or inferno.
+    """
+    stacks = worker.profile(job_id)
+    
+    if stacks is None:
+        job = worker.job(job_id)
+        if job is not None and job['profile']:
+            return jsonify({'error': f"Job {job_id} is still {job['status']}"}), 409
+        return jsonify({'error': f'No profile for job {job_id}'}), 404
+    
+    return Response(stacks, mimetype='text/plain')
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Stage timings, counters and gauges in the Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled (TRUTH_SERUM_METRICS=off)'}), 404
+    
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/status', methods=['GET'])
+def get_analysis_status():
+    """Current snapshot version, the jobs in flight and the start-up milestones reached so far"""
+    return jsonify(dict(worker.status(), startup=startup.milestones))
 
 if __name__ == '__main__':
     print("\n" + "="*60)
@@ -184,5 +678,14 @@ if __name__ == '__main__':
     print("Frontend can access this API at: http://localhost:5000")
     print("="*60 + "\n")
     
+    # Start the event stream and the first analysis right away (with the
+    # debug reloader, only in the child process that actually serves requests)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        stream.start('0.0.0.0', STREAM_PORT)
+        print(f"📡 Live event stream at: http://localhost:{STREAM_PORT}/api/stream")
+        if FAST_START:
+            worker.restore_saved()
+        worker.submit()
+    
     # Run the Flask app
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,298 @@
+"""
+🔮 BENCHMARK - OFFLINE TIMINGS AT SEVERAL SCALES
+Seeded synthetic histories through DataProcessor, FraudDetector and the Flask API
+
+Usage:
+    python benchmark.py                                  # all scales, JSON on stdout
+    python benchmark.py --scales small,medium -o results.json
+    python benchmark.py --compare baseline.json results.json
+
+Every benchmark reports min/median wall time over --repeat runs, items per
+second (samples, cauldrons, drain lookups, tickets or requests) and the
+peak traced memory of one extra run under tracemalloc. No network access
+is needed: the API benchmarks run against fixture_server.py.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+import contextlib
+import numpy as np
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+from synthetic_data import generate
+from data_processor import DataProcessor
+from fraud_detector import FraudDetector
+from validation_results import VALID, FRAUDULENT
+
+SCALES = {
+    'small': {'cauldrons': 6, 'days': 3},
+    'medium': {'cauldrons': 12, 'days': 14},
+    'large': {'cauldrons': 24, 'days': 30}
+}
+
+# Requests per timed run of an endpoint benchmark
+REQUESTS_PER_RUN = 50
+
+ENDPOINTS = [
+    ('api_summary', '/api/summary'),
+    ('api_analysis', '/api/analysis'),
+    ('api_dashboard', '/api/analysis?fields=summary,witch_trust_scores,cauldron_fill_rates,background'),
+    ('api_tickets_page', '/api/tickets?page=1&page_size=50'),
+    ('api_tickets_filtered', '/api/tickets?status=fraudulent&sort=-percent_error&page_size=50'),
+    ('api_flagged', '/api/flagged?page_size=50'),
+    ('api_witches', '/api/witches'),
+    ('api_witches_30d', '/api/witches?window=30d'),
+    ('api_cauldrons', '/api/cauldrons'),
+    ('api_routes', '/api/routes'),
+    ('api_fleet', '/api/fleet'),
+    ('api_forecast', '/api/forecast')
+]
+
+def measure(name: str, run: Callable, items: int, repeat: int, setup: Callable = None) -> Dict:
+    """
+    Time run(state) `repeat` times, each on a fresh setup() state.
+    
+    Peak memory comes from one more run with tracemalloc on (kept out of
+    the timings, since tracing slows allocation-heavy code down).
+    """
+    seconds = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        run(state)
+        seconds.append(time.perf_counter() - started)
+    
+    state = setup() if setup else None
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    best = min(seconds)
+    log(f"   {name:<28} {best * 1000:10.2f} ms   {items / best if best > 0 else 0:14.1f} items/s   "
+        f"{peak / 2 ** 20:8.2f} MiB")
+    return {
+        'name': name,
+        'items': items,
+        'repeat': repeat,
+        'seconds_min': best,
+        'seconds_median': statistics.median(seconds),
+        'items_per_second': items / best if best > 0 else None,
+        'peak_memory_bytes': peak
+    }
+
+def bench_core(data: Dict, repeat: int) -> List[Dict]:
+    """DataProcessor and FraudDetector on one synthetic history"""
+    history = data['historical_data']
+    tickets = data['tickets']
+    cauldron_ids = list(history[0]['cauldron_levels'].keys())
+    dates = sorted({ticket['date'] for ticket in tickets})
+    
+    def fresh_processor():
+        return DataProcessor(history)
+    
+    def daily_drains(processor):
+        for cauldron_id in cauldron_ids:
+            for date in dates:
+                processor.get_daily_drain(cauldron_id, date)
+    
+    return [
+        measure('processor_init', lambda _: DataProcessor(history), len(history), repeat),
+        measure('calculate_fill_rate', lambda p: [p.calculate_fill_rate(c) for c in cauldron_ids],
+                len(cauldron_ids), repeat, fresh_processor),
+        measure('calculate_all_fill_rates', lambda p: p.calculate_all_fill_rates(),
+                len(cauldron_ids), repeat, fresh_processor),
+        measure('get_daily_drain', daily_drains, len(cauldron_ids) * len(dates), repeat, fresh_processor),
+        measure('fraud_detector_init', lambda _: FraudDetector(history, tickets), len(tickets), repeat),
+        measure('analyze_all_tickets', lambda d: d.analyze_all_tickets(), len(tickets), repeat,
+                lambda: FraudDetector(history, tickets))
+    ]
+
+def detection_quality(data: Dict) -> Dict:
+    """How well the detector finds the tickets the generator tampered with"""
+    analysis = FraudDetector(data['historical_data'], data['tickets']).analyze_all_tickets()
+    truth = data['truth']
+    injected = set(truth['fraudulent_ticket_ids'])
+    tampered = injected | set(truth['suspicious_ticket_ids'])
+    results = analysis['tickets']
+    ticket_ids = np.array([ticket['ticket_id'] for ticket in results.source_tickets()], dtype=object)
+    fraudulent = set(ticket_ids[results.status == FRAUDULENT])
+    flagged = set(ticket_ids[results.status != VALID])
+    
+    return {
+        'fraud_precision': len(fraudulent & injected) / len(fraudulent) if fraudulent else None,
+        'fraud_recall': len(fraudulent & injected) / len(injected) if injected else None,
+        'flagged_precision': len(flagged & tampered) / len(flagged) if flagged else None,
+        'flagged_recall': len(flagged & tampered) / len(tampered) if tampered else None,
+        'fill_rate_max_abs_error': max(abs(analysis['cauldron_fill_rates'][c] - rate)
+                                       for c, rate in truth['fill_rates'].items())
+    }
+
+def bench_api(data: Dict, repeat: int, cache_dir: str) -> List[Dict]:
+    """Cold analysis through the background worker, then every polled endpoint"""
+    from fixture_server import serve
+    
+    os.environ['TRUTH_SERUM_CACHE_DIR'] = cache_dir
+    import api
+    
+    server = serve({'historical_data': data['historical_data'], 'tickets': data['tickets']}, background=True)
+    upstream = api.get_upstream()
+    upstream.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = api.app.test_client()
+    
+    def full_analysis(_):
+        job = api.worker.submit('full')
+        status = api.worker.wait(job['job_id'])
+        if status['status'] != 'done':
+            raise RuntimeError(f"Analysis job failed: {status['error']}")
+    
+    def poll(path, headers=None):
+        def run(_):
+            for _ in range(REQUESTS_PER_RUN):
+                response = client.get(path, headers=headers)
+                if response.status_code not in (200, 304):
+                    raise RuntimeError(f"{path} answered {response.status_code}")
+        return run
+    
+    try:
+        results = [measure('api_full_analysis', full_analysis, len(data['tickets']), repeat)]
+        for name, path in ENDPOINTS:
+            results.append(measure(name, poll(path), REQUESTS_PER_RUN, repeat))
+        
+        etag = client.get('/api/analysis').headers['ETag']
+        results.append(measure('api_analysis_not_modified', poll('/api/analysis', {'If-None-Match': etag}),
+                               REQUESTS_PER_RUN, repeat))
+        gzip_headers = {'Accept-Encoding': 'gzip'}
+        results.append(measure('api_analysis_gzip', poll('/api/analysis', gzip_headers), REQUESTS_PER_RUN, repeat))
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def run_benchmarks(scales: List[str], repeat: int, seed: int, include_api: bool) -> Dict:
+    results = {'meta': environment(seed, repeat), 'scales': {}}
+    cache_dir = tempfile.mkdtemp(prefix='truth-serum-bench-')
+    
+    try:
+        for scale in scales:
+            params = SCALES[scale]
+            started = time.perf_counter()
+            data = generate(seed=seed, **params)
+            generate_seconds = time.perf_counter() - started
+            
+            log(f"📏 {scale}: {params['cauldrons']} cauldrons × {params['days']} days = "
+                f"{len(data['historical_data'])} samples, {len(data['tickets'])} tickets")
+            
+            # The backend logs every step with print(); keep stdout for the results
+            with contextlib.redirect_stdout(io.StringIO()):
+                benchmarks = bench_core(data, repeat)
+                quality = detection_quality(data)
+                if include_api:
+                    benchmarks += bench_api(data, repeat, cache_dir)
+            
+            results['scales'][scale] = {
+                'params': params,
+                'samples': len(data['historical_data']),
+                'tickets': len(data['tickets']),
+                'generate_seconds': generate_seconds,
+                'detection': quality,
+                'benchmarks': {benchmark['name']: benchmark for benchmark in benchmarks}
+            }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    
+    return results
+
+def environment(seed: int, repeat: int) -> Dict:
+    """Where and on what the results were measured"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'repeat': repeat
+    }
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> List[Dict]:
+    """Benchmarks present in both result files whose time or memory grew by more than `tolerance`"""
+    regressions = []
+    for scale, scale_results in current['scales'].items():
+        old_scale = baseline['scales'].get(scale)
+        if old_scale is None:
+            continue
+        
+        for name, result in scale_results['benchmarks'].items():
+            old = old_scale['benchmarks'].get(name)
+            if old is None:
+                continue
+            
+            time_ratio = result['seconds_min'] / old['seconds_min'] if old['seconds_min'] else None
+            memory_ratio = (result['peak_memory_bytes'] / old['peak_memory_bytes']
+                            if old['peak_memory_bytes'] else None)
+            regressed = ((time_ratio is not None and time_ratio > 1 + tolerance) or
+                         (memory_ratio is not None and memory_ratio > 1 + tolerance))
+            
+            marker = '🚨' if regressed else '  '
+            print(f"{marker} {scale:<7} {name:<28} time ×{time_ratio or 0:6.2f}   memory ×{memory_ratio or 0:6.2f}")
+            if regressed:
+                regressions.append({'scale': scale, 'name': name, 'time_ratio': time_ratio,
+                                    'memory_ratio': memory_ratio})
+    return regressions
+
+def log(message: str):
+    """Progress goes to stderr so stdout stays valid JSON"""
+    print(message, file=sys.stderr)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument('--scales', default=','.join(SCALES), help=f"comma-separated subset of {', '.join(SCALES)}")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-api', action='store_true', help="skip the Flask endpoint benchmarks")
+    parser.add_argument('-o', '--output', help="write the JSON results here instead of stdout")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="compare two result files and exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown/growth for --compare")
+    args = parser.parse_args()
+    
+    if args.compare:
+        with open(args.compare[0], 'r') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], 'r') as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        sys.exit(1 if regressions else 0)
+    
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    
+    results = run_benchmarks(scales, args.repeat, args.seed, include_api=not args.no_api)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        log(f"✅ Results written to {args.output}")
+    else:
+        print(output)
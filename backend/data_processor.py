@@ -3,119 +3,595 @@
 Find the ACTUAL daily drain, don't search for one that fits the report
 """
 
+import warnings
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, List
+from collections import defaultdict
+from metrics import metrics
+from fill_rate_model import FillRateTimeline
+
+MINUTES_PER_DAY = 1440
+EPOCH_DATE = datetime(1970, 1, 1).date()
+
+# Drain segmentation tuning
+DRAIN_SLOPE_THRESHOLD = 0.0   # units/min; a step falling faster than this is draining
+DRAIN_GAP_MINUTES = 5         # filling blips this short don't end a drain
+MIN_DRAIN_AMOUNT = 15         # smaller drops are sensor noise, not a witch
+
+# Recent history that drain cadence (interval and amount between drains) is measured over
+CADENCE_DAYS = 14
+
+# Working-memory budget for full-history passes over a memory-mapped matrix
+FILL_RATE_BLOCK_BYTES = 256 * 1024 * 1024
+
+def parse_timestamp(timestamp: str) -> datetime:
+    """Parse an API timestamp ('...Z' or '+00:00') into an aware UTC datetime"""
+    parsed = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def to_epoch_minute(timestamp: str) -> int:
+    """Convert an API timestamp to whole minutes since the Unix epoch"""
+    return int(parse_timestamp(timestamp).timestamp()) // 60
+
+def date_to_day(date_str: str) -> int:
+    """Convert a ticket date ('2025-10-30') to days since the Unix epoch"""
+    return (datetime.fromisoformat(date_str).date() - EPOCH_DATE).days
+
+def from_epoch_minute(minute: int) -> datetime:
+    """Convert epoch minutes back into an aware UTC datetime"""
+    return datetime.fromtimestamp(int(minute) * 60, tz=timezone.utc)
+
+def find_drain_runs(timestamps: np.ndarray, levels: np.ndarray) -> tuple:
+    """
+    Candidate drain intervals of one level series, as (start_rows, end_rows).
+    
+    A two-state (filling / draining) machine run over the whole series at
+    once: falling steps open or extend a drain, filling gaps longer than
+    DRAIN_GAP_MINUTES close it. Linear in the number of samples.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    levels = np.asarray(levels, dtype=np.float64)
+    if len(levels) < 2:
+        return empty, empty
+    
+    time_diff = np.diff(timestamps)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = np.diff(levels) / time_diff
+    draining = (time_diff > 0) & (slopes < -DRAIN_SLOPE_THRESHOLD)
+    
+    # Runs of draining steps: step i goes from row i to row i + 1
+    edges = np.diff(np.concatenate(([0], draining.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return empty, empty
+    
+    # Bridge short filling blips between consecutive runs
+    gaps = timestamps[starts[1:]] - timestamps[ends[:-1]]
+    closes = gaps > DRAIN_GAP_MINUTES
+    starts = starts[np.concatenate(([True], closes))]
+    ends = ends[np.concatenate((closes, [True]))]
+    
+    return starts, ends
+
+def segment_drains(timestamps: np.ndarray, levels: np.ndarray, cauldron_id: str) -> List[Dict]:
+    """Find every significant drain event in one cauldron's level series"""
+    levels = np.asarray(levels, dtype=np.float64)
+    starts, ends = find_drain_runs(timestamps, levels)
+    
+    amounts = levels[starts] - levels[ends]
+    significant = amounts >= MIN_DRAIN_AMOUNT
+    
+    events = []
+    for start, end in zip(starts[significant], ends[significant]):
+        start_minute = int(timestamps[start])
+        end_minute = int(timestamps[end])
+        events.append({
+            'cauldron_id': cauldron_id,
+            'start_time': from_epoch_minute(start_minute),
+            'end_time': from_epoch_minute(end_minute),
+            'start_minute': start_minute,
+            'end_minute': end_minute,
+            'start_level': float(levels[start]),
+            'end_level': float(levels[end]),
+            'drain_amount': float(levels[start] - levels[end]),
+            'duration_minutes': float(end_minute - start_minute)
+        })
+    
+    return events
+
+def samples_to_columns(historical_data: List[Dict], cauldron_ids: List[str]) -> tuple:
+    """Parse raw API samples into sorted (timestamps, levels) arrays"""
+    timestamps = np.fromiter(
+        (to_epoch_minute(entry['timestamp']) for entry in historical_data),
+        dtype=np.int64,
+        count=len(historical_data)
+    )
+    levels = np.zeros((len(historical_data), len(cauldron_ids)), dtype=np.float64)
+    for row, entry in enumerate(historical_data):
+        cauldron_levels = entry['cauldron_levels']
+        levels[row] = [cauldron_levels.get(cauldron_id, 0) for cauldron_id in cauldron_ids]
+    
+    # Keep the timeline sorted (stable, so equal timestamps keep API order)
+    order = np.argsort(timestamps, kind='stable')
+    return timestamps[order], levels[order]
 
 class DataProcessor:
     """Processes cauldron level data to find patterns and drain events"""
     
     def __init__(self, historical_data: List[Dict]):
-        self.data = historical_data
-        self.cauldron_ids = list(historical_data[0]['cauldron_levels'].keys()) if historical_data else []
+        cauldron_ids = list(historical_data[0]['cauldron_levels'].keys()) if historical_data else []
+        self._load_columns(*samples_to_columns(historical_data, cauldron_ids), cauldron_ids)
+        
+    @classmethod
+    def from_columns(cls, timestamps: np.ndarray, levels: np.ndarray, cauldron_ids: List[str],
+                     windowed: bool = None) -> 'DataProcessor':
+        """
+        Build a processor straight from sorted columnar arrays (e.g. the on-disk cache).
+        
+        With windowed=True (the default for np.memmap levels) the arrays are
+        never loaded as a whole: drain events are segmented per requested day
+        from a few days of rows, and full-history passes such as fill-rate
+        estimation walk the matrix in bounded column blocks. That lets
+        multi-year archives larger than RAM be analysed.
+        """
+        processor = cls.__new__(cls)
+        processor._load_columns(timestamps, levels, cauldron_ids, windowed)
+        return processor
+        
+    def _load_columns(self, timestamps: np.ndarray, levels: np.ndarray, cauldron_ids: List[str],
+                      windowed: bool = None):
+        self.cauldron_ids = list(cauldron_ids)
+        
+        # Columnar store: parse every timestamp ONCE, then work on arrays
+        #   timestamps -> int64 epoch minutes, shape (samples,)
+        #   levels     -> float64 in memory or float32 memory-mapped, shape (samples, cauldrons)
+        self.cauldron_index = {cauldron_id: col for col, cauldron_id in enumerate(self.cauldron_ids)}
+        self.timestamps = timestamps
+        self.levels = levels
+        self.windowed = isinstance(levels, np.memmap) if windowed is None else windowed
+        
+        # Day-partition index: epoch day -> (start, end) row slice of the timeline
+        self.day_index = self._build_day_index(self.timestamps)
+        
+        # Drain events are segmented lazily, once, for all cauldrons
+        self._drain_events = None
+        self._drain_events_by_day = None
+        
+        # Windowed mode: drain events segmented on demand, keyed by (cauldron_id, epoch day)
+        self._day_events_cache = {}
+        
+        # Change-point fill-rate timelines, built on first use, and the row each has been fed up to
+        self._fill_rate_timelines = {}
+        self._fill_rate_cursors = {}
+        
+        # Memoized daily drains, keyed by (cauldron_id, epoch day)
+        self._daily_drain_cache = {}
+        # Lookups that had to build a daily drain (callers export hits/misses per batch)
+        self.daily_drain_misses = 0
+        
+    def append(self, historical_data: List[Dict]) -> set:
+        """
+        Append samples newer than the last stored one and update indexes in place.
+        
+        Only the tail of each cauldron's series is re-segmented, so the cost
+        depends on the size of the delta, not on the length of the history.
+        Returns the (cauldron_id, epoch day) groups whose drain events changed.
+        """
+        if not historical_data:
+            return set()
+        
+        if not self.cauldron_ids:
+            self.cauldron_ids = list(historical_data[0]['cauldron_levels'].keys())
+        return self.append_columns(*samples_to_columns(historical_data, self.cauldron_ids))
+        
+    def append_columns(self, timestamps: np.ndarray, levels: np.ndarray, combined: tuple = None) -> set:
+        """
+        Columnar version of append(): sorted timestamps plus matching level rows.
+        
+        `combined` may hold the already-extended (timestamps, levels) arrays -
+        e.g. the cache files re-mapped after appending to them - to use
+        instead of concatenating in memory.
+        """
+        if len(self.timestamps) == 0:
+            if combined is not None:
+                timestamps, levels = combined
+            self._load_columns(timestamps, levels, self.cauldron_ids, self.windowed)
+            if self.windowed:
+                return {(cauldron_id, day) for cauldron_id in self.cauldron_ids for day in self.day_index}
+            self.detect_all_drain_events()
+            return set(self._drain_events_by_day)
+        
+        newer = timestamps > self.timestamps[-1]
+        timestamps, levels = timestamps[newer], levels[newer]
+        if len(timestamps) == 0:
+            return set()
+        
+        old_count = len(self.timestamps)
+        if combined is not None:
+            self.timestamps, self.levels = combined
+        else:
+            self.timestamps = np.concatenate((self.timestamps, timestamps))
+            self.levels = np.concatenate((self.levels, levels))
+        
+        # The last stored day may continue into the delta; new days are appended
+        for day, (start, end) in self._build_day_index(timestamps).items():
+            first = self.day_index[day][0] if day in self.day_index else start + old_count
+            self.day_index[day] = (first, end + old_count)
+        
+        affected = set()
+        if self._drain_events is not None:
+            with metrics.stage('drain_detection'):
+                for cauldron_id, col in self.cauldron_index.items():
+                    affected |= self._resegment_tail(cauldron_id, col, old_count)
+        elif self._day_events_cache:
+            for cauldron_id, col in self.cauldron_index.items():
+                affected |= self._invalidate_tail_days(cauldron_id, col, old_count)
+        
+        # Only the rows past each timeline's cursor go through the change-point
+        # detector; days from the earliest rate it revised onwards need their
+        # expected amounts redone
+        for cauldron_id, changed in self._advance_fill_rate_timelines(list(self._fill_rate_timelines)).items():
+            affected |= {(cauldron_id, day) for day in self.day_index if day >= changed // MINUTES_PER_DAY}
+        
+        for key in affected:
+            self._daily_drain_cache.pop(key, None)
+        
+        return affected
+        
+    def _resegment_tail(self, cauldron_id: str, col: int, old_count: int) -> set:
+        """Re-run drain segmentation for one cauldron from the last drain that may still be open"""
+        restart = self._drain_restart_row(col, old_count)
+        restart_minute = int(self.timestamps[restart])
+        
+        events = self._drain_events[cauldron_id]
+        affected = set()
+        while events and events[-1]['start_minute'] >= restart_minute:
+            stale = events.pop()
+            day = stale['start_minute'] // MINUTES_PER_DAY
+            self._drain_events_by_day[(cauldron_id, day)].remove(stale)
+            affected.add((cauldron_id, day))
+        
+        for event in segment_drains(self.timestamps[restart:], self.levels[restart:, col], cauldron_id):
+            day = event['start_minute'] // MINUTES_PER_DAY
+            events.append(event)
+            self._drain_events_by_day[(cauldron_id, day)].append(event)
+            affected.add((cauldron_id, day))
+        
+        return affected
+        
+    def _invalidate_tail_days(self, cauldron_id: str, col: int, old_count: int) -> set:
+        """Windowed mode: forget on-demand drain events from the last possibly-open drain onwards"""
+        restart_day = int(self.timestamps[self._drain_restart_row(col, old_count)]) // MINUTES_PER_DAY
+        affected = {(cauldron_id, day) for day in self.day_index if day >= restart_day}
+        for key in affected:
+            self._day_events_cache.pop(key, None)
+        return affected
+        
+    def _drain_restart_row(self, col: int, old_count: int) -> int:
+        """
+        First row from which segmentation must be redone after appending.
+        
+        That is the start of the last candidate drain if it was still open
+        (within DRAIN_GAP_MINUTES of the old end of data), else the last old
+        row. The lookback window doubles until it contains that start.
+        """
+        last_minute = self.timestamps[old_count - 1]
+        window = MINUTES_PER_DAY
+        while True:
+            lo = max(0, old_count - window)
+            starts, ends = find_drain_runs(self.timestamps[lo:old_count], self.levels[lo:old_count, col])
+            if len(ends) == 0 or last_minute - self.timestamps[lo + ends[-1]] > DRAIN_GAP_MINUTES:
+                return old_count - 1
+            if starts[-1] > 0 or lo == 0:
+                return lo + int(starts[-1])
+            window *= 2
+        
+    @staticmethod
+    def _build_day_index(timestamps: np.ndarray) -> Dict[int, tuple]:
+        """Map each epoch day to the [start, end) rows it covers in the sorted timeline"""
+        days = timestamps // MINUTES_PER_DAY
+        unique_days, starts = np.unique(days, return_index=True)
+        ends = np.append(starts[1:], len(days))
+        return {int(day): (int(start), int(end)) for day, start, end in zip(unique_days, starts, ends)}
+        
+    def _column(self, cauldron_id: str) -> np.ndarray:
+        """Level series for one cauldron (zeros if the cauldron is unknown)"""
+        col = self.cauldron_index.get(cauldron_id)
+        if col is None:
+            return np.zeros(len(self.timestamps), dtype=np.float64)
+        return self.levels[:, col]
         
     def calculate_fill_rate(self, cauldron_id: str) -> float:
         """Calculate the average fill rate from REAL data"""
-        levels = []
-        timestamps = []
+        return float(self._median_fill_rates(self._column(cauldron_id)[:, None])[0])
+        
+    def calculate_all_fill_rates(self) -> Dict[str, float]:
+        """Calculate the fill rate of EVERY cauldron in one vectorized pass"""
+        rates = np.empty(len(self.cauldron_ids))
+        with metrics.stage('fill_rates'):
+            for block in self._column_blocks():
+                rates[block] = self._median_fill_rates(self.levels[:, block])
+        return {cauldron_id: float(rates[col]) for cauldron_id, col in self.cauldron_index.items()}
+        
+    def fill_rate_timeline(self, cauldron_id: str) -> FillRateTimeline:
+        """A cauldron's change-point fill-rate timeline, up to the newest sample"""
+        cursor = self._fill_rate_cursors.get(cauldron_id)
+        if cursor is None:
+            if cauldron_id not in self.cauldron_index:
+                return FillRateTimeline()
+            # Every missing timeline is built in the same pass over the history
+            self._advance_fill_rate_timelines([c for c in self.cauldron_ids if c not in self._fill_rate_timelines])
+        elif cursor < len(self.timestamps):
+            self._advance_fill_rate_timelines([cauldron_id])
+        return self._fill_rate_timelines[cauldron_id]
+        
+    def fill_rate_timelines(self, cauldron_ids: List[str]) -> Dict[str, tuple]:
+        """{cauldron_id: (timeline, cursor)} up to the newest sample, e.g. to hand to a worker process"""
+        return {cauldron_id: (self.fill_rate_timeline(cauldron_id), len(self.timestamps))
+                for cauldron_id in cauldron_ids if cauldron_id in self.cauldron_index}
+        
+    def adopt_fill_rate_timelines(self, timelines: Dict[str, tuple]):
+        """Take over timelines fed from the same rows elsewhere; each resumes from its cursor"""
+        for cauldron_id, (timeline, cursor) in timelines.items():
+            self._fill_rate_timelines[cauldron_id] = timeline
+            self._fill_rate_cursors[cauldron_id] = cursor
+        
+    def _advance_fill_rate_timelines(self, cauldron_ids: List[str]) -> Dict[str, int]:
+        """
+        Feed these cauldrons' timelines the rows past their cursors (new timelines start at row 0).
+        
+        Rows are read in blocks of every column at once, so a memory-mapped
+        matrix is streamed through once rather than once per cauldron.
+        Returns {cauldron_id: earliest minute whose rate changed}.
+        """
+        for cauldron_id in cauldron_ids:
+            if cauldron_id not in self._fill_rate_timelines:
+                self._fill_rate_timelines[cauldron_id] = FillRateTimeline()
+                self._fill_rate_cursors[cauldron_id] = 0
+        
+        changes = {}
+        total = len(self.timestamps)
+        first = min((self._fill_rate_cursors[cauldron_id] for cauldron_id in cauldron_ids), default=total)
+        block_rows = max(1, FILL_RATE_BLOCK_BYTES // (8 * max(1, len(self.cauldron_ids))))
+        with metrics.stage('fill_rate_changes'):
+            for lo in range(first, total, block_rows):
+                hi = min(lo + block_rows, total)
+                block = np.asarray(self.levels[lo:hi], dtype=np.float64)
+                for cauldron_id in cauldron_ids:
+                    cursor = self._fill_rate_cursors[cauldron_id]
+                    if cursor >= hi:
+                        continue
+                    start = max(cursor, lo)
+                    changed = self._fill_rate_timelines[cauldron_id].extend(
+                        self.timestamps[start:hi], block[start - lo:, self.cauldron_index[cauldron_id]])
+                    self._fill_rate_cursors[cauldron_id] = hi
+                    if changed is not None:
+                        changes[cauldron_id] = min(changes.get(cauldron_id, changed), changed)
+        return changes
         
-        for entry in self.data:
-            level = entry['cauldron_levels'].get(cauldron_id, 0)
-            timestamp = datetime.fromisoformat(entry['timestamp'].replace('Z', '+00:00'))
-            levels.append(level)
-            timestamps.append(timestamp)
+    def fill_rate_at(self, cauldron_id: str, minute: int, default: float) -> float:
+        """The fill rate in effect at an epoch minute; `default` (the median rate) until a change is detected"""
+        rate = self.fill_rate_timeline(cauldron_id).rate_at(minute)
+        return default if rate is None else rate
         
+    def fill_rate_changes(self, fill_rates: Dict[str, float]) -> Dict[str, List[Dict]]:
+        """Every cauldron's fill-rate segments (start time and rate), oldest first; the first one at its `fill_rates` median"""
+        return {
+            cauldron_id: [{'start_time': from_epoch_minute(segment['start_minute']).isoformat(),
+                           'rate': fill_rates.get(cauldron_id) if segment['rate'] is None else segment['rate']}
+                          for segment in self.fill_rate_timeline(cauldron_id).segments()]
+            for cauldron_id in self.cauldron_ids
+        }
+        
+    def cauldron_dynamics(self) -> Dict[str, Dict]:
+        """
+        What a forecast needs per cauldron: the current fill rate (None
+        before the first detected change) and its step noise, and the drain cadence of the last CADENCE_DAYS days (drain
+        count, mean/std interval between drain starts, mean/std visible
+        drop, start of the latest drain). The mean interval is the window
+        over the drain count; its spread needs three drains.
+        
+        Drains come from the per-day events already segmented (and kept up
+        to date by append), so only days invalidated since the last call
+        are segmented again.
+        """
+        dynamics = {}
+        if len(self.timestamps) == 0:
+            return dynamics
+        
+        first = int(self.timestamps[int(np.searchsorted(self.timestamps,
+                                                          self.timestamps[-1] - CADENCE_DAYS * MINUTES_PER_DAY))])
+        span = float(self.timestamps[-1] - first)
+        days = [day for day in range(first // MINUTES_PER_DAY, int(self.timestamps[-1]) // MINUTES_PER_DAY + 1)
+                if day in self.day_index]
+        with metrics.stage('drain_cadence'):
+            for cauldron_id in self.cauldron_ids:
+                timeline = self.fill_rate_timeline(cauldron_id)
+                noise, steps = timeline.noise()
+                events = [event for day in days for event in self._events_on_day(cauldron_id, day)
+                          if event['start_minute'] >= first]
+                starts = np.array([event['start_minute'] for event in events], dtype=np.float64)
+                amounts = np.array([event['drain_amount'] for event in events])
+                intervals = np.diff(starts)
+                dynamics[cauldron_id] = {
+                    'fill_rate': timeline.rates[-1] if timeline.rates else None,
+                    'fill_rate_std': noise,
+                    'fill_rate_steps': steps,
+                    'drain_count': len(events),
+                    'drain_interval_minutes': span / len(events) if events and span > 0 else None,
+                    'drain_interval_std': float(intervals.std()) if len(intervals) >= 2 else None,
+                    'drain_amount': float(amounts.mean()) if len(amounts) else None,
+                    'drain_amount_std': float(amounts.std()) if len(amounts) else None,
+                    'last_drain_minute': int(starts[-1]) if len(starts) else None
+                }
+        return dynamics
+        
+    def _column_blocks(self):
+        """Column slices small enough for FILL_RATE_BLOCK_BYTES of float64 working arrays"""
+        bytes_per_column = max(1, len(self.timestamps)) * 8 * 4
+        width = max(1, FILL_RATE_BLOCK_BYTES // bytes_per_column)
+        for first in range(0, len(self.cauldron_ids), width):
+            yield slice(first, first + width)
+        
+    def _median_fill_rates(self, levels: np.ndarray) -> np.ndarray:
+        """
+        Median filling rate per column of a (samples × cauldrons) level matrix.
+        
+        Only rising steps with a plausible rate (0.01 < rate < 5 units/min) count,
+        and columns without any such step fall back to 0.1.
+        """
         if len(levels) < 10:
-            return 0.1
+            return np.full(levels.shape[1], 0.1)
         
-        fill_rates = []
+        levels = np.asarray(levels, dtype=np.float64)
         
-        for i in range(1, len(levels)):
-            time_diff = (timestamps[i] - timestamps[i-1]).total_seconds() / 60
-            level_diff = levels[i] - levels[i-1]
-            
-            if level_diff > 0 and time_diff > 0:
-                rate = level_diff / time_diff
-                if 0.01 < rate < 5:
-                    fill_rates.append(rate)
+        time_diff = np.diff(self.timestamps).astype(np.float64)[:, None]
+        level_diff = np.diff(levels, axis=0)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = level_diff / time_diff
+        valid = (level_diff > 0) & (time_diff > 0) & (rates > 0.01) & (rates < 5)
+        
+        with warnings.catch_warnings():
+            # All-NaN columns (no filling steps) are handled by the fallback below
+            warnings.simplefilter('ignore', RuntimeWarning)
+            medians = np.nanmedian(np.where(valid, rates, np.nan), axis=0)
+        
+        return np.where(np.isnan(medians), 0.1, medians)
         
-        return np.median(fill_rates) if fill_rates else 0.1
-    
     def get_daily_drain(self, cauldron_id: str, date_str: str) -> Dict:
         """
         Get THE daily drain for a cauldron on a specific date.
         
-        Returns the primary drain event (peak to valley) for that day.
+        Combines every drain event that started that day into one record:
+        visible drain and duration are the sums over the events, start/end
+        come from the first and last event.
         """
-        target_date = datetime.fromisoformat(date_str).date()
-        
-        # Get all data for this day
-        day_data = []
-        for entry in self.data:
-            timestamp = datetime.fromisoformat(entry['timestamp'].replace('Z', '+00:00'))
-            if timestamp.date() == target_date:
-                level = entry['cauldron_levels'].get(cauldron_id, 0)
-                day_data.append({
-                    'timestamp': timestamp,
-                    'level': level
-                })
+        key = (cauldron_id, date_to_day(date_str))
+        if key not in self._daily_drain_cache:
+            self.daily_drain_misses += 1
+            self._daily_drain_cache[key] = self._combine_drain_events(self._events_on_day(*key))
+        return self._daily_drain_cache[key]
         
-        if len(day_data) < 10:
+    @staticmethod
+    def _combine_drain_events(events: List[Dict]) -> Dict:
+        """Roll a day's drain events up into a single daily drain record"""
+        if not events:
             return None
         
-        day_data.sort(key=lambda x: x['timestamp'])
+        return {
+            'start_time': events[0]['start_time'],
+            'end_time': events[-1]['end_time'],
+            'start_minute': events[0]['start_minute'],
+            'end_minute': events[-1]['end_minute'],
+            'start_level': events[0]['start_level'],
+            'end_level': events[-1]['end_level'],
+            'drain_amount': sum(event['drain_amount'] for event in events),
+            'duration_minutes': sum(event['duration_minutes'] for event in events),
+            'event_count': len(events)
+        }
+        
+    def detect_all_drain_events(self) -> Dict[str, List[Dict]]:
+        """
+        Segment EVERY cauldron's series into drain events in one pass.
         
-        # Find the peak and valley (main drain of the day)
-        levels = [d['level'] for d in day_data]
-        peak_level = max(levels)
-        valley_level = min(levels)
-        peak_idx = levels.index(peak_level)
-        valley_idx = levels.index(valley_level)
+        Each step of the timeline is classified as draining (level falls faster
+        than DRAIN_SLOPE_THRESHOLD units/min) or filling. Consecutive draining
+        steps form a drain; short filling blips of at most DRAIN_GAP_MINUTES
+        inside a drain are bridged, and drains smaller than MIN_DRAIN_AMOUNT
+        are dropped as noise. Drains may cross midnight.
         
-        # Calculate drain only if valley comes after peak
-        if valley_idx <= peak_idx:
-            # Valley before peak - maybe no drain, just filling
-            return None
+        Results are indexed by cauldron (sorted by start time) and by
+        (cauldron, start day), and computed only once.
+        """
+        if self._drain_events is None:
+            with metrics.stage('drain_detection'):
+                self._drain_events = {}
+                self._drain_events_by_day = defaultdict(list)
+                
+                for cauldron_id, col in self.cauldron_index.items():
+                    events = segment_drains(self.timestamps, self.levels[:, col], cauldron_id)
+                    self._drain_events[cauldron_id] = events
+                    for event in events:
+                        day = event['start_minute'] // MINUTES_PER_DAY
+                        self._drain_events_by_day[(cauldron_id, day)].append(event)
         
-        drain_amount = peak_level - valley_level
+        return self._drain_events
         
-        # Only count significant drains
-        if drain_amount < 15:
-            return None
+    def _events_on_day(self, cauldron_id: str, day: int) -> List[Dict]:
+        """Drain events of a cauldron that started on the given epoch day"""
+        if self.windowed and self._drain_events is None:
+            key = (cauldron_id, day)
+            if key not in self._day_events_cache:
+                self._day_events_cache[key] = self._segment_day(cauldron_id, day)
+            return self._day_events_cache[key]
         
-        duration = (day_data[valley_idx]['timestamp'] - day_data[peak_idx]['timestamp']).total_seconds() / 60
+        self.detect_all_drain_events()
+        return self._drain_events_by_day.get((cauldron_id, day), [])
+        
+    def _segment_day(self, cauldron_id: str, day: int) -> List[Dict]:
+        """
+        Segment only the rows around one day (windowed mode).
+        
+        The window starts a day early, so a drain bridged from the previous
+        day is attributed to that day as in a full pass. It ends one row
+        into the next day, so a drain starting on the day's last step is
+        seen, and grows forward while a drain is still open at its edge.
+        """
+        col = self.cauldron_index.get(cauldron_id)
+        if col is None or day not in self.day_index:
+            return []
+        
+        start, end = self.day_index[day]
+        lo = min(self.day_index.get(day - 1, (start, end))[0], max(0, start - 1))
+        hi = min(len(self.timestamps), end + 1)
+        while hi < len(self.timestamps):
+            starts, ends = find_drain_runs(self.timestamps[lo:hi], self.levels[lo:hi, col])
+            if len(ends) == 0 or self.timestamps[hi - 1] - self.timestamps[lo + ends[-1]] > DRAIN_GAP_MINUTES:
+                break
+            hi = min(len(self.timestamps), hi + (hi - lo))
+        
+        events = segment_drains(self.timestamps[lo:hi], self.levels[lo:hi, col], cauldron_id)
+        return [event for event in events if event['start_minute'] // MINUTES_PER_DAY == day]
         
-        return {
-            'start_time': day_data[peak_idx]['timestamp'],
-            'end_time': day_data[valley_idx]['timestamp'],
-            'start_level': peak_level,
-            'end_level': valley_level,
-            'drain_amount': drain_amount,
-            'duration_minutes': duration
-        }
-    
     def calculate_expected_collection(self, cauldron_id: str, drain_event: Dict, fill_rate: float) -> float:
         """
         Calculate expected collection from a drain event.
         Expected = Visible Drain + (Fill Rate × Duration)
+        The fill rate is the one in effect when the drain started (see
+        fill_rate_timeline); `fill_rate`, the median, applies until the
+        first detected change.
         """
         if drain_event is None:
             return 0
         
         visible_drain = drain_event['drain_amount']
         duration = drain_event['duration_minutes']
-        inflow = fill_rate * duration
+        inflow = self.fill_rate_at(cauldron_id, drain_event['start_minute'], fill_rate) * duration
         
         return visible_drain + inflow
-    
+        
     def detect_drain_events(self, cauldron_id: str, date_str: str) -> List[Dict]:
-        """Get all drain events (for compatibility) - returns list with main daily drain"""
-        drain = self.get_daily_drain(cauldron_id, date_str)
-        return [drain] if drain else []
-    
+        """Get all drain events that started on a specific date"""
+        return list(self._events_on_day(cauldron_id, date_to_day(date_str)))
+        
+    def latest_levels(self) -> Dict:
+        """Level of every cauldron at the newest sample: {'as_of', 'levels'}"""
+        if len(self.timestamps) == 0:
+            return {'as_of': None, 'levels': {}}
+        row = np.asarray(self.levels[-1], dtype=np.float64)
+        return {
+            'as_of': from_epoch_minute(int(self.timestamps[-1])).isoformat(),
+            'levels': {cauldron_id: float(row[col]) for cauldron_id, col in self.cauldron_index.items()}
+        }
+        
     def get_cauldron_stats(self, cauldron_id: str) -> Dict:
         """Get comprehensive statistics for a cauldron"""
-        levels = [entry['cauldron_levels'].get(cauldron_id, 0) for entry in self.data]
+        levels = self._column(cauldron_id)
         
         return {
             'cauldron_id': cauldron_id,
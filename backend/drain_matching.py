@@ -0,0 +1,248 @@
+"""
+🔮 DRAIN MATCHING - EVERY TICKET PAIRED WITH ONE DRAIN EVENT
+Per-day ticket-to-drain assignment, with network travel times deciding which itineraries are possible
+"""
+
+import itertools
+import numpy as np
+from collections import defaultdict
+from typing import Dict, List
+from data_processor import DataProcessor, MINUTES_PER_DAY
+
+# Blocks with more candidate assignments than this are matched in sorted order instead
+MAX_ENUMERATED_ASSIGNMENTS = 720
+
+# Passes that re-pick the assignment of blocks involved in an impossible itinerary
+REPAIR_ROUNDS = 3
+
+class DrainMatcher:
+    """
+    Assigns each ticket to one detected drain event of its cauldron and day.
+    
+    A day's tickets and drain events form one bipartite assignment; a
+    ticket can only take a drain of its own cauldron, so the day splits
+    into (cauldron, day) blocks. Blocks of the same shape, across every
+    day in the batch, are solved together against a table of all their
+    candidate assignments (each drain taking its share of tickets), with
+    the relative error between reported amount and the drain's expected
+    share as the cost. A witch's matched drains, in time order, must
+    leave her the shortest travel time between consecutive cauldrons;
+    blocks whose choice breaks that are re-picked to avoid it where
+    another assignment can, and the tickets that still can't be
+    reconciled are reported as impossible itineraries.
+    """
+    
+    def __init__(self, processor: DataProcessor, fill_rates: Dict[str, float], network=None):
+        self.processor = processor
+        self.fill_rates = fill_rates
+        self.network = network
+        # Candidate assignments per (tickets, drains) shape: (table, drain counts per row)
+        self._tables = {}
+        # Travel minutes between network nodes, padded with a zero row/column
+        # that cauldrons missing from the network (or every cauldron, without one) map to
+        if network is None:
+            self._times = np.zeros((1, 1))
+        else:
+            self._times = np.zeros((len(network.nodes) + 1, len(network.nodes) + 1))
+            self._times[:-1, :-1] = network.times
+    
+    def match(self, tickets: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        Match tickets (complete days only) to drain events.
+        
+        Returns arrays aligned with `tickets`: 'start' and 'end' epoch
+        minutes of the matched drain (0 when the day had none) and
+        'conflict', True for tickets on an impossible itinerary.
+        """
+        count = len(tickets)
+        start = np.zeros(count, dtype=np.int64)
+        end = np.zeros(count, dtype=np.int64)
+        if count == 0:
+            return {'start': start, 'end': end, 'conflict': np.zeros(0, dtype=bool)}
+        
+        blocks = defaultdict(list)
+        for position, ticket in enumerate(tickets):
+            blocks[(ticket['cauldron_id'], ticket['date'])].append(position)
+        reported = np.fromiter((t['amount_collected'] for t in tickets), dtype=np.float64, count=count)
+        
+        # Drain events and their expected totals, one block at a time
+        problems = defaultdict(list)
+        for (cauldron_id, date), positions in blocks.items():
+            events = self.processor.detect_drain_events(cauldron_id, date)
+            if not events:
+                continue
+            fill_rate = self.fill_rates.get(cauldron_id, 0.1)
+            expected = [self.processor.calculate_expected_collection(cauldron_id, event, fill_rate) for event in events]
+            problems[(len(positions), len(events))].append((positions, events, expected))
+        
+        # Solve every block of a shape at once; keep each block's ranked alternatives for the repair
+        solved = []
+        for (ticket_count, event_count), group in problems.items():
+            table = self._assignments(ticket_count, event_count)
+            if table is None:
+                for positions, events, expected in group:
+                    solved.append((positions, events, self._sorted_assignment(reported[positions], expected)[None, :]))
+                continue
+            
+            assignments, shares = table
+            positions = np.array([block[0] for block in group], dtype=np.int64)
+            expected = np.array([block[2] for block in group])
+            share = expected[:, assignments] / shares
+            costs = (np.abs(reported[positions][:, None, :] - share) / np.maximum(share, 1)).sum(axis=2)
+            ranked = np.argsort(costs, axis=1, kind='stable')
+            for (block_positions, events, _), order in zip(group, ranked):
+                solved.append((block_positions, events, assignments[order]))
+        
+        # Ticket order, so a day is repaired the same way whatever else is in the batch
+        solved.sort(key=lambda block: block[0][0])
+        choice = [0] * len(solved)
+        for positions, events, alternatives in solved:
+            self._apply(positions, events, alternatives[0], start, end)
+        
+        legs = self._leg_codes(tickets)
+        conflict = self._conflicts(legs, start, end)
+        for _ in range(REPAIR_ROUNDS):
+            if not conflict.any() or not self._repair(legs, solved, choice, start, end, conflict):
+                break
+            conflict = self._conflicts(legs, start, end)
+        return {'start': start, 'end': end, 'conflict': conflict}
+    
+    def _assignments(self, ticket_count: int, event_count: int):
+        """
+        Every way to hand `ticket_count` tickets to `event_count` drains, or None if there are too many.
+        
+        With no more tickets than drains each ticket gets its own drain;
+        otherwise every drain takes at least one and at most
+        ceil(tickets / drains) tickets. Returns (assignments, shares):
+        row p gives each ticket's drain, and shares[p, i] how many
+        tickets share ticket i's drain.
+        """
+        key = (ticket_count, event_count)
+        if key not in self._tables:
+            most = -(-ticket_count // event_count)
+            if ticket_count <= event_count:
+                candidates = itertools.permutations(range(event_count), ticket_count)
+            elif event_count ** ticket_count <= MAX_ENUMERATED_ASSIGNMENTS ** 2:
+                candidates = itertools.product(range(event_count), repeat=ticket_count)
+            else:
+                candidates = None
+            table = [] if candidates is not None else None
+            for candidate in candidates or ():
+                loads = np.bincount(candidate, minlength=event_count)
+                if ticket_count > event_count and (loads.min() < 1 or loads.max() > most):
+                    continue
+                table.append(candidate)
+                if len(table) > MAX_ENUMERATED_ASSIGNMENTS:
+                    table = None
+                    break
+            if table is None:
+                self._tables[key] = None
+            else:
+                assignments = np.array(table, dtype=np.int64).reshape(len(table), ticket_count)
+                loads = np.array([np.bincount(row, minlength=event_count) for row in assignments])
+                self._tables[key] = (assignments, np.take_along_axis(loads, assignments, axis=1))
+        return self._tables[key]
+    
+    @staticmethod
+    def _sorted_assignment(reported: np.ndarray, expected: List[float]) -> np.ndarray:
+        """Fallback for big blocks: the i-th largest ticket takes the (i mod drains)-th largest drain"""
+        assignment = np.empty(len(reported), dtype=np.int64)
+        drains = np.argsort(expected)[::-1]
+        assignment[np.argsort(reported)[::-1]] = drains[np.arange(len(reported)) % len(drains)]
+        return assignment
+    
+    @staticmethod
+    def _apply(positions: List[int], events: List[Dict], assignment, start: np.ndarray, end: np.ndarray):
+        for position, event in zip(positions, assignment.tolist()):
+            start[position] = events[event]['start_minute']
+            end[position] = events[event]['end_minute']
+    
+    def _leg_codes(self, tickets: List[Dict]) -> Dict[str, np.ndarray]:
+        """Per-ticket integer codes for the itinerary checks: courier, cauldron and network node"""
+        couriers, cauldrons = {}, {}
+        index = self.network.index if self.network is not None else {}
+        return {
+            'courier': np.fromiter((couriers.setdefault(t['courier_id'], len(couriers)) for t in tickets),
+                                   dtype=np.int64, count=len(tickets)),
+            'cauldron': np.fromiter((cauldrons.setdefault(t['cauldron_id'], len(cauldrons)) for t in tickets),
+                                    dtype=np.int64, count=len(tickets)),
+            'node': np.fromiter((index.get(t['cauldron_id'], -1) for t in tickets), dtype=np.int64, count=len(tickets))
+        }
+    
+    def _conflicts(self, legs: Dict[str, np.ndarray], start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """Tickets whose witch cannot get from the previous matched drain of the day to this one in time"""
+        conflict = np.zeros(len(start), dtype=bool)
+        matched = np.flatnonzero(end > 0)
+        if len(matched) < 2:
+            return conflict
+        
+        order = np.lexsort((legs['cauldron'][matched], end[matched], start[matched],
+                            start[matched] // MINUTES_PER_DAY, legs['courier'][matched]))
+        rows = matched[order]
+        broken = np.flatnonzero(self._broken_legs(legs, rows, start[rows], end[rows], same_day=False))
+        conflict[rows[broken]] = True
+        conflict[rows[broken + 1]] = True
+        return conflict
+    
+    def _broken_legs(self, legs: Dict[str, np.ndarray], rows: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                     same_day: bool) -> np.ndarray:
+        """
+        Impossible legs between consecutive itinerary stops along the last axis.
+        
+        rows, starts and ends are sorted by witch, day and time (with
+        same_day=True all rows are known to be on one day). A leg is
+        impossible when the same witch cannot get from one matched drain
+        to the next in time; the same drain of the same cauldron shared
+        by two of her tickets is no journey.
+        """
+        courier = legs['courier'][rows]
+        cauldron = legs['cauldron'][rows]
+        node = legs['node'][rows]
+        same_witch = courier[..., 1:] == courier[..., :-1]
+        if not same_day:
+            same_witch &= starts[..., 1:] // MINUTES_PER_DAY == starts[..., :-1] // MINUTES_PER_DAY
+        same_drain = ((cauldron[..., 1:] == cauldron[..., :-1]) & (starts[..., 1:] == starts[..., :-1])
+                      & (ends[..., 1:] == ends[..., :-1]))
+        too_soon = starts[..., 1:] < ends[..., :-1] + self._times[node[..., :-1], node[..., 1:]]
+        return same_witch & ~same_drain & too_soon
+    
+    def _repair(self, legs: Dict[str, np.ndarray], solved: List[tuple], choice: List[int], start: np.ndarray,
+                end: np.ndarray, conflict: np.ndarray) -> bool:
+        """
+        Re-pick blocks with a conflicting ticket: fewest conflicts, then lowest cost; True if any changed.
+        
+        A block's day is fixed, so only its witches' itineraries of that
+        day are affected; all of its alternatives are scored at once as
+        rows of one (alternatives × stops) array.
+        """
+        matched = np.flatnonzero(end > 0)
+        itineraries = defaultdict(list)
+        for position, courier, day in zip(matched.tolist(), legs['courier'][matched].tolist(),
+                                          (start[matched] // MINUTES_PER_DAY).tolist()):
+            itineraries[(courier, day)].append(position)
+        
+        changed = False
+        for block, (positions, events, alternatives) in enumerate(solved):
+            if len(alternatives) < 2 or not conflict[positions].any():
+                continue
+            day = int(start[positions[0]]) // MINUTES_PER_DAY
+            witches = set(legs['courier'][positions].tolist())
+            others = np.setdiff1d(np.array([position for courier in witches for position in itineraries[(courier, day)]],
+                                           dtype=np.int64), positions)
+            
+            event_starts = np.array([event['start_minute'] for event in events], dtype=np.int64)
+            event_ends = np.array([event['end_minute'] for event in events], dtype=np.int64)
+            shape = (len(alternatives), len(others) + len(positions))
+            rows = np.broadcast_to(np.concatenate((others, positions)), shape)
+            starts = np.hstack((np.broadcast_to(start[others], (shape[0], len(others))), event_starts[alternatives]))
+            ends = np.hstack((np.broadcast_to(end[others], (shape[0], len(others))), event_ends[alternatives]))
+            order = np.lexsort((legs['cauldron'][rows], ends, starts, legs['courier'][rows]))
+            rows, starts, ends = (np.take_along_axis(array, order, axis=1) for array in (rows, starts, ends))
+            broken = self._broken_legs(legs, rows, starts, ends, same_day=True).sum(axis=1)
+            
+            best = int(np.argmin(broken))
+            self._apply(positions, events, alternatives[best], start, end)
+            if best != choice[block]:
+                choice[block] = best
+                changed = True
+        return changed
@@ -0,0 +1,119 @@
+"""
+🔮 ENCODED RESPONSES - SERIALIZE ONCE, SERVE MANY TIMES
+JSON bodies encoded (and compressed) once per analysis snapshot, served with strong ETags
+"""
+
+import json
+import gzip
+import hashlib
+from typing import Dict
+from flask import Response
+from metrics import metrics
+
+# Faster encoders/compressors when installed; the standard library otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+def dumps(payload) -> bytes:
+    """
+    Compact JSON with sorted keys (same document jsonify would produce).
+    
+    Objects with a to_json() method (e.g. ValidationResults) are encoded
+    as whatever it returns.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=to_json, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=to_json, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def to_json(value):
+    if hasattr(value, 'to_json'):
+        return value.to_json()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class EncodedResponse:
+    """
+    One JSON payload, encoded and compressed up front.
+    
+    Every content-coding variant gets its own strong ETag (derived from
+    the identity body), so a poll that sends back If-None-Match costs a
+    header comparison and an empty 304.
+    """
+    
+    def __init__(self, payload):
+        with metrics.stage('serialization'):
+            body = dumps(payload)
+            digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        
+        # coding -> (body, ETag)
+        self.variants = {'identity': (body, f'"{digest}"')}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            with metrics.stage('compression'):
+                if brotli is not None:
+                    self.variants['br'] = (brotli.compress(body, quality=BROTLI_QUALITY), f'"{digest}-br"')
+                self.variants['gzip'] = (gzip.compress(body, GZIP_LEVEL, mtime=0), f'"{digest}-gzip"')
+        self.etags = {etag for _, etag in self.variants.values()}
+    
+    def response(self, request) -> Response:
+        """The best variant the client accepts, or 304 if it already has it"""
+        coding = self.negotiate(request.headers.get('Accept-Encoding', ''))
+        body, etag = self.variants[coding]
+        
+        headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if self.not_modified(request.headers.get('If-None-Match')):
+            metrics.inc('cache_hits_total', cache='etag')
+            return Response(status=304, headers=headers)
+        metrics.inc('cache_misses_total', cache='etag')
+        
+        if coding != 'identity':
+            headers['Content-Encoding'] = coding
+        return Response(body, status=200, mimetype='application/json', headers=headers)
+    
+    def negotiate(self, accept_encoding: str) -> str:
+        """Preferred stored coding the Accept-Encoding header allows"""
+        accepted = parse_accept_encoding(accept_encoding)
+        for coding in ('br', 'gzip'):
+            if coding in self.variants and accepted.get(coding, accepted.get('*', 0)) > 0:
+                return coding
+        return 'identity'
+    
+    def not_modified(self, if_none_match: str) -> bool:
+        """Whether If-None-Match names any variant of this body (weak comparison, as RFC 9110 asks)"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*' or (tag[2:] if tag.startswith('W/') else tag) in self.etags:
+                return True
+        return False
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """{'gzip': 1.0, 'br': 0.5, ...} from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
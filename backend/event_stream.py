@@ -0,0 +1,204 @@
+"""
+🔮 EVENT STREAM - SERVER-SENT EVENTS FOR LIVE FRAUD UPDATES
+Snapshot deltas pushed to many subscribers from one asyncio event loop
+"""
+
+import asyncio
+import threading
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, List, Tuple
+from encoded_response import dumps
+
+STREAM_PATH = '/api/stream'
+
+# Ticket fields sent in 'tickets' and 'status' events
+TICKET_EVENT_FIELDS = ('ticket_id', 'cauldron_id', 'courier_id', 'date', 'reported_amount',
+                       'expected_amount', 'difference', 'percent_error', 'status', 'reason')
+
+# Tickets per 'tickets' / 'status' event, so a full rebuild never becomes one giant frame
+EVENT_BATCH_SIZE = 500
+
+HEARTBEAT_SECONDS = 15
+RECONNECT_MILLISECONDS = 3000
+
+# Frames buffered per subscriber before it counts as too slow and is dropped
+SUBSCRIBER_QUEUE_SIZE = 256
+
+def analysis_deltas(old: Dict, new: Dict) -> List[Tuple[str, Dict]]:
+    """
+    (event, data) pairs describing what changed between two analyses.
+    
+    summary  - the new summary counters (if they changed)
+    witches  - witch records whose counters or score changed
+    status   - tickets whose status changed, with their previous status
+    tickets  - newly validated tickets
+    Consecutive analyses of one detector share its append-only ticket
+    list, so their results line up row by row and are compared as status
+    columns; only changed and new rows are turned into dicts.
+    """
+    # Imported here so the API can start (and serve a saved snapshot) before NumPy loads
+    import numpy as np
+    from validation_results import STATUSES
+    
+    events = []
+    if old is None or old['summary'] != new['summary']:
+        events.append(('summary', new['summary']))
+    
+    old_witches = {witch['courier_id']: witch for witch in old['witch_trust_scores']} if old else {}
+    changed_witches = [witch for witch in new['witch_trust_scores'] if old_witches.get(witch['courier_id']) != witch]
+    if changed_witches:
+        events.append(('witches', {'witches': changed_witches}))
+    
+    new_results = new['tickets']
+    old_results = old['tickets'] if old else None
+    if old_results is not None and old_results.tickets is new_results.tickets:
+        common = len(old_results)
+        changed_rows = np.flatnonzero(old_results.status != new_results.status[:common])
+        previous_codes = old_results.status[changed_rows]
+        added_rows = np.arange(common, len(new_results))
+    else:
+        # A different detector (full rebuild): match tickets by id
+        previous_by_id = {}
+        if old_results is not None:
+            for ticket, code in zip(old_results.source_tickets(), old_results.status.tolist()):
+                previous_by_id[ticket['ticket_id']] = code
+        previous = np.array([previous_by_id.get(ticket['ticket_id'], -1) for ticket in new_results.source_tickets()],
+                            dtype=np.int16)
+        changed_rows = np.flatnonzero((previous >= 0) & (previous != new_results.status))
+        previous_codes = previous[changed_rows]
+        added_rows = np.flatnonzero(previous < 0)
+    
+    added = [ticket_event(ticket) for ticket in new_results.records(added_rows)]
+    changed = [dict(ticket_event(ticket), previous_status=STATUSES[code])
+               for ticket, code in zip(new_results.records(changed_rows), previous_codes.tolist())]
+    
+    for start in range(0, len(changed), EVENT_BATCH_SIZE):
+        events.append(('status', {'tickets': changed[start:start + EVENT_BATCH_SIZE]}))
+    for start in range(0, len(added), EVENT_BATCH_SIZE):
+        events.append(('tickets', {'tickets': added[start:start + EVENT_BATCH_SIZE]}))
+    return events
+
+def ticket_event(ticket: Dict) -> Dict:
+    return {field: ticket[field] for field in TICKET_EVENT_FIELDS}
+
+def sse_frame(event: str, data, event_id: int = None) -> bytes:
+    """One encoded server-sent event (the JSON body never contains newlines)"""
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {event}\ndata: '.encode('utf-8') + dumps(data) + b'\n\n'
+
+class EventBroker:
+    """
+    Fans snapshot deltas out to server-sent-event subscribers.
+    
+    The stream is served by its own small HTTP server on an asyncio loop
+    in one background thread, so every subscriber is a coroutine and a
+    queue, not a thread. Frames are encoded once per publish; ticket
+    events are also encoded in a flagged-only variant for subscribers
+    that connect with ?flagged=true. A subscriber whose queue fills up
+    (it stopped reading) is disconnected; EventSource reconnects and gets
+    the current summary again.
+    """
+    
+    def __init__(self):
+        self.loop = None
+        self.server = None
+        self.subscribers = set()
+        # Sent first to every new subscriber: version and current summary
+        self.hello = sse_frame('snapshot', {'version': None})
+    
+    @property
+    def running(self) -> bool:
+        return self.server is not None
+    
+    def start(self, host: str, port: int) -> int:
+        """Serve /api/stream on host:port from a daemon thread; returns the bound port"""
+        ready = threading.Event()
+        
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, host, port))
+            ready.set()
+            self.loop.run_forever()
+        
+        threading.Thread(target=run, name='event-stream', daemon=True).start()
+        ready.wait()
+        return self.server.sockets[0].getsockname()[1]
+    
+    def publish(self, version: int, summary: Dict, deltas: List[Tuple[str, Dict]]):
+        """Queue one snapshot's deltas for every subscriber (callable from any thread)"""
+        frames = []
+        for event, data in deltas:
+            full = sse_frame(event, data, version)
+            flagged = full
+            if event in ('tickets', 'status'):
+                tickets = [ticket for ticket in data['tickets'] if ticket['status'] != 'valid' or
+                           ticket.get('previous_status', 'valid') != 'valid']
+                flagged = sse_frame(event, {'tickets': tickets}, version) if tickets else None
+            frames.append((full, flagged))
+        
+        hello = sse_frame('snapshot', {'version': version, 'summary': summary}, version)
+        frames.append((hello, hello))
+        
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._fan_out, hello, frames)
+        else:
+            self.hello = hello
+    
+    def _fan_out(self, hello: bytes, frames: List[Tuple[bytes, bytes]]):
+        self.hello = hello
+        for subscriber in list(self.subscribers):
+            queue, flagged_only = subscriber
+            try:
+                for full, flagged in frames:
+                    frame = flagged if flagged_only else full
+                    if frame is not None:
+                        queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Too slow: drop its backlog and tell its handler to hang up
+                self.subscribers.discard(subscriber)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscriber = None
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            method, target = head.split(b'\r\n', 1)[0].decode('latin-1').split(' ')[:2]
+            url = urlparse(target)
+            
+            if method != 'GET' or url.path.rstrip('/') != STREAM_PATH:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+                return
+            
+            flagged_only = parse_qs(url.query).get('flagged', ['false'])[0].lower() == 'true'
+            queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+            subscriber = (queue, flagged_only)
+            self.subscribers.add(subscriber)
+            
+            writer.write(b'HTTP/1.1 200 OK\r\n'
+                         b'Content-Type: text/event-stream\r\n'
+                         b'Cache-Control: no-cache\r\n'
+                         b'Connection: keep-alive\r\n'
+                         b'Access-Control-Allow-Origin: *\r\n'
+                         b'X-Accel-Buffering: no\r\n\r\n')
+            writer.write(f'retry: {RECONNECT_MILLISECONDS}\n\n'.encode('utf-8') + self.hello)
+            await writer.drain()
+            
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    frame = b': keepalive\n\n'
+                if frame is None:
+                    break
+                writer.write(frame)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            if subscriber is not None:
+                self.subscribers.discard(subscriber)
+            writer.close()
@@ -0,0 +1,190 @@
+"""
+🔮 FILL RATE MODEL - PIECEWISE-CONSTANT FILL RATES WITH CHANGE-POINT DETECTION
+A streaming two-sided CUSUM over each cauldron's filling steps
+"""
+
+import bisect
+import numpy as np
+from typing import Dict, List
+
+# Filling steps that estimate a segment's rate and noise (the rate is then frozen)
+ESTIMATE_STEPS = 240
+
+# CUSUM drift and alarm threshold, in noise standard deviations. The drift
+# sits above the error of a 240-step estimate (a reference off by ~0.2σ
+# used to raise false alarms on stationary synthetic data) and below the
+# ~1σ shifts that should still be caught
+CUSUM_DRIFT = 0.75
+CUSUM_THRESHOLD = 14
+
+# Standardized steps are clipped to ±CUSUM_CLIP, so one odd step can't raise an alarm
+CUSUM_CLIP = 3
+
+# Noise floor relative to the rate (a near-perfect sensor would otherwise alarm on any wobble)
+MIN_RELATIVE_SIGMA = 0.05
+
+# Same plausibility window as the global median fill rate (units/min)
+MIN_STEP_RATE = 0.01
+MAX_STEP_RATE = 5
+
+class FillRateTimeline:
+    """
+    One cauldron's fill rate as piecewise-constant segments.
+    
+    Each segment's reference rate is the mean of its first ESTIMATE_STEPS
+    filling steps (rising steps within the plausible rate window; drains
+    never count). After that, two CUSUM statistics watch for the rate
+    moving up or down; on an alarm a new segment starts where the
+    statistic last left zero - the estimated change point - and estimates
+    its own rate. The first segment's rate is None: until a change is
+    detected, the cauldron's whole-history median fill rate applies.
+    extend() carries every running sum over between calls and evaluates
+    the recursion as cumulative sums seeded with that state, so feeding
+    samples in any number of batches gives exactly the same timeline as
+    one pass, at O(1) per sample.
+    """
+    
+    def __init__(self):
+        self.starts = []
+        self.rates = []
+        self._last = None
+        # Estimation of the current segment
+        self._count = 0
+        self._sum = 0.0
+        self._sum_squares = 0.0
+        self._mean = None
+        self._sigma = None
+        # CUSUM (up, down): running sum, its running minimum, and where that minimum was set
+        self._sums = [0.0, 0.0]
+        self._minimums = [0.0, 0.0]
+        self._minimum_minutes = [0, 0]
+    
+    def extend(self, timestamps: np.ndarray, levels: np.ndarray) -> int:
+        """
+        Feed samples newer than the previous ones (epoch minutes, levels).
+        
+        Returns the earliest minute whose rate changed (None if none did):
+        the start of a later segment still being estimated, or a new
+        change point.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        levels = np.asarray(levels, dtype=np.float64)
+        if len(timestamps) == 0:
+            return None
+        if self._last is not None:
+            timestamps = np.concatenate(([self._last[0]], timestamps))
+            levels = np.concatenate(([self._last[1]], levels))
+        self._last = (int(timestamps[-1]), float(levels[-1]))
+        if len(timestamps) < 2:
+            return None
+        
+        time_diff = np.diff(timestamps).astype(np.float64)
+        level_diff = np.diff(levels)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = level_diff / time_diff
+        filling = (level_diff > 0) & (time_diff > 0) & (rates > MIN_STEP_RATE) & (rates < MAX_STEP_RATE)
+        rates = rates[filling]
+        minutes = timestamps[1:][filling]
+        if len(rates) == 0:
+            return None
+        
+        if not self.starts:
+            self.starts.append(int(minutes[0]))
+            self.rates.append(None)
+        changed = None
+        step = 0
+        while step < len(rates):
+            if self._mean is None:
+                step = self._estimate(rates, minutes, step)
+                if len(self.starts) > 1:
+                    changed = self.starts[-1] if changed is None else min(changed, self.starts[-1])
+                continue
+            
+            alarm = self._watch(rates, minutes, step)
+            if alarm is None:
+                break
+            step, change_minute = alarm
+            # Keep segment starts increasing even for an instant alarm
+            change_minute = max(change_minute, self.starts[-1] + 1)
+            self.starts.append(change_minute)
+            self.rates.append(self.rates[-1])
+            self._count, self._sum, self._sum_squares = 0, 0.0, 0.0
+            self._mean = self._sigma = None
+            changed = change_minute if changed is None else min(changed, change_minute)
+        return changed
+    
+    def _estimate(self, rates: np.ndarray, minutes: np.ndarray, step: int) -> int:
+        """Fold steps into the current segment's estimate until it is complete; returns the next step"""
+        take = min(ESTIMATE_STEPS - self._count, len(rates) - step)
+        chunk = rates[step:step + take]
+        self._sum = float(np.cumsum(np.concatenate(([self._sum], chunk)))[-1])
+        self._sum_squares = float(np.cumsum(np.concatenate(([self._sum_squares], chunk * chunk)))[-1])
+        self._count += take
+        mean = self._sum / self._count
+        if len(self.starts) > 1:
+            self.rates[-1] = mean
+        step += take
+        
+        if self._count == ESTIMATE_STEPS:
+            variance = max(self._sum_squares / self._count - mean * mean, 0.0)
+            self._mean = mean
+            self._sigma = max(variance ** 0.5, MIN_RELATIVE_SIGMA * mean)
+            self._sums = [0.0, 0.0]
+            self._minimums = [0.0, 0.0]
+            self._minimum_minutes = [int(minutes[step - 1])] * 2
+        return step
+    
+    def _watch(self, rates: np.ndarray, minutes: np.ndarray, step: int):
+        """
+        Run both CUSUMs over steps[step:]; (next step, change minute) at the first alarm.
+        
+        Without an alarm the running state is kept and None returned.
+        """
+        scores = np.clip((rates[step:] - self._mean) / self._sigma, -CUSUM_CLIP, CUSUM_CLIP)
+        runs = []
+        for side, sign in enumerate((1.0, -1.0)):
+            sums = np.cumsum(np.concatenate(([self._sums[side]], sign * scores - CUSUM_DRIFT)))
+            minimums = np.minimum.accumulate(np.concatenate(([self._minimums[side]], sums[1:])))
+            alarms = np.flatnonzero(sums[1:] - minimums[1:] > CUSUM_THRESHOLD)
+            runs.append((sums, minimums, alarms[0] if len(alarms) else None))
+        
+        firsts = [alarm for _, _, alarm in runs if alarm is not None]
+        if not firsts:
+            for side, (sums, minimums, _) in enumerate(runs):
+                self._sums[side] = float(sums[-1])
+                self._minimums[side] = float(minimums[-1])
+                self._minimum_minutes[side] = self._last_minimum_minute(side, sums, minimums, minutes[step:],
+                                                                         len(scores))
+            return None
+        
+        first = min(firsts)
+        side = 0 if runs[0][2] == first else 1
+        sums, minimums, _ = runs[side]
+        change_minute = self._last_minimum_minute(side, sums, minimums, minutes[step:], first + 1)
+        return step + first + 1, change_minute
+    
+    def _last_minimum_minute(self, side: int, sums: np.ndarray, minimums: np.ndarray, minutes: np.ndarray,
+                             length: int) -> int:
+        """Minute of the last new minimum among the first `length` steps (else the carried one)"""
+        lowered = np.flatnonzero(sums[1:length + 1] <= minimums[:length])
+        return int(minutes[lowered[-1]]) if len(lowered) else self._minimum_minutes[side]
+    
+    def noise(self) -> tuple:
+        """(standard deviation, count) of the current segment's filling steps so far"""
+        if self._sigma is not None:
+            return self._sigma, ESTIMATE_STEPS
+        if self._count == 0:
+            return 0.0, 0
+        mean = self._sum / self._count
+        variance = max(self._sum_squares / self._count - mean * mean, 0.0)
+        return max(variance ** 0.5, MIN_RELATIVE_SIGMA * mean), self._count
+    
+    def rate_at(self, minute: int) -> float:
+        """The rate in effect at an epoch minute (None within the first segment, and before it)"""
+        if not self.rates:
+            return None
+        return self.rates[max(bisect.bisect_right(self.starts, minute) - 1, 0)]
+    
+    def segments(self) -> List[Dict]:
+        """[{'start_minute', 'rate'}] oldest first (the first rate is None)"""
+        return [{'start_minute': start, 'rate': rate} for start, rate in zip(self.starts, self.rates)]
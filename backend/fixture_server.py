@@ -0,0 +1,79 @@
+"""
+🔮 FIXTURE SERVER - LOCAL STAND-IN FOR THE HACKUTD API
+Serves /api/Data and /api/Tickets from a JSON fixture so the backend can run offline
+
+Usage:
+    python fixture_server.py fixture.json [port]
+    TRUTH_SERUM_API_URL=http://localhost:5050 python api.py
+
+The fixture is {"historical_data": [...], "tickets": [...]} in the same
+schema the real API returns.
+"""
+
+import sys
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from data_processor import to_epoch_minute
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Answers the two upstream endpoints the backend uses"""
+    
+    # Set by serve(): {'historical_data': [...], 'tickets': [...]}
+    fixture = None
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip('/')
+        
+        if path == '/api/Data':
+            # Same inclusive epoch-second window as the real API
+            start_date = int(query.get('start_date', ['0'])[0])
+            end_date = int(query.get('end_date', ['2000000000'])[0])
+            rows = [
+                entry for entry in self.fixture['historical_data']
+                if start_date <= to_epoch_minute(entry['timestamp']) * 60 <= end_date
+            ]
+            self._send_json(rows)
+        elif path == '/api/Tickets':
+            self._send_json({'transport_tickets': self.fixture['tickets']})
+        else:
+            self.send_error(404)
+    
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def serve(fixture: dict, port: int = 0, background: bool = False) -> ThreadingHTTPServer:
+    """
+    Start a fixture server on localhost.
+    
+    port=0 picks a free port (see server.server_address). With
+    background=True the server runs in a daemon thread and is returned.
+    """
+    handler = type('BoundFixtureHandler', (FixtureHandler,), {'fixture': fixture})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+if __name__ == '__main__':
+    with open(sys.argv[1], 'r') as f:
+        fixture = json.load(f)
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 5050
+    
+    print(f"🧪 Serving {len(fixture['historical_data'])} data points and "
+          f"{len(fixture['tickets'])} tickets on http://localhost:{port}")
+    serve(fixture, port)
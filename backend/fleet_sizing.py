@@ -0,0 +1,238 @@
+"""
+🔮 FLEET SIZING - THE FEWEST WITCHES THAT KEEP EVERY CAULDRON FROM OVERFLOWING
+A discrete-event simulation of fills, trips and unloading, searched over the courier count
+"""
+
+import heapq
+import math
+import time
+import numpy as np
+from typing import Dict, List
+from route_optimizer import RoutingNetwork, UNLOAD_MINUTES, DEFAULT_HORIZON_HOURS
+
+# Largest fleet the solver tries before giving up
+MAX_FLEET_SIZE = 60
+
+# Dispatch thresholds tried for every fleet size: a witch only leaves for a
+# cauldron that will hold at least this fraction of her capacity when she arrives
+DISPATCH_THRESHOLDS = (1.0, 0.75, 0.5, 0.25)
+
+# Minutes of slack before a level touching max_volume counts as an overflow (float rounding)
+OVERFLOW_TOLERANCE = 1e-6
+
+# Event kinds (heap entries are (minute, sequence, kind, witch))
+FREE = 0      # the witch is at the market, unloaded and ready
+PICKUP = 1    # the witch reaches her cauldron
+UNLOADED = 2  # the witch is back at the market and has unloaded
+
+class FleetSimulator:
+    """
+    Discrete-event simulation of witches emptying cauldrons into the market.
+    
+    State lives in NumPy arrays over cauldrons (the minute each would
+    overflow if left alone, the latest safe departure for it once witches
+    already on their way are counted, fill rate, max volume, travel
+    times); witches only exist as heap events.
+    Each trip is market -> cauldron -> market: a free witch takes the
+    cauldron she must leave for soonest once claimed volume is taken off,
+    provided it will hold `threshold` × capacity when she gets there, and
+    otherwise waits until one does. Levels rise linearly between events,
+    so overflow is exact and a pickup only updates one cauldron.
+    """
+    
+    def __init__(self, network: RoutingNetwork, cauldrons: List[Dict], fill_rates: Dict[str, float],
+                 levels: Dict[str, float], capacity: float):
+        self.cauldron_ids = [cauldron['id'] for cauldron in cauldrons]
+        self.capacity = capacity
+        market = network.market_id
+        outbound = np.array([network.travel_minutes(market, cauldron_id) for cauldron_id in self.cauldron_ids])
+        inbound = np.array([network.travel_minutes(cauldron_id, market) for cauldron_id in self.cauldron_ids])
+        self.reachable = np.isfinite(outbound) & np.isfinite(inbound)
+        # Unreachable cauldrons get zero travel times and are masked out in run()
+        self.outbound = np.where(self.reachable, outbound, 0.0)
+        self.inbound = np.where(self.reachable, inbound, 0.0)
+        self.rates = np.array([max(float(fill_rates.get(cauldron_id, 0.1)), 1e-9)
+                               for cauldron_id in self.cauldron_ids])
+        self.max_volume = np.array([float(cauldron['max_volume']) for cauldron in cauldrons])
+        
+        levels = levels or {}
+        start = np.array([min(max(float(levels.get(cauldron_id, 0.0)), 0.0), float(cauldron['max_volume']))
+                          for cauldron_id, cauldron in zip(self.cauldron_ids, cauldrons)])
+        # Cauldrons that overflow before anyone could reach them are started
+        # at the fullest level a witch leaving at minute 0 can still save
+        latest = self.max_volume - self.rates * self.outbound
+        self.unavoidable = [cauldron_id for cauldron_id, late in zip(self.cauldron_ids, start > latest) if late]
+        self.start_levels = np.minimum(start, latest)
+    
+    def lower_bound(self, horizon: float) -> int:
+        """
+        Fleet size below which the witches cannot make the trips the horizon needs.
+        
+        Each cauldron needs at least ceil(overflowing volume / capacity)
+        full round trips; a witch's last trip may end after the horizon,
+        by at most the longest way back plus unloading.
+        """
+        reachable = self.reachable
+        excess = np.maximum(self.start_levels + self.rates * horizon - self.max_volume, 0)[reachable]
+        trips = np.ceil(excess / self.capacity - OVERFLOW_TOLERANCE)
+        work = trips @ (self.outbound + self.inbound + UNLOAD_MINUTES)[reachable]
+        spill = float(self.inbound[reachable].max(initial=0)) + UNLOAD_MINUTES
+        return math.ceil(work / (horizon + spill) - OVERFLOW_TOLERANCE)
+    
+    def run(self, couriers: int, horizon: float, threshold: float = 1.0, record: bool = False) -> Dict:
+        """
+        Simulate `couriers` witches for `horizon` minutes.
+        
+        Returns {'feasible', 'overflow': (minute, cauldron id) or None,
+        'trips', 'volume', 'busy_minutes'} plus, with record=True, the
+        schedule: one (witch, depart, cauldron index, pickup, volume,
+        back) tuple per trip.
+        """
+        rates, max_volume = self.rates, self.max_volume
+        outbound, inbound = self.outbound, self.inbound
+        capacity = self.capacity
+        wanted = threshold * capacity
+        # A cauldron's level is implied by the minute it would overflow if
+        # nobody came, which only moves when it is emptied (unreachable
+        # cauldrons never overflow: they are reported, not simulated)
+        overflow_at = np.where(self.reachable, (max_volume - self.start_levels) / rates, np.inf)
+        # Latest departure that still beats the overflow, once the capacity
+        # claimed by witches already on their way is counted as collected; a
+        # cauldron is worth a trip once leave_by - now <= headroom (it will
+        # hold `wanted` on arrival)
+        leave_by = overflow_at - outbound
+        headroom = (max_volume - wanted) / rates
+        claim = capacity / rates
+        
+        events = [(0.0, witch, FREE, witch) for witch in range(couriers)]
+        sequence = couriers
+        now = 0.0
+        waiting = []
+        trips = []
+        target = [-1] * couriers
+        departed = [0.0] * couriers
+        volume = busy = 0.0
+        trip_count = 0
+        
+        while events:
+            minute, _, kind, witch = heapq.heappop(events)
+            first = int(overflow_at.argmin())
+            if overflow_at[first] < min(minute, horizon) - OVERFLOW_TOLERANCE:
+                return self._result(False, (float(overflow_at[first]), self.cauldron_ids[first]), trip_count,
+                                    volume, busy, trips, record)
+            if minute >= horizon:
+                break
+            now = minute
+            
+            if kind == PICKUP:
+                cauldron = target[witch]
+                taken = min(capacity, max_volume[cauldron] - rates[cauldron] * (overflow_at[cauldron] - now))
+                overflow_at[cauldron] += taken / rates[cauldron]
+                leave_by[cauldron] += (taken - capacity) / rates[cauldron]
+                volume += taken
+                trip_count += 1
+                if record:
+                    trips.append((witch, departed[witch], cauldron, now, taken, now + inbound[cauldron]))
+                heapq.heappush(events, (now + inbound[cauldron] + UNLOAD_MINUTES, sequence, UNLOADED, witch))
+                sequence += 1
+                continue
+            
+            if kind == UNLOADED:
+                busy += now - departed[witch]
+            waiting.append(witch)
+            
+            # Dispatch waiting witches: latest safe departure (claims included) first
+            while waiting:
+                due = leave_by - now
+                cauldron = int(np.where(due <= headroom, due, np.inf).argmin())
+                if due[cauldron] > headroom[cauldron]:
+                    # Nobody is worth a trip yet: wait until the first cauldron is
+                    wake = now + max(float((due - headroom).min()), 1e-6)
+                    if wake < horizon:
+                        for witch in waiting:
+                            heapq.heappush(events, (wake, sequence, FREE, witch))
+                            sequence += 1
+                    waiting = []
+                    break
+                witch = waiting.pop()
+                target[witch] = cauldron
+                departed[witch] = now
+                leave_by[cauldron] += claim[cauldron]
+                heapq.heappush(events, (now + outbound[cauldron], sequence, PICKUP, witch))
+                sequence += 1
+        
+        first = int(overflow_at.argmin())
+        if overflow_at[first] < horizon - OVERFLOW_TOLERANCE:
+            return self._result(False, (float(overflow_at[first]), self.cauldron_ids[first]), trip_count,
+                                volume, busy, trips, record)
+        return self._result(True, None, trip_count, volume, busy, trips, record)
+    
+    def _result(self, feasible: bool, overflow, trip_count: int, volume: float, busy: float, trips: list,
+                record: bool) -> Dict:
+        result = {'feasible': feasible, 'overflow': overflow, 'trips': trip_count, 'volume': float(volume),
+                  'busy_minutes': float(busy)}
+        if record:
+            result['schedule'] = trips
+        return result
+
+def size_fleet(background: Dict, fill_rates: Dict[str, float], levels: Dict[str, float] = None,
+               horizon_hours: float = DEFAULT_HORIZON_HOURS, network: RoutingNetwork = None,
+               max_fleet: int = MAX_FLEET_SIZE) -> Dict:
+    """
+    The smallest number of witches that keeps every cauldron below max_volume for `horizon_hours`.
+    
+    Fleet sizes are tried upwards from a throughput lower bound; each
+    size is simulated with every dispatch threshold and the first
+    feasible one wins. Feasibility with a greedy dispatcher is not
+    strictly monotone in the fleet size, hence the upward scan rather
+    than a bisection. Returns the fleet size (None if even `max_fleet`
+    witches cannot keep up), its schedule and the search statistics.
+    """
+    started = time.perf_counter()
+    network = network if network is not None else RoutingNetwork(background)
+    capacity = min((float(courier['max_carrying_capacity']) for courier in background['couriers']), default=100.0)
+    simulator = FleetSimulator(network, background['cauldrons'], fill_rates, levels, capacity)
+    horizon = horizon_hours * 60
+    
+    lower_bound = simulator.lower_bound(horizon)
+    simulations = 0
+    best = None
+    attempts = []
+    for couriers in range(lower_bound, max_fleet + 1):
+        for threshold in DISPATCH_THRESHOLDS:
+            result = simulator.run(couriers, horizon, threshold)
+            simulations += 1
+            if result['feasible']:
+                best = (couriers, threshold)
+                break
+        attempts.append({'couriers': couriers, 'feasible': best is not None,
+                         'overflow_minute': None if best else result['overflow'][0],
+                         'overflow_cauldron': None if best else result['overflow'][1]})
+        if best is not None:
+            break
+    
+    schedule = []
+    utilization = None
+    if best is not None:
+        couriers, threshold = best
+        result = simulator.run(couriers, horizon, threshold, record=True)
+        utilization = result['busy_minutes'] / (couriers * horizon) if couriers else None
+        for witch, depart, cauldron, pickup, volume, back in result['schedule']:
+            schedule.append({'witch': witch + 1, 'depart_minute': depart, 'cauldron_id': simulator.cauldron_ids[cauldron],
+                             'pickup_minute': pickup, 'volume': volume, 'return_minute': back})
+    
+    return {
+        'horizon_hours': horizon_hours,
+        'courier_capacity': capacity,
+        'fleet_size': best[0] if best else None,
+        'current_fleet': len(background['couriers']),
+        'dispatch_threshold': best[1] if best else None,
+        'lower_bound': lower_bound,
+        'unavoidable_overflows': simulator.unavoidable,
+        'unreachable': [cauldron_id for cauldron_id, ok in zip(simulator.cauldron_ids, simulator.reachable) if not ok],
+        'utilization': utilization,
+        'schedule': schedule,
+        'attempts': attempts,
+        'simulations': simulations,
+        'solve_ms': (time.perf_counter() - started) * 1000
+    }
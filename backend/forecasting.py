@@ -0,0 +1,181 @@
+"""
+🔮 FORECASTING - WHEN WILL EACH CAULDRON HIT MAX VOLUME
+Every cauldron's level projected forward in one vectorized pass, with confidence bands
+"""
+
+import math
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+DEFAULT_HORIZON_HOURS = 24
+MAX_HORIZON_HOURS = 168
+
+# Spacing of the projected series; long horizons are thinned to at most MAX_POINTS points
+STEP_MINUTES = 15
+MAX_POINTS = 300
+
+# Scheduled drains looked at per cauldron (more only matter for very frequent drains)
+MAX_SCHEDULED_DRAINS = 256
+
+# Half-width of the bands in standard deviations (90% two-sided)
+CONFIDENCE_Z = 1.645
+CONFIDENCE_LEVEL = 0.9
+
+def parse_horizon(value: str) -> int:
+    """Forecast horizon in hours from '48', '48h' or '2d' (1 to MAX_HORIZON_HOURS)"""
+    text = str(value).strip().lower()
+    try:
+        if text.endswith('d'):
+            hours = int(text[:-1]) * 24
+        else:
+            hours = int(text[:-1] if text.endswith('h') else text)
+    except ValueError:
+        raise ValueError(f"Invalid horizon: {value} (use hours, e.g. 24, 48h or 7d)")
+    if not 1 <= hours <= MAX_HORIZON_HOURS:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON_HOURS} hours")
+    return hours
+
+def forecast_levels(cauldrons: List[Dict], levels: Dict, fill_rates: Dict[str, float], dynamics: Dict[str, Dict],
+                    horizon_hours: int = DEFAULT_HORIZON_HOURS) -> Dict:
+    """
+    Project every cauldron's level `horizon_hours` ahead of its latest sample.
+    
+    The level rises at the cauldron's current fill rate and drops by its
+    mean visible drain times the expected number of drains so far, from
+    the drain cadence: drains are due every interval after the latest
+    one, and the k-th comes with a normal timing error of √k interval
+    standard deviations. The level never goes below zero. The bands add
+    up the variance of the rate estimate, the sensor's step noise, the
+    drain amounts, the drain count and the cadence estimate. Overflow times are where the
+    expected level and each band first reach max_volume, interpolated
+    between series points.
+    
+    levels is the analysis' cauldron_levels ({'as_of', 'levels'});
+    dynamics comes from DataProcessor.cauldron_dynamics().
+    """
+    horizon = horizon_hours * 60
+    step = max(STEP_MINUTES, math.ceil(horizon / MAX_POINTS))
+    minutes = np.arange(0, horizon + step, step, dtype=np.float64)
+    minutes[-1] = min(minutes[-1], horizon)
+    as_of = datetime.fromisoformat(levels['as_of']) if levels.get('as_of') else None
+    now = int(as_of.timestamp()) // 60 if as_of else 0
+    
+    ids = [cauldron['id'] for cauldron in cauldrons]
+    max_volume = np.array([float(cauldron['max_volume']) for cauldron in cauldrons])
+    start = np.array([float(levels.get('levels', {}).get(cauldron_id, 0.0)) for cauldron_id in ids])
+    rows = [dynamics.get(cauldron_id, {}) for cauldron_id in ids]
+    
+    def column(name, fallback=0.0):
+        return np.array([fallback if row.get(name) is None else float(row[name]) for row in rows])
+    
+    rate = np.array([float(row['fill_rate']) if row.get('fill_rate') is not None else fill_rates.get(cauldron_id, 0.1)
+                     for cauldron_id, row in zip(ids, rows)])
+    rate = np.maximum(rate, 1e-9)
+    rate_error = column('fill_rate_std') / np.sqrt(np.maximum(column('fill_rate_steps'), 1))
+    step_noise = column('fill_rate_std')
+    interval = column('drain_interval_minutes', np.inf)
+    # Without a measured spread, drains are taken to be as irregular as a Poisson process
+    interval_std = column('drain_interval_std', np.nan)
+    interval_std = np.where(np.isnan(interval_std), np.where(np.isfinite(interval), interval, 0), interval_std)
+    amount = column('drain_amount')
+    amount_std = column('drain_amount_std')
+    last_drain = column('last_drain_minute', np.nan)
+    
+    # Drain k (k = 1, 2, ...) is due k intervals after the latest drain (or
+    # after now - interval when that is overdue), with the timing jitter of
+    # k intervals; each comes with probability Φ((t - due) / (σ √k)), given
+    # that none has come since the latest drain
+    draining = np.isfinite(interval) & (interval > 0) & np.isfinite(last_drain)
+    spacing = np.where(draining, interval, 1.0)
+    anchor = np.where(draining, np.maximum(np.where(draining, last_drain, 0) - now, -spacing), 0)
+    longest = horizon + float(spacing[draining].max(initial=0))
+    count = min(int(np.ceil(longest / spacing[draining].min())) + 1 if draining.any() else 0, MAX_SCHEDULED_DRAINS)
+    k = np.arange(1, count + 1, dtype=np.float64)[None, :, None]
+    due = anchor[:, None, None] + k * spacing[:, None, None]
+    jitter = np.maximum(interval_std[:, None, None] * np.sqrt(k), 1e-9)
+    arrived = _normal_cdf((minutes[None, None, :] - due) / jitter)
+    first_pending = 1 - arrived[:, :1, :1]
+    chance = np.clip((arrived - arrived[:, :, :1]) / np.maximum(first_pending, 1e-9), 0, 1)
+    chance = np.where(draining[:, None, None], chance, 0)
+    drains = chance.sum(axis=1)
+    # Drain k only comes after drain j < k, so Cov = chance_k × (1 - chance_j)
+    missed_before = np.cumsum(1 - chance, axis=1) - (1 - chance)
+    drain_variance = (chance * (1 - chance) + 2 * chance * missed_before).sum(axis=1)
+    # The cadence itself is estimated from drain_count drains (relative error 1/√count)
+    drain_variance += drains ** 2 / np.maximum(column('drain_count'), 1)[:, None]
+    
+    # Expected path, reflected at zero (a drain cannot take more than is there)
+    t = minutes[None, :]
+    free = start[:, None] + rate[:, None] * t - amount[:, None] * drains
+    expected = free - np.minimum(np.minimum.accumulate(free, axis=1), 0)
+    
+    variance = ((rate_error[:, None] * t) ** 2 + step_noise[:, None] ** 2 * t
+                + drains * amount_std[:, None] ** 2 + drain_variance * amount[:, None] ** 2)
+    spread = CONFIDENCE_Z * np.sqrt(variance)
+    lower = np.maximum(expected - spread, 0)
+    upper = expected + spread
+    
+    overflow = {name: _first_crossing(band, max_volume, minutes)
+                for name, band in (('expected', expected), ('earliest', upper), ('latest', lower))}
+    
+    def moment(minute):
+        if not np.isfinite(minute):
+            return None
+        return (as_of + timedelta(minutes=float(minute))).isoformat() if as_of else None
+    
+    forecasts = []
+    for row, cauldron_id in enumerate(ids):
+        expected_minute = overflow['expected'][row]
+        forecasts.append({
+            'cauldron_id': cauldron_id,
+            'level': float(start[row]),
+            'max_volume': float(max_volume[row]),
+            'fill_rate': float(rate[row]),
+            'drain_interval_minutes': float(interval[row]) if draining[row] else None,
+            'drain_amount': float(amount[row]) if draining[row] else None,
+            'minutes_to_overflow': float(expected_minute) if np.isfinite(expected_minute) else None,
+            'overflow_at': moment(expected_minute),
+            'overflow_earliest': moment(overflow['earliest'][row]),
+            'overflow_latest': moment(overflow['latest'][row]),
+            'series': {
+                'expected': np.minimum(expected[row], max_volume[row]).round(2).tolist(),
+                'lower': np.minimum(lower[row], max_volume[row]).round(2).tolist(),
+                'upper': np.minimum(upper[row], max_volume[row]).round(2).tolist()
+            }
+        })
+    
+    # Soonest possible overflow first
+    order = np.argsort(overflow['earliest'], kind='stable')
+    at_risk = [ids[row] for row in order.tolist() if np.isfinite(overflow['earliest'][row])]
+    return {
+        'as_of': levels.get('as_of'),
+        'horizon_hours': horizon_hours,
+        'step_minutes': step,
+        'minutes': minutes.tolist(),
+        'confidence': CONFIDENCE_LEVEL,
+        'forecasts': forecasts,
+        'summary': {
+            'cauldrons': len(forecasts),
+            'expected_overflows': int(np.isfinite(overflow['expected']).sum()),
+            'possible_overflows': len(at_risk),
+            'at_risk': at_risk
+        }
+    }
+
+def _normal_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal CDF (tanh approximation, within 2e-4)"""
+    x = np.clip(x, -10, 10)
+    return 0.5 * (1 + np.tanh(0.7978845608 * (x + 0.044715 * x ** 3)))
+
+def _first_crossing(levels: np.ndarray, max_volume: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+    """Minute each row first reaches max_volume (inf if it doesn't), interpolated between series points"""
+    over = levels >= max_volume[:, None]
+    hit = over.any(axis=1)
+    index = over.argmax(axis=1)
+    rows = np.arange(len(levels))
+    before = np.maximum(index - 1, 0)
+    rise = levels[rows, index] - levels[rows, before]
+    share = np.where(rise > 0, (max_volume - levels[rows, before]) / np.where(rise > 0, rise, 1), 1)
+    crossing = minutes[before] + np.clip(share, 0, 1) * (minutes[index] - minutes[before])
+    return np.where(hit & (index > 0), crossing, np.where(hit, 0.0, np.inf))
@@ -3,34 +3,151 @@
 Realistic fraud detection with fair, lenient trust scoring
 """
 
+import numpy as np
 from typing import Dict, List
-from data_processor import DataProcessor
-from datetime import datetime
+from data_processor import DataProcessor, date_to_day, EPOCH_DATE
+from datetime import timedelta
 from collections import defaultdict
+from metrics import metrics
+from validation_results import ValidationResults, RESULT_DTYPE, STATUS_CODES, VALID, SUSPICIOUS, FRAUDULENT, result_record
+from trust_scores import TrustScoreEngine, TRUST_WINDOWS, TRUST_HALF_LIFE_DAYS
+from drain_matching import DrainMatcher
 
 class FraudDetector:
     """Detects fraudulent transport tickets by comparing them with actual drain events"""
     
-    def __init__(self, historical_data: List[Dict], tickets: List[Dict]):
-        self.processor = DataProcessor(historical_data)
-        self.tickets = tickets
-        self.cauldron_fill_rates = {}
+    def __init__(self, historical_data: List[Dict], tickets: List[Dict], processor: DataProcessor = None,
+                 cauldron_fill_rates: Dict[str, float] = None, network=None):
+        # Either raw API samples or an already-built processor (e.g. from the history cache)
+        self.processor = processor if processor is not None else DataProcessor(historical_data)
+        self.tickets = []
+        # Latest published results, and the working rows behind them (one per ticket)
+        self.results = None
+        self._rows = np.zeros(0, dtype=RESULT_DTYPE)
         
-        # Pre-calculate fill rates
-        for cauldron_id in self.processor.cauldron_ids:
-            self.cauldron_fill_rates[cauldron_id] = self.processor.calculate_fill_rate(cauldron_id)
+        # Pre-calculate fill rates (all cauldrons in one vectorized pass),
+        # unless they were estimated already (e.g. by the parent of a worker process)
+        if cauldron_fill_rates is None:
+            cauldron_fill_rates = self.processor.calculate_all_fill_rates()
+        self.cauldron_fill_rates = cauldron_fill_rates
+        
+        # Pairs tickets with drain events; `network` (a route_optimizer.RoutingNetwork)
+        # adds travel times to the itinerary check, without it only overlaps count
+        self.matcher = DrainMatcher(self.processor, cauldron_fill_rates, network)
         
         # Group tickets by cauldron and date
         self.tickets_by_cauldron_date = defaultdict(list)
-        for ticket in tickets:
-            key = (ticket['cauldron_id'], ticket['date'])
-            self.tickets_by_cauldron_date[key].append(ticket)
+        self._positions_by_group = defaultdict(list)
+        self._groups_by_day = defaultdict(list)
+        self._positions_by_date = defaultdict(list)
+        # Running witch aggregates (also interns courier ids), and each ticket's courier code and epoch day
+        self.trust = TrustScoreEngine()
+        self._courier_codes = np.zeros(0, dtype=np.int32)
+        self._ticket_days = np.zeros(0, dtype=np.int32)
+        self._add_tickets(tickets)
     
     def validate_ticket(self, ticket: Dict) -> Dict:
         """
         Validate a ticket against the ACTUAL daily drain.
         Uses LENIENT thresholds: 10% / 25% 
         """
+        return result_record(self._evaluate(ticket), ticket)
+    
+    def validate_batch(self, tickets: List[Dict]) -> np.ndarray:
+        """
+        Validate many tickets at once into RESULT_DTYPE rows (see validation_results).
+        
+        Tickets are grouped by (cauldron, date); each group's daily drain,
+        fill rate and ticket count is looked up once into a small drain
+        table, which is then joined back onto the tickets by group code.
+        Expected share, difference, percent error and the 10% / 25%
+        classification are array expressions over the whole batch, with
+        the same arithmetic (and so the same statuses) as validate_ticket.
+        Reason strings are only built when a row is turned into a dict.
+        """
+        count = len(tickets)
+        rows = np.zeros(count, dtype=RESULT_DTYPE)
+        if count == 0:
+            return rows
+        
+        groups = {}
+        group_codes = np.fromiter((groups.setdefault((t['cauldron_id'], t['date']), len(groups)) for t in tickets),
+                                  dtype=np.int64, count=count)
+        reported = np.fromiter((t['amount_collected'] for t in tickets), dtype=np.float64, count=count)
+        
+        # Drain table: one row per (cauldron, date) group in the batch
+        table = self._drain_table(groups)
+        has_drain = table['drain_events'][group_codes] > 0
+        fill_rate = table['fill_rate'][group_codes]
+        
+        # Calculate total expected from ACTUAL drain, divided among the day's tickets
+        expected_total = table['visible_drain'] + table['fill_rate'] * table['duration_minutes']
+        tickets_this_day = table['tickets_this_day'][group_codes]
+        expected_amount = expected_total[group_codes] / tickets_this_day
+        difference = reported - expected_amount
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent_error = np.where(expected_amount > 0, np.abs(difference / expected_amount * 100), 100.0)
+        
+        # LENIENT THRESHOLDS: 10% / 25%
+        status = np.where(percent_error < 10, VALID, np.where(percent_error < 25, SUSPICIOUS, FRAUDULENT))
+        
+        # No drain detected: anything up to capacity is fine
+        over_capacity = reported > 100
+        status = np.where(has_drain, status, np.where(over_capacity, FRAUDULENT, VALID))
+        expected_amount = np.where(has_drain, expected_amount, np.where(over_capacity, 100.0, reported))
+        difference = np.where(has_drain, difference, np.where(over_capacity, reported - 100, 0.0))
+        percent_error = np.where(has_drain, percent_error,
+                                 np.where(over_capacity, (reported - 100) / 100 * 100, 0.0))
+        
+        rows['status'] = status
+        rows['tickets_this_day'] = np.where(has_drain, tickets_this_day, 1)
+        rows['reported_amount'] = reported
+        rows['expected_amount'] = expected_amount
+        rows['difference'] = difference
+        rows['percent_error'] = percent_error
+        rows['fill_rate_used'] = fill_rate
+        for field in ('drain_events', 'drain_start_minute', 'drain_end_minute', 'visible_drain'):
+            rows[field] = table[field][group_codes]
+        rows['drain_duration_minutes'] = table['duration_minutes'][group_codes]
+        rows['total_expected'] = np.where(has_drain, expected_total[group_codes], 0.0)
+        return rows
+    
+    def _drain_table(self, groups: Dict[tuple, int]) -> Dict[str, np.ndarray]:
+        """Daily drain, fill rate and ticket count of every (cauldron_id, date) group, by group code"""
+        size = len(groups)
+        table = {
+            'fill_rate': np.empty(size),
+            'tickets_this_day': np.empty(size, dtype=np.int64),
+            'drain_events': np.zeros(size, dtype=np.int64),
+            'drain_start_minute': np.zeros(size, dtype=np.int64),
+            'drain_end_minute': np.zeros(size, dtype=np.int64),
+            'visible_drain': np.zeros(size),
+            'duration_minutes': np.zeros(size)
+        }
+        
+        misses = self.processor.daily_drain_misses
+        for (cauldron_id, date), code in groups.items():
+            fill_rate = self.cauldron_fill_rates.get(cauldron_id, 0.1)
+            table['tickets_this_day'][code] = len(self.tickets_by_cauldron_date.get((cauldron_id, date), ())) or 1
+            
+            daily_drain = self.processor.get_daily_drain(cauldron_id, date)
+            if daily_drain is not None:
+                # The rate in effect when the day's drains started
+                fill_rate = self.processor.fill_rate_at(cauldron_id, daily_drain['start_minute'], fill_rate)
+                table['drain_events'][code] = daily_drain['event_count']
+                table['drain_start_minute'][code] = daily_drain['start_minute']
+                table['drain_end_minute'][code] = daily_drain['end_minute']
+                table['visible_drain'][code] = daily_drain['drain_amount']
+                table['duration_minutes'][code] = daily_drain['duration_minutes']
+            table['fill_rate'][code] = fill_rate
+        
+        misses = self.processor.daily_drain_misses - misses
+        metrics.inc('cache_hits_total', size - misses, cache='daily_drain')
+        metrics.inc('cache_misses_total', misses, cache='daily_drain')
+        return table
+    
+    def _evaluate(self, ticket: Dict) -> tuple:
+        """One ticket's validation as a row tuple in RESULT_DTYPE order"""
         cauldron_id = ticket['cauldron_id']
         reported_amount = ticket['amount_collected']
         date = ticket['date']
@@ -43,45 +160,16 @@ class FraudDetector:
         if daily_drain is None:
             # No drain detected
             if reported_amount <= 100:
-                return {
-                    'ticket_id': ticket['ticket_id'],
-                    'cauldron_id': cauldron_id,
-                    'courier_id': ticket['courier_id'],
-                    'date': date,
-                    'reported_amount': reported_amount,
-                    'expected_amount': reported_amount,
-                    'difference': 0,
-                    'percent_error': 0,
-                    'status': 'valid',
-                    'matched_drain': None,
-                    'reason': 'No significant drain detected, amount reasonable',
-                    'fill_rate_used': fill_rate,
-                    'tickets_this_day': 1
-                }
-            else:
-                return {
-                    'ticket_id': ticket['ticket_id'],
-                    'cauldron_id': cauldron_id,
-                    'courier_id': ticket['courier_id'],
-                    'date': date,
-                    'reported_amount': reported_amount,
-                    'expected_amount': 100,
-                    'difference': reported_amount - 100,
-                    'percent_error': (reported_amount - 100) / 100 * 100,
-                    'status': 'fraudulent',
-                    'matched_drain': None,
-                    'reason': f'Exceeds capacity ({reported_amount:.1f} > 100)',
-                    'fill_rate_used': fill_rate,
-                    'tickets_this_day': 1
-                }
-        
-        # Calculate total expected from ACTUAL drain
+                return (VALID, 1, 0, reported_amount, reported_amount, 0, 0, fill_rate, 0, 0, 0, 0, 0, 0, 0, 0)
+            return (FRAUDULENT, 1, 0, reported_amount, 100, reported_amount - 100,
+                    (reported_amount - 100) / 100 * 100, fill_rate, 0, 0, 0, 0, 0, 0, 0, 0)
+        
+        # Calculate total expected from ACTUAL drain, at the fill rate of that time
+        fill_rate = self.processor.fill_rate_at(cauldron_id, daily_drain['start_minute'], fill_rate)
         expected_total = self.processor.calculate_expected_collection(cauldron_id, daily_drain, fill_rate)
         
         # Check how many tickets exist for this day/cauldron
-        key = (cauldron_id, date)
-        day_tickets = self.tickets_by_cauldron_date[key]
-        num_tickets = len(day_tickets)
+        num_tickets = len(self.tickets_by_cauldron_date[(cauldron_id, date)])
         
         # Divide expected amount by number of tickets
         expected_amount = expected_total / num_tickets
@@ -91,122 +179,180 @@ class FraudDetector:
         
         # LENIENT THRESHOLDS: 10% / 25%
         if percent_error < 10:
-            status = 'valid'
-            reason = f'Matches expected share (±{percent_error:.1f}%)'
-            if num_tickets > 1:
-                reason += f' [{num_tickets} witches this day]'
+            status = VALID
         elif percent_error < 25:  # Was 18%, now 25%
-            status = 'suspicious'
-            if difference > 0:
-                reason = f'Over-reported by {difference:.2f} units (+{percent_error:.1f}%)'
-            else:
-                reason = f'Under-reported by {abs(difference):.2f} units (-{percent_error:.1f}%)'
-            if num_tickets > 1:
-                reason += f' [{num_tickets} witches this day]'
+            status = SUSPICIOUS
         else:  # >= 25%
-            status = 'fraudulent'
-            if difference > 0:
-                reason = f'FRAUD: Over-reported by {difference:.2f} units (+{percent_error:.1f}%)'
+            status = FRAUDULENT
+        
+        return (status, num_tickets, daily_drain['event_count'], reported_amount, expected_amount, difference,
+                percent_error, fill_rate, daily_drain['start_minute'], daily_drain['end_minute'],
+                daily_drain['duration_minutes'], daily_drain['drain_amount'], expected_total, 0, 0, 0)
+    
+    def analyze_all_tickets(self, workers: int = None) -> Dict:
+        """
+        Analyze all tickets.
+        
+        With workers > 1 the tickets are sharded by cauldron across a process
+        pool; the results are merged back in ticket order, so the analysis is
+        identical to the serial one.
+        """
+        with metrics.stage('validation'):
+            if workers is not None and workers > 1 and self.tickets:
+                from parallel_validation import validate_in_parallel
+                self._rows = validate_in_parallel(self.processor, self.cauldron_fill_rates, self.tickets, workers)
             else:
-                reason = f'FRAUD: Under-reported by {abs(difference):.2f} units (-{percent_error:.1f}%)'
-            if num_tickets > 1:
-                reason += f' [{num_tickets} witches this day]'
+                self._rows = self.validate_batch(self.tickets)
+        metrics.inc('tickets_validated_total', len(self._rows))
         
-        return {
-            'ticket_id': ticket['ticket_id'],
-            'cauldron_id': cauldron_id,
-            'courier_id': ticket['courier_id'],
-            'date': date,
-            'reported_amount': reported_amount,
-            'expected_amount': expected_amount,
-            'difference': difference,
-            'percent_error': percent_error,
-            'status': status,
-            'matched_drain': {
-                'start_time': daily_drain['start_time'].isoformat(),
-                'end_time': daily_drain['end_time'].isoformat(),
-                'duration_minutes': daily_drain['duration_minutes'],
-                'visible_drain': daily_drain['drain_amount'],
-                'total_expected': expected_total
-            },
-            'reason': reason,
-            'fill_rate_used': fill_rate,
-            'tickets_this_day': num_tickets
-        }
+        with metrics.stage('drain_matching'):
+            self._match_drains(self._rows, np.arange(len(self._rows)))
+        
+        with metrics.stage('trust_scoring'):
+            self.trust.clear()
+            self.trust.add(self._courier_codes, self._ticket_days, self._rows['status'], self._rows['difference'])
+        
+        return self._build_analysis()
+    
+    def update(self, new_historical_data: List[Dict], new_tickets: List[Dict]) -> Dict:
+        """
+        Fold newly fetched samples and tickets into the last analysis.
+        
+        Only the (cauldron, date) groups whose drain events changed or that
+        received new tickets are re-validated; summary counts and witch
+        scores are updated from the re-validated rows only. Fill rates stay as
+        estimated when the detector was built - rebuild it to re-estimate them.
+        """
+        return self.apply_changes(self.processor.append(new_historical_data), new_tickets)
+    
+    def apply_changes(self, changed_days: set, new_tickets: List[Dict]) -> Dict:
+        """
+        Incremental update for samples already appended to the processor.
+        
+        `changed_days` is the set of (cauldron_id, epoch day) groups returned
+        by DataProcessor.append / append_columns.
+        """
+        if self.results is None:
+            self._add_tickets(new_tickets)
+            return self.analyze_all_tickets()
+        
+        stale_groups = set()
+        for day_key in changed_days:
+            stale_groups.update(self._groups_by_day.get(day_key, ()))
+        
+        stale_groups |= self._add_tickets(new_tickets)
+        
+        # Rows of new tickets are filled in below (their groups are all stale)
+        rows = np.zeros(len(self.tickets), dtype=RESULT_DTYPE)
+        rows[:len(self._rows)] = self._rows
+        
+        # Drains are matched a whole day at a time, so every ticket of a stale day is redone
+        stale_dates = {date for _, date in stale_groups}
+        positions = np.array([position for date in stale_dates for position in self._positions_by_date[date]],
+                             dtype=np.int64)
+        with metrics.stage('validation'):
+            rows[positions] = self.validate_batch([self.tickets[position] for position in positions.tolist()])
+        metrics.inc('tickets_validated_total', len(positions))
+        
+        with metrics.stage('drain_matching'):
+            self._match_drains(rows, positions)
+        
+        # Take the stale rows' old results out of the witch aggregates, then count the new ones in
+        with metrics.stage('trust_scoring'):
+            old = positions[positions < len(self._rows)]
+            self.trust.add(self._courier_codes[old], self._ticket_days[old], self._rows['status'][old],
+                           self._rows['difference'][old], sign=-1)
+            self.trust.add(self._courier_codes[positions], self._ticket_days[positions], rows['status'][positions],
+                           rows['difference'][positions])
+        
+        self._rows = rows
+        return self._build_analysis()
     
-    def analyze_all_tickets(self) -> Dict:
-        """Analyze all tickets"""
-        results = []
+    def _add_tickets(self, tickets: List[Dict]) -> set:
+        """Register tickets in the group indexes, returning the groups they joined"""
+        touched = set()
+        codes, days = [], []
+        for ticket in tickets:
+            key = (ticket['cauldron_id'], ticket['date'])
+            self._positions_by_group[key].append(len(self.tickets))
+            self._positions_by_date[ticket['date']].append(len(self.tickets))
+            self.tickets.append(ticket)
+            self.tickets_by_cauldron_date[key].append(ticket)
+            codes.append(self.trust.courier_code(ticket['courier_id']))
+            days.append(date_to_day(ticket['date']))
+            
+            day_key = (ticket['cauldron_id'], days[-1])
+            if key not in self._groups_by_day[day_key]:
+                self._groups_by_day[day_key].append(key)
+            touched.add(key)
         
-        for ticket in self.tickets:
-            validation = self.validate_ticket(ticket)
-            results.append(validation)
+        self._courier_codes = np.concatenate((self._courier_codes, np.array(codes, dtype=np.int32)))
+        self._ticket_days = np.concatenate((self._ticket_days, np.array(days, dtype=np.int32)))
+        return touched
+    
+    def _match_drains(self, rows: np.ndarray, positions: np.ndarray):
+        """
+        Pair the tickets at `positions` (whole days) with drain events, in place.
         
-        # Calculate statistics
+        A ticket on an impossible itinerary is at least suspicious,
+        whatever its amount says.
+        """
+        matches = self.matcher.match([self.tickets[position] for position in positions.tolist()])
+        rows['matched_start_minute'][positions] = matches['start']
+        rows['matched_end_minute'][positions] = matches['end']
+        rows['itinerary_conflict'][positions] = matches['conflict']
+        status = rows['status'][positions]
+        rows['status'][positions] = np.where(matches['conflict'] & (status == VALID), SUSPICIOUS, status)
+    
+    def _build_analysis(self) -> Dict:
+        """Assemble the analysis payload from the current result rows"""
+        # Updates replace self._rows with a new array (never write into it), so the
+        # published results can share it
+        results = ValidationResults(self._rows, self.tickets)
+        self.results = results
+        
+        counts = results.status_counts()
         total_tickets = len(results)
-        valid_tickets = [r for r in results if r['status'] == 'valid']
-        suspicious_tickets = [r for r in results if r['status'] == 'suspicious']
-        fraudulent_tickets = [r for r in results if r['status'] == 'fraudulent']
         
-        # Calculate witch trust scores
-        witch_scores = self.calculate_witch_trust_scores(results)
+        with metrics.stage('trust_scoring'):
+            witch_scores = self.trust.scores()
+            trust_windows = {name: self.trust.scores(window_days=days) for name, days in TRUST_WINDOWS.items()}
+            trust_windows['decayed'] = self.trust.decayed_scores(TRUST_HALF_LIFE_DAYS)
         
         return {
             'summary': {
                 'total_tickets': total_tickets,
-                'valid_count': len(valid_tickets),
-                'suspicious_count': len(suspicious_tickets),
-                'fraudulent_count': len(fraudulent_tickets),
-                'fraud_rate': (len(fraudulent_tickets) / total_tickets * 100) if total_tickets > 0 else 0
+                'valid_count': counts['valid'],
+                'suspicious_count': counts['suspicious'],
+                'fraudulent_count': counts['fraudulent'],
+                'fraud_rate': (counts['fraudulent'] / total_tickets * 100) if total_tickets > 0 else 0,
+                'impossible_itineraries': int(np.count_nonzero(self._rows['itinerary_conflict']))
             },
             'tickets': results,
             'witch_trust_scores': witch_scores,
+            'witch_trust_windows': {
+                'as_of': (EPOCH_DATE + timedelta(days=self.trust.last_day)).isoformat()
+                         if self.trust.last_day is not None else None,
+                'half_life_days': TRUST_HALF_LIFE_DAYS,
+                'scores': trust_windows
+            },
             'cauldron_fill_rates': self.cauldron_fill_rates,
-            'flagged_tickets': suspicious_tickets + fraudulent_tickets
+            'cauldron_fill_rate_changes': self.processor.fill_rate_changes(self.cauldron_fill_rates),
+            'cauldron_levels': self.processor.latest_levels(),
+            'cauldron_dynamics': self.processor.cauldron_dynamics(),
+            'flagged_tickets': results.flagged()
         }
     
-    def calculate_witch_trust_scores(self, validated_tickets: List[Dict]) -> Dict:
+    def calculate_witch_trust_scores(self, validated_tickets: List[Dict]) -> List[Dict]:
         """
         Calculate trust scores with VERY LIGHT PENALTIES
         Suspicious: -2 (was -3)
         Fraudulent: -8 (was -15)
         """
-        witch_data = {}
-        
-        witch_ids = set(ticket['courier_id'] for ticket in validated_tickets)
-        for witch_id in witch_ids:
-            witch_data[witch_id] = {
-                'courier_id': witch_id,
-                'trust_score': 100,
-                'total_tickets': 0,
-                'valid_tickets': 0,
-                'suspicious_tickets': 0,
-                'fraudulent_tickets': 0,
-                'total_fraud_amount': 0
-            }
-        
-        for ticket in validated_tickets:
-            witch_id = ticket['courier_id']
-            witch_data[witch_id]['total_tickets'] += 1
-            
-            if ticket['status'] == 'valid':
-                witch_data[witch_id]['valid_tickets'] += 1
-            elif ticket['status'] == 'suspicious':
-                witch_data[witch_id]['suspicious_tickets'] += 1
-                witch_data[witch_id]['trust_score'] -= 2  # Was -3, now -2
-                witch_data[witch_id]['total_fraud_amount'] += abs(ticket['difference'])
-            elif ticket['status'] == 'fraudulent':
-                witch_data[witch_id]['fraudulent_tickets'] += 1
-                witch_data[witch_id]['trust_score'] -= 8  # Was -15, now -8
-                witch_data[witch_id]['total_fraud_amount'] += abs(ticket['difference'])
-        
-        for witch_id in witch_data:
-            witch_data[witch_id]['trust_score'] = max(0, witch_data[witch_id]['trust_score'])
-            total = witch_data[witch_id]['total_tickets']
-            valid = witch_data[witch_id]['valid_tickets']
-            witch_data[witch_id]['accuracy_percent'] = (valid / total * 100) if total > 0 else 0
-        
-        witch_list = list(witch_data.values())
-        witch_list.sort(key=lambda x: x['trust_score'])
-        
-        return witch_list
+        engine = TrustScoreEngine()
+        couriers = np.array([engine.courier_code(t['courier_id']) for t in validated_tickets], dtype=np.int32)
+        days = np.array([date_to_day(t['date']) for t in validated_tickets], dtype=np.int32)
+        status = np.array([STATUS_CODES[t['status']] for t in validated_tickets], dtype=np.uint8)
+        differences = np.array([t['difference'] for t in validated_tickets], dtype=np.float64)
+        engine.add(couriers, days, status, differences)
+        return engine.scores()
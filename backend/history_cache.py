@@ -0,0 +1,154 @@
+"""
+🔮 HISTORY CACHE - LOCAL COLUMNAR COPY OF THE UPSTREAM DATA
+Raw binary columns on disk, memory-mapped at start-up, append-only updates
+"""
+
+import os
+import json
+import numpy as np
+from typing import Dict, List
+
+CACHE_VERSION = 2
+
+TIMESTAMP_DTYPE = np.int64    # epoch minutes
+LEVEL_DTYPE = np.float32      # one row of cauldron levels per sample
+
+class HistoryCache:
+    """
+    Append-only on-disk store of fetched samples and tickets.
+    
+    Layout of the cache directory:
+        meta.json       - version, cauldron ids (column order) and row count
+        timestamps.bin  - raw int64 epoch minutes, one per sample
+        levels.bin      - raw float32 levels, row-major (samples × cauldrons)
+        tickets.json    - last fetched transport tickets
+    
+    meta.json is rewritten (atomically) only after new rows have been
+    flushed, so a crash mid-append leaves at most some trailing bytes that
+    the next load() ignores.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.timestamps_path = os.path.join(directory, 'timestamps.bin')
+        self.levels_path = os.path.join(directory, 'levels.bin')
+        self.tickets_path = os.path.join(directory, 'tickets.json')
+        
+    def load(self) -> Dict:
+        """
+        Memory-map the cached history.
+        
+        Nothing but the timestamp vector is read here; level rows are paged
+        in by the OS only when a computation touches them.
+        
+        Returns {'timestamps', 'levels', 'cauldron_ids', 'tickets'} or None
+        when there is no usable cache (missing, other version, corrupt).
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        
+        rows = meta['rows']
+        cauldron_ids = meta['cauldron_ids']
+        
+        if rows == 0:
+            timestamps = np.zeros(0, dtype=TIMESTAMP_DTYPE)
+            levels = np.zeros((0, len(cauldron_ids)), dtype=LEVEL_DTYPE)
+        else:
+            timestamps = np.memmap(self.timestamps_path, dtype=TIMESTAMP_DTYPE, mode='r', shape=(rows,))
+            levels = np.memmap(self.levels_path, dtype=LEVEL_DTYPE, mode='r', shape=(rows, len(cauldron_ids)))
+            
+            # The timeline must be sorted for the day index and appends to work
+            if np.any(np.diff(timestamps) < 0):
+                print("⚠️  Cached history is out of order, discarding it")
+                self.clear()
+                return None
+        
+        return {
+            'timestamps': timestamps,
+            'levels': levels,
+            'cauldron_ids': cauldron_ids,
+            'tickets': self._read_json(self.tickets_path) or []
+        }
+        
+    def append(self, timestamps: np.ndarray, levels: np.ndarray, cauldron_ids: List[str]):
+        """Append sorted rows that are newer than everything already cached"""
+        meta = self._read_meta()
+        if meta is not None and meta['cauldron_ids'] != list(cauldron_ids):
+            # Column layout changed upstream - start a fresh cache
+            self.clear()
+            meta = None
+        if meta is None:
+            meta = {'version': CACHE_VERSION, 'cauldron_ids': list(cauldron_ids), 'rows': 0}
+            self._truncate(0, len(cauldron_ids))
+        
+        if len(timestamps) == 0:
+            self._write_json(self.meta_path, meta)
+            return
+        
+        self._truncate(meta['rows'], len(cauldron_ids))
+        with open(self.timestamps_path, 'ab') as f:
+            f.write(np.ascontiguousarray(timestamps, dtype=TIMESTAMP_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.levels_path, 'ab') as f:
+            f.write(np.ascontiguousarray(levels, dtype=LEVEL_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        
+        meta['rows'] += len(timestamps)
+        self._write_json(self.meta_path, meta)
+        
+    def save_tickets(self, tickets: List[Dict]):
+        """Replace the cached ticket list"""
+        self._write_json(self.tickets_path, tickets)
+        
+    def clear(self):
+        """Delete every cache file"""
+        for path in (self.meta_path, self.timestamps_path, self.levels_path, self.tickets_path):
+            if os.path.exists(path):
+                os.remove(path)
+        
+    def _read_meta(self) -> Dict:
+        """meta.json if it describes a complete cache of the current version"""
+        meta = self._read_json(self.meta_path)
+        if meta is None or meta.get('version') != CACHE_VERSION:
+            return None
+        
+        rows = meta['rows']
+        columns = len(meta['cauldron_ids'])
+        if rows > 0 and (self._size(self.timestamps_path) < rows * np.dtype(TIMESTAMP_DTYPE).itemsize or
+                         self._size(self.levels_path) < rows * columns * np.dtype(LEVEL_DTYPE).itemsize):
+            print("⚠️  Cached history is truncated, discarding it")
+            return None
+        
+        return meta
+        
+    def _truncate(self, rows: int, columns: int):
+        """Cut the column files back to `rows` rows (drops bytes from an interrupted append)"""
+        os.makedirs(self.directory, exist_ok=True)
+        for path, row_bytes in ((self.timestamps_path, np.dtype(TIMESTAMP_DTYPE).itemsize),
+                                (self.levels_path, columns * np.dtype(LEVEL_DTYPE).itemsize)):
+            with open(path, 'ab') as f:
+                f.truncate(rows * row_bytes)
+        
+    @staticmethod
+    def _size(path: str) -> int:
+        return os.path.getsize(path) if os.path.exists(path) else 0
+        
+    @staticmethod
+    def _read_json(path: str):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+    def _write_json(self, path: str, payload):
+        """Write JSON atomically (temp file + rename)"""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
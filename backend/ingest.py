@@ -0,0 +1,163 @@
+"""
+🔮 STREAMING INGESTION - /api/Data STRAIGHT INTO COLUMNS
+Parse the JSON array one sample at a time and write it into the level store
+"""
+
+import re
+import json
+import codecs
+import numpy as np
+from typing import Dict, Iterable, Iterator, List
+from data_processor import to_epoch_minute
+
+# Bytes requested from the HTTP response per read
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Rows allocated up front; the builder doubles its capacity when full
+INITIAL_CAPACITY = 4096
+
+WHITESPACE = re.compile(r'\s*')
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """
+    Yield the elements of a top-level JSON array from a stream of byte chunks.
+    
+    Only the current chunk plus one partially received element is ever
+    held in memory, however long the array is.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    started = False
+    
+    for chunk in chunks:
+        buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+        
+        while True:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            
+            char = buffer[pos]
+            if char == ',':
+                pos += 1
+                continue
+            if char == ']':
+                return
+            
+            try:
+                element, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element continues in the next chunk
+                break
+            yield element
+    
+    raise ValueError("JSON array ended unexpectedly")
+
+class ColumnBuilder:
+    """
+    Growable columnar store filled one API sample at a time.
+    
+    Rows go straight into preallocated int64 timestamp / float64 level
+    arrays (capacity doubles when full), so no list of sample dicts is
+    ever built.
+    """
+    
+    def __init__(self, cauldron_ids: List[str] = None):
+        # Column order; taken from the first sample when not given
+        self.cauldron_ids = list(cauldron_ids) if cauldron_ids else None
+        # Cauldrons present in the first sample, to detect upstream layout changes
+        self.sample_cauldron_ids = None
+        self.count = 0
+        self._timestamps = None
+        self._levels = None
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def add(self, sample: Dict):
+        """Write one {'timestamp', 'cauldron_levels'} sample into the next row"""
+        cauldron_levels = sample['cauldron_levels']
+        if self.sample_cauldron_ids is None:
+            self.sample_cauldron_ids = list(cauldron_levels.keys())
+            if self.cauldron_ids is None:
+                self.cauldron_ids = list(self.sample_cauldron_ids)
+        
+        if self._timestamps is None:
+            self._allocate(INITIAL_CAPACITY)
+        elif self.count == len(self._timestamps):
+            self._allocate(2 * len(self._timestamps))
+        
+        self._timestamps[self.count] = to_epoch_minute(sample['timestamp'])
+        self._levels[self.count] = [cauldron_levels.get(cauldron_id, 0) for cauldron_id in self.cauldron_ids]
+        self.count += 1
+    
+    def _allocate(self, capacity: int):
+        timestamps = np.empty(capacity, dtype=np.int64)
+        levels = np.empty((capacity, len(self.cauldron_ids)), dtype=np.float64)
+        if self._timestamps is not None:
+            timestamps[:self.count] = self._timestamps[:self.count]
+            levels[:self.count] = self._levels[:self.count]
+        self._timestamps, self._levels = timestamps, levels
+    
+    def columns(self) -> tuple:
+        """The filled rows as sorted (timestamps, levels) arrays"""
+        if self.count == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(self.cauldron_ids or [])), dtype=np.float64)
+        
+        timestamps = self._timestamps[:self.count]
+        levels = self._levels[:self.count]
+        
+        # Keep the timeline sorted (stable, so equal timestamps keep API order)
+        if np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind='stable')
+            return timestamps[order], levels[order]
+        return timestamps, levels
+
+def concat_builders(builders: List[ColumnBuilder]) -> ColumnBuilder:
+    """
+    Join builders filled from consecutive time windows into one.
+    
+    Columns are matched by cauldron id, so windows parsed independently
+    (possibly with different key orders) line up; the first non-empty
+    window decides the column order.
+    """
+    filled = [builder for builder in builders if len(builder)]
+    if not filled:
+        return builders[0] if builders else ColumnBuilder()
+    
+    merged = ColumnBuilder(filled[0].cauldron_ids)
+    merged.sample_cauldron_ids = filled[0].sample_cauldron_ids
+    
+    parts = []
+    for builder in filled:
+        timestamps, levels = builder.columns()
+        if builder.cauldron_ids != merged.cauldron_ids:
+            source = {cauldron_id: col for col, cauldron_id in enumerate(builder.cauldron_ids)}
+            reordered = np.zeros((len(levels), len(merged.cauldron_ids)), dtype=np.float64)
+            for col, cauldron_id in enumerate(merged.cauldron_ids):
+                if cauldron_id in source:
+                    reordered[:, col] = levels[:, source[cauldron_id]]
+            levels = reordered
+        parts.append((timestamps, levels))
+    
+    merged._timestamps = np.concatenate([timestamps for timestamps, _ in parts])
+    merged._levels = np.concatenate([levels for _, levels in parts])
+    merged.count = len(merged._timestamps)
+    return merged
+
+def read_samples(chunks: Iterable[bytes], cauldron_ids: List[str] = None) -> ColumnBuilder:
+    """Stream a /api/Data JSON array into a ColumnBuilder"""
+    builder = ColumnBuilder(cauldron_ids)
+    for sample in iter_json_array(chunks):
+        builder.add(sample)
+    return builder
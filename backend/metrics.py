@@ -0,0 +1,292 @@
+"""
+🔮 METRICS - STAGE TIMERS, COUNTERS AND A SAMPLING PROFILER
+Where analysis time goes, in Prometheus text format and flame-graph-ready stacks
+"""
+
+import os
+import sys
+import time
+import bisect
+import threading
+import contextlib
+from collections import Counter
+from typing import Callable, Iterable, Iterator
+
+PREFIX = 'truth_serum_'
+
+# Stage duration buckets (seconds): sub-millisecond index lookups up to multi-minute cold fetches
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Metric name (without prefix) -> (type, help)
+DESCRIPTIONS = {
+    'stage_seconds': ('histogram', 'Wall time of one run of an analysis stage (stages may nest)'),
+    'stage_last_seconds': ('gauge', 'Wall time of the most recent run of an analysis stage'),
+    'samples_processed_total': ('counter', 'Cauldron level samples parsed from upstream responses'),
+    'tickets_validated_total': ('counter', 'Ticket validations, re-validations included'),
+    'cache_hits_total': ('counter', 'Lookups answered from a cache'),
+    'cache_misses_total': ('counter', 'Lookups a cache could not answer'),
+    'cache_evictions_total': ('counter', 'Entries dropped from a bounded cache'),
+    'upstream_requests_total': ('counter', 'Requests made to the upstream API'),
+    'upstream_retries_total': ('counter', 'Upstream requests retried after an error'),
+    'analysis_jobs_total': ('counter', 'Finished analysis jobs'),
+    'startup_seconds': ('gauge', 'Seconds from process start to a start-up milestone')
+}
+
+# Seconds between two stack samples while profiling
+PROFILE_INTERVAL_SECONDS = 0.005
+
+class Metrics:
+    """
+    Thread-safe registry of counters, gauges and stage-time histograms.
+    
+    Updates are a dict operation under a lock, and instrumentation wraps
+    whole stages and batches (never single tickets), so the cost is a few
+    microseconds per analysis step. With enabled=False every update
+    returns immediately and stage() hands out one shared no-op context.
+    """
+    
+    def __init__(self, enabled: bool = True, buckets: tuple = STAGE_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.started_at = time.time()
+        # (name, labels) -> value; labels are sorted (key, value) pairs
+        self._counters = {}
+        self._gauges = {}
+        # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self._histograms = {}
+        # name -> (help, read) for gauges computed at scrape time
+        self._callbacks = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Add to a counter"""
+        if not self.enabled or not amount:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+    
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+    
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            histogram[slot] += 1
+            histogram[-1] += value
+    
+    def stage(self, name: str):
+        """Context manager timing one run of an analysis stage"""
+        if not self.enabled:
+            return NO_STAGE
+        return StageTimer(self, name)
+    
+    def record_stage(self, name: str, seconds: float):
+        self.observe('stage_seconds', seconds, stage=name)
+        self.set('stage_last_seconds', seconds, stage=name)
+    
+    def gauge_callback(self, name: str, help_text: str, read: Callable[[], float]):
+        """A gauge whose value is read when the metrics are rendered (None = not exported)"""
+        self._callbacks[name] = (help_text, read)
+    
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+        
+        gauges[('process_uptime_seconds', ())] = time.time() - self.started_at
+        descriptions = dict(DESCRIPTIONS, process_uptime_seconds=('gauge', 'Seconds since the API started'))
+        for name, (help_text, read) in self._callbacks.items():
+            try:
+                value = read()
+            except Exception:
+                value = None
+            if value is not None:
+                gauges[(name, ())] = value
+                descriptions[name] = ('gauge', help_text)
+        
+        families = {}
+        for series in (counters, gauges, histograms):
+            for name, labels in series:
+                families.setdefault(name, []).append(labels)
+        
+        lines = []
+        for name in sorted(families):
+            kind, help_text = descriptions.get(name, ('untyped', name.replace('_', ' ')))
+            lines.append(f'# HELP {PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+            for labels in sorted(families[name]):
+                key = (name, labels)
+                if key in histograms:
+                    lines.extend(self._histogram_lines(name, labels, histograms[key]))
+                else:
+                    lines.append(f'{PREFIX}{name}{format_labels(labels)} {format_value(counters.get(key, gauges.get(key)))}')
+        return '\n'.join(lines) + '\n'
+    
+    def _histogram_lines(self, name: str, labels: tuple, values: list) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), values):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else format_value(bound)
+            lines.append(f'{PREFIX}{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+        lines.append(f'{PREFIX}{name}_sum{format_labels(labels)} {format_value(values[-1])}')
+        lines.append(f'{PREFIX}{name}_count{format_labels(labels)} {cumulative}')
+        return lines
+
+class StageTimer:
+    """Times a `with` block into the stage histogram"""
+    
+    __slots__ = ('metrics', 'name', 'started')
+    
+    def __init__(self, metrics: Metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.metrics.record_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+NO_STAGE = contextlib.nullcontext()
+
+class WaitClock:
+    """
+    Wraps an iterator and adds up the time spent waiting for its items.
+    
+    Used on streamed HTTP bodies: the time spent in a parse loop minus
+    the time spent waiting for the network is the parse time.
+    """
+    
+    def __init__(self, items: Iterable):
+        self.items = iter(items)
+        self.seconds = 0.0
+    
+    def __iter__(self) -> Iterator:
+        return self
+    
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self.items)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+def format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+def format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+class SamplingProfiler:
+    """
+    Samples Python stacks from a background thread while it runs.
+    
+    Only the target thread and the threads started after start() (e.g.
+    the upstream fetch pool) are sampled, so idle request-serving threads
+    don't drown out the analysis. stop() returns the samples in the
+    collapsed "root;caller;callee count" format that flamegraph.pl,
+    speedscope and inferno read directly. Work done in other processes
+    (TRUTH_SERUM_WORKERS > 1) only shows up as the parent waiting.
+    """
+    
+    def __init__(self, thread_id: int = None, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._ignored = set()
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def start(self) -> 'SamplingProfiler':
+        self._ignored = {thread.ident for thread in threading.enumerate()} - {self.thread_id}
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> str:
+        """Stop sampling and return the collapsed stacks"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.samples.items()))
+    
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or thread_id in self._ignored:
+                    continue
+                self.samples[collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+
+def collapse(root: str, frame) -> str:
+    """One stack as 'root;outermost;...;innermost'"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    frames.append(root)
+    return ';'.join(reversed(frames))
+
+class StartupClock:
+    """
+    Seconds from process start to each start-up milestone.
+    
+    Every milestone is recorded the first time it is marked only (later
+    marks are a dict lookup), exported as the startup_seconds gauge and
+    kept in `milestones` for the status endpoint.
+    """
+    
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self.milestones = {}
+    
+    def mark(self, milestone: str):
+        if milestone in self.milestones:
+            return
+        seconds = self.milestones.setdefault(milestone, round(process_age(), 3))
+        self.metrics.set('startup_seconds', seconds, milestone=milestone)
+        print(f"⏱️  {milestone} {seconds:.2f}s after start")
+
+def process_age() -> float:
+    """Seconds since this process started (since this module was imported, where /proc is not available)"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Field 22 (starttime, in clock ticks after boot); the command name may contain spaces
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic() - IMPORTED_AT
+
+IMPORTED_AT = time.monotonic()
+
+def env_enabled(name: str, default: str = 'on') -> bool:
+    return os.environ.get(name, default).strip().lower() not in ('0', 'off', 'false', 'no')
+
+# Process-wide registry (TRUTH_SERUM_METRICS=off turns all instrumentation into no-ops)
+metrics = Metrics(enabled=env_enabled('TRUTH_SERUM_METRICS'))
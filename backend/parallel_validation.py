@@ -0,0 +1,127 @@
+"""
+🔮 PARALLEL VALIDATION - SHARD TICKETS ACROSS A PROCESS POOL
+Workers read the level matrix through shared memory, never through pickled samples
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from collections import defaultdict
+from typing import Dict, List
+from data_processor import DataProcessor
+from validation_results import RESULT_DTYPE
+
+class SharedColumns:
+    """
+    The processor's timestamp vector and level matrix, visible to other processes.
+    
+    Memory-mapped arrays are already shared through the OS page cache, so
+    workers just map the same file. In-memory arrays are copied once into
+    a multiprocessing.shared_memory block. Use as a context manager; the
+    blocks are unlinked on exit.
+    """
+    
+    def __init__(self, processor: DataProcessor):
+        self.blocks = []
+        self.spec = {
+            'cauldron_ids': processor.cauldron_ids,
+            'timestamps': self._share(processor.timestamps),
+            'levels': self._share(processor.levels)
+        }
+    
+    def _share(self, array: np.ndarray) -> Dict:
+        """Describe how a worker can attach to `array` without copying it"""
+        if isinstance(array, np.memmap) and array.filename is not None:
+            return {
+                'file': array.filename,
+                'offset': array.offset,
+                'dtype': array.dtype.str,
+                'shape': array.shape
+            }
+        
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self.blocks.append(block)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        return {'block': block.name, 'dtype': array.dtype.str, 'shape': array.shape}
+    
+    def __enter__(self) -> Dict:
+        return self.spec
+    
+    def __exit__(self, *exc_info):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+def attach_array(spec: Dict, blocks: List):
+    """Worker side of SharedColumns._share: a zero-copy view of the shared array"""
+    if 'file' in spec:
+        return np.memmap(spec['file'], dtype=spec['dtype'], mode='r',
+                         offset=spec['offset'], shape=tuple(spec['shape']))
+    
+    block = shared_memory.SharedMemory(name=spec['block'])
+    blocks.append(block)
+    return np.ndarray(tuple(spec['shape']), dtype=spec['dtype'], buffer=block.buf)
+
+def validate_shard(shared: Dict, fill_rates: Dict, timelines: Dict, tickets: List[Dict]) -> np.ndarray:
+    """
+    Process-pool task: validate every ticket of one or more cauldrons.
+    
+    A shard always holds complete (cauldron, date) groups, so the per-day
+    ticket counts match the serial path. `timelines` are the parent's
+    fill-rate timelines for the shard's cauldrons, so no worker re-reads
+    the whole history to rebuild them.
+    """
+    from fraud_detector import FraudDetector
+    
+    blocks = []
+    try:
+        timestamps = attach_array(shared['timestamps'], blocks)
+        levels = attach_array(shared['levels'], blocks)
+        
+        # Windowed: each worker only segments the days its own tickets need
+        processor = DataProcessor.from_columns(timestamps, levels, shared['cauldron_ids'], windowed=True)
+        processor.adopt_fill_rate_timelines(timelines)
+        detector = FraudDetector([], tickets, processor=processor, cauldron_fill_rates=fill_rates)
+        return detector.validate_batch(tickets)
+    finally:
+        # Drop array views before closing the blocks they point into
+        timestamps = levels = processor = detector = None
+        for block in blocks:
+            block.close()
+
+def shard_by_cauldron(tickets: List[Dict], shard_count: int) -> List[List[int]]:
+    """
+    Split ticket positions into at most `shard_count` shards of whole cauldrons.
+    
+    Cauldrons are handed out largest first to the currently smallest shard,
+    and each shard keeps its positions in ticket order, so the split is
+    deterministic.
+    """
+    positions_by_cauldron = defaultdict(list)
+    for position, ticket in enumerate(tickets):
+        positions_by_cauldron[ticket['cauldron_id']].append(position)
+    
+    shards = [[] for _ in range(max(1, min(shard_count, len(positions_by_cauldron))))]
+    for cauldron_id in sorted(positions_by_cauldron, key=lambda c: (-len(positions_by_cauldron[c]), c)):
+        smallest = min(range(len(shards)), key=lambda i: (len(shards[i]), i))
+        shards[smallest].extend(positions_by_cauldron[cauldron_id])
+    
+    return [sorted(shard) for shard in shards if shard]
+
+def validate_in_parallel(processor: DataProcessor, fill_rates: Dict, tickets: List[Dict], workers: int) -> np.ndarray:
+    """Validate `tickets` on a pool of `workers` processes; result rows come back in ticket order"""
+    shards = shard_by_cauldron(tickets, workers)
+    results = np.zeros(len(tickets), dtype=RESULT_DTYPE)
+    
+    with SharedColumns(processor) as shared, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(validate_shard, shared, fill_rates,
+                        processor.fill_rate_timelines({tickets[position]['cauldron_id'] for position in shard}),
+                        [tickets[position] for position in shard])
+            for shard in shards
+        ]
+        for shard, future in zip(shards, futures):
+            results[shard] = future.result()
+    
+    return results
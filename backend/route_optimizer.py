@@ -0,0 +1,390 @@
+"""
+🔮 ROUTE OPTIMIZER - PICKUP SCHEDULES THAT KEEP EVERY CAULDRON BELOW MAX VOLUME
+All-pairs travel times over the network graph, a capacitated VRP heuristic and local search
+"""
+
+import time
+import math
+import random
+import numpy as np
+from typing import Dict, List
+
+# Minutes a witch spends unloading at the market after every trip
+UNLOAD_MINUTES = 15
+
+DEFAULT_HORIZON_HOURS = 24
+MAX_HORIZON_HOURS = 168
+
+# Wall-clock budget of the local search (construction always runs to the end)
+DEFAULT_TIME_BUDGET_MS = 250
+MAX_TIME_BUDGET_MS = 2000
+
+# Budgets a request is snapped to, so a snapshot holds a few plans per horizon
+TIME_BUDGET_TIERS_MS = (50, 250, 1000, 2000)
+
+# Cost of one minute of lateness (a cauldron overflowing) in travel minutes
+LATE_PENALTY = 1000
+
+# Pickups smaller than this are dropped from the plan
+MIN_PICKUP_VOLUME = 1.0
+
+class RoutingNetwork:
+    """
+    Shortest travel times between every pair of nodes of background['network'].
+    
+    Edges are travelled both ways. Floyd-Warshall runs once, as n
+    vectorized relaxations of the n × n matrix, when the network is
+    loaded; `next_hop` keeps enough to rebuild every shortest path.
+    """
+    
+    def __init__(self, background: Dict):
+        self.market_id = background['enchanted_market']['id']
+        self.nodes = [self.market_id] + [cauldron['id'] for cauldron in background['cauldrons']]
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        
+        size = len(self.nodes)
+        times = np.full((size, size), np.inf)
+        np.fill_diagonal(times, 0)
+        for edge in background.get('network', {}).get('edges', []):
+            a, b = self.index.get(edge['from']), self.index.get(edge['to'])
+            if a is None or b is None:
+                continue
+            minutes = min(times[a, b], float(edge['travel_time_minutes']))
+            times[a, b] = times[b, a] = minutes
+        
+        next_hop = np.where(np.isfinite(times), np.arange(size)[None, :], -1)
+        for k in range(size):
+            through = times[:, k, None] + times[None, k, :]
+            shorter = through < times
+            times = np.where(shorter, through, times)
+            next_hop = np.where(shorter, next_hop[:, k, None], next_hop)
+        
+        self.times = times
+        self.next_hop = next_hop
+    
+    def travel_minutes(self, a: str, b: str) -> float:
+        return float(self.times[self.index[a], self.index[b]])
+    
+    def path(self, a: str, b: str) -> List[str]:
+        """Nodes of the shortest path from a to b, both included ([] when unreachable)"""
+        i, j = self.index[a], self.index[b]
+        if self.next_hop[i, j] < 0:
+            return []
+        path = [i]
+        while i != j:
+            i = int(self.next_hop[i, j])
+            path.append(i)
+        return [self.nodes[node] for node in path]
+
+def pickup_tasks(network: RoutingNetwork, cauldrons: List[Dict], fill_rates: Dict[str, float],
+                 levels: Dict[str, float], horizon: float, chunk: float) -> tuple:
+    """
+    The pickups that keep every cauldron below max_volume over `horizon` minutes.
+    
+    Each cauldron's inflow over the horizon is split into loads of at most
+    `chunk` units. Load k can be collected once the cauldron holds it
+    (ready) and must be collected before the level, with loads 1..k-1
+    gone, would reach max_volume (due; at the latest the horizon end).
+    Returns (tasks, cauldron rows, unreachable cauldron ids).
+    """
+    tasks = []
+    rows = []
+    unreachable = []
+    for cauldron in cauldrons:
+        cauldron_id = cauldron['id']
+        max_volume = float(cauldron['max_volume'])
+        rate = max(float(fill_rates.get(cauldron_id, 0.1)), 1e-9)
+        level = min(max(float(levels.get(cauldron_id, 0.0)), 0.0), max_volume)
+        
+        rows.append({
+            'cauldron_id': cauldron_id,
+            'max_volume': max_volume,
+            'level': level,
+            'fill_rate': rate,
+            'hours_to_overflow': (max_volume - level) / rate / 60,
+            'inflow': rate * horizon
+        })
+        if not math.isfinite(network.travel_minutes(network.market_id, cauldron_id)):
+            unreachable.append(cauldron_id)
+            continue
+        
+        collected = 0.0
+        remaining = rate * horizon
+        while remaining >= MIN_PICKUP_VOLUME:
+            volume = min(chunk, remaining)
+            ready = max(0.0, (collected + volume - level) / rate)
+            due = min(horizon, max(0.0, (max_volume - level + collected) / rate))
+            tasks.append({'cauldron_id': cauldron_id, 'node': network.index[cauldron_id], 'volume': volume,
+                          'ready': min(ready, due), 'due': due})
+            collected += volume
+            remaining -= volume
+    return tasks, rows, unreachable
+
+class RoutePlanner:
+    """
+    Multi-trip, capacitated pickup routing with time windows.
+    
+    A witch's plan is one sequence of pickups; a trip back to the market
+    (plus UNLOAD_MINUTES) is inserted whenever the next load would not fit
+    her capacity. Cost = travel minutes + LATE_PENALTY × minutes late.
+    Pickups are inserted earliest-due-first at the cheapest end of any
+    witch's plan, then relocate, swap and 2-opt moves are tried in a
+    seeded random order until no move improves the cost or the time
+    budget runs out.
+    """
+    
+    def __init__(self, network: RoutingNetwork, tasks: List[Dict], capacities: List[float], horizon: float,
+                 seed: int = 0):
+        self.network = network
+        self.tasks = tasks
+        self.capacities = capacities
+        self.horizon = horizon
+        self.random = random.Random(seed)
+        # Plain lists: the cost function is tight scalar Python
+        self._times = network.times.tolist()
+        self._market = network.index[network.market_id]
+        self._node = [task['node'] for task in tasks]
+        self._volume = [task['volume'] for task in tasks]
+        self._ready = [task['ready'] for task in tasks]
+        self._due = [task['due'] for task in tasks]
+        self.iterations = 0
+    
+    def cost(self, sequence: List[int], capacity: float) -> float:
+        travel, late = self._simulate(sequence, capacity)
+        return travel + LATE_PENALTY * late
+    
+    def _simulate(self, sequence: List[int], capacity: float) -> tuple:
+        """(travel minutes, minutes late) of one witch's pickup sequence"""
+        times, market = self._times, self._market
+        clock = travel = late = load = 0.0
+        here = market
+        for task in sequence:
+            volume = self._volume[task]
+            if load + volume > capacity + 1e-9:
+                leg = times[here][market]
+                travel += leg
+                clock += leg + UNLOAD_MINUTES
+                load = 0.0
+                here = market
+            node = self._node[task]
+            leg = times[here][node]
+            travel += leg
+            clock += leg
+            if clock < self._ready[task]:
+                clock = self._ready[task]
+            if clock > self._due[task]:
+                late += clock - self._due[task]
+            load += volume
+            here = node
+        if sequence:
+            travel += times[here][market]
+        return travel, late
+    
+    def construct(self) -> List[List[int]]:
+        plans = [[] for _ in self.capacities]
+        costs = [0.0 for _ in self.capacities]
+        for task in sorted(range(len(self.tasks)), key=lambda task: (self._due[task], self._ready[task])):
+            best = None
+            for witch, capacity in enumerate(self.capacities):
+                added = self.cost(plans[witch] + [task], capacity) - costs[witch]
+                if best is None or added < best[0]:
+                    best = (added, witch)
+            witch = best[1]
+            plans[witch].append(task)
+            costs[witch] += best[0]
+        return plans
+    
+    def improve(self, plans: List[List[int]], deadline: float) -> List[List[int]]:
+        """Local search (relocate, swap, 2-opt) until a local optimum or time.perf_counter() > deadline"""
+        costs = [self.cost(plan, capacity) for plan, capacity in zip(plans, self.capacities)]
+        moves = (self._relocate, self._swap, self._two_opt)
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for move in self.random.sample(moves, len(moves)):
+                while time.perf_counter() < deadline and move(plans, costs, deadline):
+                    improved = True
+        return plans
+    
+    def _positions(self, plans: List[List[int]]) -> List[tuple]:
+        positions = [(witch, position) for witch, plan in enumerate(plans) for position in range(len(plan))]
+        self.random.shuffle(positions)
+        return positions
+    
+    def _relocate(self, plans, costs, deadline) -> bool:
+        """Move one pickup to the first place (any witch) that lowers the total cost"""
+        for witch, position in self._positions(plans):
+            if time.perf_counter() > deadline:
+                return False
+            source = plans[witch]
+            task = source[position]
+            without = source[:position] + source[position + 1:]
+            without_cost = self.cost(without, self.capacities[witch])
+            for target in range(len(plans)):
+                base = without if target == witch else plans[target]
+                base_cost = without_cost if target == witch else costs[target]
+                capacity = self.capacities[target]
+                for insert_at in range(len(base) + 1):
+                    self.iterations += 1
+                    candidate = base[:insert_at] + [task] + base[insert_at:]
+                    candidate_cost = self.cost(candidate, capacity)
+                    if target == witch:
+                        gain = costs[witch] - candidate_cost
+                    else:
+                        gain = costs[witch] + costs[target] - without_cost - candidate_cost
+                    if gain > 1e-6:
+                        plans[witch], costs[witch] = without, without_cost
+                        plans[target], costs[target] = candidate, candidate_cost
+                        return True
+        return False
+    
+    def _swap(self, plans, costs, deadline) -> bool:
+        """Exchange two pickups (same or different witches) when that lowers the total cost"""
+        positions = self._positions(plans)
+        for first, (witch_a, position_a) in enumerate(positions):
+            if time.perf_counter() > deadline:
+                return False
+            for witch_b, position_b in positions[first + 1:]:
+                self.iterations += 1
+                if witch_a == witch_b:
+                    plan = list(plans[witch_a])
+                    plan[position_a], plan[position_b] = plan[position_b], plan[position_a]
+                    new_cost = self.cost(plan, self.capacities[witch_a])
+                    if costs[witch_a] - new_cost > 1e-6:
+                        plans[witch_a], costs[witch_a] = plan, new_cost
+                        return True
+                    continue
+                plan_a, plan_b = list(plans[witch_a]), list(plans[witch_b])
+                plan_a[position_a], plan_b[position_b] = plan_b[position_b], plan_a[position_a]
+                cost_a = self.cost(plan_a, self.capacities[witch_a])
+                cost_b = self.cost(plan_b, self.capacities[witch_b])
+                if costs[witch_a] + costs[witch_b] - cost_a - cost_b > 1e-6:
+                    plans[witch_a], costs[witch_a] = plan_a, cost_a
+                    plans[witch_b], costs[witch_b] = plan_b, cost_b
+                    return True
+        return False
+    
+    def _two_opt(self, plans, costs, deadline) -> bool:
+        """Reverse a stretch of one witch's plan when that lowers its cost"""
+        for witch in self.random.sample(range(len(plans)), len(plans)):
+            plan = plans[witch]
+            for start in range(len(plan) - 1):
+                if time.perf_counter() > deadline:
+                    return False
+                for end in range(start + 2, len(plan) + 1):
+                    self.iterations += 1
+                    candidate = plan[:start] + plan[start:end][::-1] + plan[end:]
+                    candidate_cost = self.cost(candidate, self.capacities[witch])
+                    if costs[witch] - candidate_cost > 1e-6:
+                        plans[witch], costs[witch] = candidate, candidate_cost
+                        return True
+        return False
+    
+    def describe(self, plans: List[List[int]], couriers: List[Dict]) -> List[Dict]:
+        """Every witch's plan as trips of timed stops, with the shortest paths between them"""
+        network = self.network
+        market = network.market_id
+        routes = []
+        for plan, courier, capacity in zip(plans, couriers, self.capacities):
+            trips = []
+            clock = 0.0
+            here = market
+            trip = None
+            for task in plan + [None]:
+                volume = self._volume[task] if task is not None else 0.0
+                if trip is not None and (task is None or trip['load'] + volume > capacity + 1e-9):
+                    clock += network.travel_minutes(here, market)
+                    trip['path'] += network.path(here, market)[1:]
+                    trip['return_minute'] = clock
+                    clock += UNLOAD_MINUTES
+                    trips.append(trip)
+                    here, trip = market, None
+                if task is None:
+                    break
+                if trip is None:
+                    trip = {'depart_minute': clock, 'return_minute': None, 'load': 0.0, 'stops': [],
+                            'path': [market]}
+                
+                cauldron_id = self.tasks[task]['cauldron_id']
+                clock += network.travel_minutes(here, cauldron_id)
+                trip['path'] += network.path(here, cauldron_id)[1:]
+                arrive = clock
+                clock = max(clock, self._ready[task])
+                trip['stops'].append({
+                    'cauldron_id': cauldron_id,
+                    'arrive_minute': arrive,
+                    'pickup_minute': clock,
+                    'volume': volume,
+                    'ready_minute': self._ready[task],
+                    'due_minute': self._due[task],
+                    'late_minutes': max(0.0, clock - self._due[task])
+                })
+                trip['load'] += volume
+                here = cauldron_id
+            
+            travel, late = self._simulate(plan, capacity)
+            routes.append({
+                'courier_id': courier['courier_id'],
+                'name': courier.get('name'),
+                'capacity': capacity,
+                'trips': trips,
+                'pickups': len(plan),
+                'volume': sum(self._volume[task] for task in plan),
+                'travel_minutes': travel,
+                'late_minutes': late,
+                'finish_minute': trips[-1]['return_minute'] + UNLOAD_MINUTES if trips else 0.0
+            })
+        return routes
+
+def snap_time_budget(time_budget_ms: float) -> int:
+    """The largest budget tier within `time_budget_ms` (the smallest tier for anything below it)"""
+    return max((tier for tier in TIME_BUDGET_TIERS_MS if tier <= time_budget_ms), default=TIME_BUDGET_TIERS_MS[0])
+
+def optimize_routes(background: Dict, fill_rates: Dict[str, float], levels: Dict[str, float] = None,
+                    horizon_hours: float = DEFAULT_HORIZON_HOURS, time_budget_ms: float = DEFAULT_TIME_BUDGET_MS,
+                    network: RoutingNetwork = None, seed: int = 0) -> Dict:
+    """
+    Pickup routes for every courier over the next `horizon_hours`.
+    
+    Loads are the size of the smallest courier capacity, so any witch can
+    take any pickup. The answer takes about `time_budget_ms` at most
+    (construction plus whatever local search fits), and reports the
+    search effort next to the plan.
+    """
+    started = time.perf_counter()
+    network = network if network is not None else RoutingNetwork(background)
+    couriers = background['couriers']
+    capacities = [float(courier['max_carrying_capacity']) for courier in couriers]
+    horizon = horizon_hours * 60
+    
+    tasks, cauldrons, unreachable = pickup_tasks(network, background['cauldrons'], fill_rates, levels or {},
+                                                 horizon, min(capacities) if capacities else 0)
+    planner = RoutePlanner(network, tasks, capacities, horizon, seed=seed)
+    plans = planner.construct() if capacities else []
+    initial_cost = sum(planner.cost(plan, capacity) for plan, capacity in zip(plans, capacities))
+    plans = planner.improve(plans, started + time_budget_ms / 1000)
+    
+    routes = planner.describe(plans, couriers)
+    late_cauldrons = sorted({stop['cauldron_id'] for route in routes for trip in route['trips']
+                             for stop in trip['stops'] if stop['late_minutes'] > 0})
+    travel = sum(route['travel_minutes'] for route in routes)
+    late = sum(route['late_minutes'] for route in routes)
+    
+    return {
+        'horizon_hours': horizon_hours,
+        'routes': routes,
+        'cauldrons': cauldrons,
+        'summary': {
+            'pickups': len(tasks),
+            'volume': sum(task['volume'] for task in tasks),
+            'travel_minutes': travel,
+            'late_minutes': late,
+            'makespan_minutes': max((route['finish_minute'] for route in routes), default=0.0),
+            'overflow_risk': late_cauldrons + unreachable,
+            'unreachable': unreachable,
+            'initial_cost': initial_cost,
+            'cost': travel + LATE_PENALTY * late,
+            'iterations': planner.iterations,
+            'solve_ms': (time.perf_counter() - started) * 1000
+        }
+    }
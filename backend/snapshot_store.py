@@ -0,0 +1,176 @@
+"""
+🔮 SNAPSHOT STORE - THE LAST PUBLISHED ANALYSIS, KEPT ON DISK
+Lets a restarted API serve its previous results while the fresh analysis runs
+"""
+
+import os
+import json
+from typing import Dict
+from analysis_worker import AnalysisSnapshot
+from encoded_response import dumps
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+STORE_VERSION = 2
+
+# Analysis keys saved as result rows + tickets rather than as JSON
+RESULT_KEYS = ('tickets', 'flagged_tickets')
+
+class SnapshotStore:
+    """
+    On-disk copy of the latest analysis snapshot.
+    
+    Layout of the snapshot directory:
+        meta.json                - version, snapshot version and the files below
+        analysis-<version>.json  - every analysis key but the ticket lists
+        rows-<version>.bin       - raw RESULT_DTYPE rows, one per ticket
+        tickets-<version>.jsonl  - the tickets behind the rows, one JSON object per line
+    
+    The detector's ticket list only ever grows, so consecutive saves of
+    one detector append the new tickets to the same file; a new detector
+    (full rebuild, restart) starts a new one. meta.json is replaced
+    atomically after everything it points at has been written, and only
+    then are older files deleted, so a crash mid-save leaves the previous
+    snapshot readable. NumPy and the result types are imported on first
+    load/save, not with this module.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, 'meta.json')
+        # (ticket list, tickets written, file name) of the last save from this process
+        self._appending = None
+        self._ticket_bytes = 0
+    
+    def load(self) -> AnalysisSnapshot:
+        """The saved snapshot, marked as restored (None when there is none or it is unreadable)"""
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        
+        import numpy as np
+        from validation_results import ValidationResults, RESULT_DTYPE
+        
+        try:
+            with open(self._path(meta['analysis_file']), 'rb') as f:
+                analysis = loads(f.read())
+            tickets = self._read_tickets(meta['tickets_file'], meta['tickets'])
+            rows = meta['rows']
+            if rows == 0:
+                result_rows = np.zeros(0, dtype=RESULT_DTYPE)
+            else:
+                result_rows = np.memmap(self._path(meta['rows_file']), dtype=RESULT_DTYPE, mode='r', shape=(rows,))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Saved snapshot is unreadable ({e}), ignoring it")
+            return None
+        if len(tickets) < rows:
+            print("⚠️  Saved snapshot is truncated, ignoring it")
+            return None
+        
+        results = ValidationResults(result_rows, tickets)
+        analysis['tickets'] = results
+        analysis['flagged_tickets'] = results.flagged()
+        return AnalysisSnapshot(meta['snapshot_version'], analysis, meta['job_id'], created_at=meta['created_at'],
+                                restored=True)
+    
+    def save(self, snapshot: AnalysisSnapshot):
+        """Persist a published snapshot (replacing the previous one)"""
+        import numpy as np
+        
+        results = snapshot.analysis['tickets']
+        version = snapshot.version
+        os.makedirs(self.directory, exist_ok=True)
+        
+        analysis_file = f'analysis-{version}.json'
+        with open(self._path(analysis_file), 'wb') as f:
+            f.write(dumps({key: value for key, value in snapshot.analysis.items() if key not in RESULT_KEYS}))
+        
+        rows_file = f'rows-{version}.bin'
+        with open(self._path(rows_file), 'wb') as f:
+            f.write(np.ascontiguousarray(results.rows).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        
+        tickets = results.source_tickets() if results.positions is not None else results.tickets
+        tickets_file, written = self._append_tickets(tickets, len(results), version)
+        
+        self._write_json(self.meta_path, {
+            'version': STORE_VERSION,
+            'snapshot_version': version,
+            'job_id': snapshot.job_id,
+            'created_at': snapshot.created_at,
+            'analysis_file': analysis_file,
+            'rows_file': rows_file,
+            'rows': len(results),
+            'tickets_file': tickets_file,
+            'tickets': written
+        })
+        self._remove_unused({analysis_file, rows_file, tickets_file, 'meta.json'})
+    
+    def clear(self):
+        """Delete the saved snapshot"""
+        self._appending = None
+        self._remove_unused(set())
+    
+    def _append_tickets(self, tickets: list, count: int, version: int) -> tuple:
+        """Write tickets[:count] to a ticket file (appending when possible); returns (file name, tickets in it)"""
+        appending = self._appending
+        if appending is not None and appending[0] is tickets and appending[1] <= count:
+            _, start, tickets_file = appending
+            mode = 'ab'
+        else:
+            start, tickets_file, mode = 0, f'tickets-{version}.jsonl', 'wb'
+        
+        with open(self._path(tickets_file), mode) as f:
+            if mode == 'ab':
+                # Drop whatever an interrupted append left behind
+                f.truncate(self._ticket_bytes)
+            for ticket in tickets[start:count]:
+                f.write(dumps(ticket) + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+            self._ticket_bytes = f.tell()
+        
+        self._appending = (tickets, count, tickets_file)
+        return tickets_file, count
+    
+    def _read_tickets(self, tickets_file: str, count: int) -> list:
+        with open(self._path(tickets_file), 'rb') as f:
+            lines = f.read().split(b'\n', count)[:count]
+        return loads(b'[' + b','.join(lines) + b']')
+    
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('version') == STORE_VERSION else None
+    
+    def _remove_unused(self, keep: set):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name not in keep:
+                os.remove(self._path(name))
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+    
+    def _write_json(self, path: str, payload):
+        """Write JSON atomically (temp file + rename)"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+def loads(body: bytes):
+    """Parse JSON with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
@@ -0,0 +1,123 @@
+"""
+🔮 SYNTHETIC DATA - SEEDED CAULDRON HISTORIES AND TICKETS
+Realistic fake /api/Data and /api/Tickets payloads for offline runs and benchmarks
+
+Usage:
+    python synthetic_data.py --cauldrons 12 --days 14 --seed 1 -o fixture.json
+    python fixture_server.py fixture.json
+"""
+
+import json
+import argparse
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+MINUTES_PER_DAY = 1440
+
+START_DATE = datetime(2025, 10, 30, tzinfo=timezone.utc)
+
+def generate(cauldrons: int = 12, days: int = 7, seed: int = 0, sample_minutes: int = 1,
+             fill_rate_range: tuple = (0.08, 0.22), drain_rate_range: tuple = (2.0, 4.0),
+             drains_per_day: tuple = (1, 2), couriers: int = 5, capacity: float = 1000,
+             noise: float = 0.02, fraud_rate: float = 0.1, suspicious_rate: float = 0.1,
+             start: datetime = START_DATE) -> Dict:
+    """
+    A seeded history in the upstream API schema.
+    
+    Every cauldron fills at its own constant rate (plus sensor noise) and
+    is drained 1-2 times a day by a courier who collects at a constant
+    drain rate. Drains last just long enough to take out what flowed in
+    that day, so levels stay stationary at any history length. Each
+    drain gets one ticket reporting the collected amount (within ±3%);
+    `fraud_rate` of the tickets over-/under-report by 35-60% and
+    `suspicious_rate` by 12-20%.
+    
+    Returns {'historical_data', 'tickets', 'truth'} where truth holds the
+    generated fill rates and the ids of the tampered tickets.
+    """
+    rng = np.random.default_rng(seed)
+    cauldron_ids = [f"cauldron_{i:03d}" for i in range(1, cauldrons + 1)]
+    courier_ids = [f"courier_witch_{i:02d}" for i in range(1, couriers + 1)]
+    
+    minutes = np.arange(0, days * MINUTES_PER_DAY, sample_minutes)
+    fill_rates = rng.uniform(*fill_rate_range, cauldrons)
+    drain_rates = rng.uniform(*drain_rate_range, cauldrons)
+    
+    # Level change per sample interval, minus the drains
+    inflow = fill_rates * sample_minutes + rng.normal(0, noise, (len(minutes), cauldrons))
+    
+    drains = []
+    for col in range(cauldrons):
+        for day in range(days):
+            count = int(rng.integers(drains_per_day[0], drains_per_day[1] + 1))
+            # Each drain takes out its share of the day's inflow
+            duration = max(1, int(round(fill_rates[col] * MINUTES_PER_DAY / (count * drain_rates[col]))))
+            slot = MINUTES_PER_DAY // count
+            for k in range(count):
+                offset = int(rng.integers(0, max(1, slot - duration - sample_minutes)))
+                start_minute = day * MINUTES_PER_DAY + k * slot + offset
+                rows = (minutes >= start_minute) & (minutes < start_minute + duration)
+                inflow[rows, col] -= drain_rates[col] * sample_minutes
+                drains.append((col, day, duration * drain_rates[col]))
+    
+    initial = rng.uniform(0.2, 0.4, cauldrons) * capacity
+    levels = np.clip(initial + np.cumsum(inflow, axis=0), 0, capacity)
+    
+    timestamps = [(start + timedelta(minutes=int(minute))).isoformat().replace('+00:00', 'Z') for minute in minutes]
+    historical_data = [
+        {'timestamp': timestamp, 'cauldron_levels': dict(zip(cauldron_ids, row))}
+        for timestamp, row in zip(timestamps, np.round(levels, 2).tolist())
+    ]
+    
+    tickets = []
+    fraudulent, suspicious = [], []
+    for number, (col, day, collected) in enumerate(drains, start=1):
+        ticket_id = f"TT_{start.strftime('%Y%m%d')}_{number:06d}"
+        roll = rng.random()
+        if roll < fraud_rate:
+            # Mostly inflated, sometimes under-reported (skimming)
+            error = rng.uniform(0.35, 0.6) * (1 if rng.random() < 0.8 else -1)
+            fraudulent.append(ticket_id)
+        elif roll < fraud_rate + suspicious_rate:
+            error = rng.uniform(0.12, 0.2) * rng.choice([-1, 1])
+            suspicious.append(ticket_id)
+        else:
+            error = rng.uniform(-0.03, 0.03)
+        
+        tickets.append({
+            'ticket_id': ticket_id,
+            'cauldron_id': cauldron_ids[col],
+            'amount_collected': round(float(collected * (1 + error)), 2),
+            'courier_id': courier_ids[int(rng.integers(0, couriers))],
+            'date': (start + timedelta(days=day)).date().isoformat()
+        })
+    
+    return {
+        'historical_data': historical_data,
+        'tickets': tickets,
+        'truth': {
+            'fill_rates': dict(zip(cauldron_ids, fill_rates.tolist())),
+            'fraudulent_ticket_ids': fraudulent,
+            'suspicious_ticket_ids': suspicious
+        }
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic fixture for fixture_server.py")
+    parser.add_argument('--cauldrons', type=int, default=12)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample-minutes', type=int, default=1)
+    parser.add_argument('--fraud-rate', type=float, default=0.1)
+    parser.add_argument('--suspicious-rate', type=float, default=0.1)
+    parser.add_argument('-o', '--output', default='fixture.json')
+    args = parser.parse_args()
+    
+    data = generate(cauldrons=args.cauldrons, days=args.days, seed=args.seed, sample_minutes=args.sample_minutes,
+                    fraud_rate=args.fraud_rate, suspicious_rate=args.suspicious_rate)
+    with open(args.output, 'w') as f:
+        json.dump(data, f)
+    
+    print(f"🧪 Wrote {len(data['historical_data'])} data points and {len(data['tickets'])} tickets "
+          f"({len(data['truth']['fraudulent_ticket_ids'])} fraudulent) to {args.output}")
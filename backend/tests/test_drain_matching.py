@@ -0,0 +1,58 @@
+"""
+DrainMatcher itineraries: reachable drains pass, impossible ones are flagged
+"""
+
+import numpy as np
+import pytest
+from data_processor import DataProcessor, date_to_day, MINUTES_PER_DAY
+from drain_matching import DrainMatcher
+from route_optimizer import RoutingNetwork
+
+DATE = '2025-10-30'
+DRAIN_MINUTES = 40
+TRAVEL_MINUTES = 30
+
+BACKGROUND = {
+    'enchanted_market': {'id': 'market_001'},
+    'cauldrons': [{'id': 'cauldron_a'}, {'id': 'cauldron_b'}],
+    'network': {'edges': [{'from': 'cauldron_a', 'to': 'cauldron_b', 'travel_time_minutes': TRAVEL_MINUTES}]}
+}
+
+def one_day(drain_starts: dict) -> DataProcessor:
+    """A day of 1-minute samples filling at 0.5/min, each cauldron drained once from its given minute"""
+    timestamps = date_to_day(DATE) * MINUTES_PER_DAY + np.arange(MINUTES_PER_DAY, dtype=np.int64)
+    columns = []
+    for cauldron_id in sorted(drain_starts):
+        levels = 100 + 0.5 * np.arange(MINUTES_PER_DAY, dtype=np.float64)
+        start = drain_starts[cauldron_id]
+        levels[start:start + DRAIN_MINUTES] -= 3.5 * np.arange(1, DRAIN_MINUTES + 1)
+        levels[start + DRAIN_MINUTES:] -= 3.5 * DRAIN_MINUTES
+        columns.append(levels)
+    return DataProcessor.from_columns(timestamps, np.column_stack(columns), sorted(drain_starts), windowed=False)
+
+def match(drain_starts: dict, network=None) -> dict:
+    processor = one_day(drain_starts)
+    tickets = [
+        {'ticket_id': f'TT_{i}', 'cauldron_id': cauldron_id, 'amount_collected': 140.0,
+         'courier_id': 'courier_witch_01', 'date': DATE}
+        for i, cauldron_id in enumerate(sorted(drain_starts))
+    ]
+    matcher = DrainMatcher(processor, processor.calculate_all_fill_rates(), network)
+    return matcher.match(tickets)
+
+def test_reachable_itinerary_is_valid():
+    # cauldron_a's drain ends at 340, cauldron_b is 30 minutes away and drained from 400
+    matches = match({'cauldron_a': 300, 'cauldron_b': 400}, RoutingNetwork(BACKGROUND))
+    assert np.all(matches['end'] > 0)
+    assert not matches['conflict'].any()
+
+def test_unreachable_itinerary_is_flagged():
+    matches = match({'cauldron_a': 300, 'cauldron_b': 350}, RoutingNetwork(BACKGROUND))
+    assert matches['conflict'].all()
+
+@pytest.mark.parametrize('with_network', [True, False])
+def test_same_window_at_two_cauldrons_is_flagged(with_network):
+    # Identical start/end at different cauldrons is not one shared drain
+    matches = match({'cauldron_a': 300, 'cauldron_b': 300}, RoutingNetwork(BACKGROUND) if with_network else None)
+    assert matches['start'][0] == matches['start'][1] and matches['end'][0] == matches['end'][1]
+    assert matches['conflict'].all()
@@ -0,0 +1,35 @@
+"""
+Windowed drain segmentation must find exactly the events of the full pass
+"""
+
+import pytest
+from synthetic_data import generate
+from data_processor import DataProcessor, samples_to_columns
+
+def processors(seed: int, sample_minutes: int = 1):
+    history = generate(cauldrons=6, days=5, seed=seed, sample_minutes=sample_minutes)['historical_data']
+    cauldron_ids = sorted(history[0]['cauldron_levels'])
+    timestamps, levels = samples_to_columns(history, cauldron_ids)
+    full = DataProcessor.from_columns(timestamps, levels, cauldron_ids, windowed=False)
+    windowed = DataProcessor.from_columns(timestamps, levels, cauldron_ids, windowed=True)
+    return full, windowed
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3, 4])
+@pytest.mark.parametrize('sample_minutes', [1, 5])
+def test_windowed_events_match_full_pass(seed, sample_minutes):
+    full, windowed = processors(seed, sample_minutes)
+    for cauldron_id in full.cauldron_ids:
+        for day in full.day_index:
+            assert windowed._events_on_day(cauldron_id, day) == full._events_on_day(cauldron_id, day), \
+                (cauldron_id, day)
+
+def test_drain_starting_on_last_step_of_day():
+    # seed 3: cauldron_006 starts draining on the last sample of epoch day 20394
+    full, windowed = processors(3)
+    assert len(full._events_on_day('cauldron_006', 20394)) == 2
+    assert windowed._events_on_day('cauldron_006', 20394) == full._events_on_day('cauldron_006', 20394)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_windowed_drain_cadence_matches_full_pass(seed):
+    full, windowed = processors(seed)
+    assert windowed.cauldron_dynamics() == full.cauldron_dynamics()
@@ -0,0 +1,52 @@
+"""
+Pre-encoded responses: strong ETags, 304 on a match, compressed variants of the same body
+"""
+
+import gzip
+import json
+import pytest
+from flask import Flask, request
+from encoded_response import EncodedResponse
+
+app = Flask(__name__)
+
+PAYLOAD = {'summary': {'total_tickets': 3}, 'tickets': [{'ticket_id': f'TT_{i}', 'amount': i * 1.5} for i in range(50)]}
+
+def respond(encoded: EncodedResponse, **headers):
+    with app.test_request_context(headers=headers):
+        return encoded.response(request)
+
+def test_matching_if_none_match_returns_304():
+    encoded = EncodedResponse(PAYLOAD)
+    first = respond(encoded)
+    assert first.status_code == 200
+    assert json.loads(first.get_data()) == PAYLOAD
+    
+    again = respond(encoded, **{'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+@pytest.mark.parametrize('if_none_match', ['W/{etag}', '"other", {etag}', '*'])
+def test_weak_listed_and_wildcard_tags_match(if_none_match):
+    encoded = EncodedResponse(PAYLOAD)
+    etag = respond(encoded).headers['ETag']
+    assert respond(encoded, **{'If-None-Match': if_none_match.format(etag=etag)}).status_code == 304
+
+def test_changed_body_is_sent_again():
+    etag = respond(EncodedResponse(PAYLOAD)).headers['ETag']
+    changed = EncodedResponse(dict(PAYLOAD, summary={'total_tickets': 4}))
+    response = respond(changed, **{'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_gzip_variant_has_its_own_tag():
+    encoded = EncodedResponse(PAYLOAD)
+    plain = respond(encoded)
+    zipped = respond(encoded, **{'Accept-Encoding': 'gzip'})
+    
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+    # Either variant's tag means the client already has this body
+    assert respond(encoded, **{'If-None-Match': zipped.headers['ETag']}).status_code == 304
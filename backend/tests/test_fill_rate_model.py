@@ -0,0 +1,97 @@
+"""
+FillRateTimeline: batch-independent results, change detection, no false alarms
+"""
+
+import numpy as np
+import pytest
+import data_processor
+from synthetic_data import generate
+from data_processor import DataProcessor, samples_to_columns
+from fill_rate_model import FillRateTimeline
+
+START_MINUTE = 29000000
+
+def stepped_series(seed: int = 1, days: int = 6):
+    """1-minute levels filling at 0.12, then 0.18 from minute 3000, then 0.09 from 7000, drained daily"""
+    rng = np.random.default_rng(seed)
+    count = days * 1440
+    rate = np.where(np.arange(count) < 3000, 0.12, 0.18)
+    rate[7000:] = 0.09
+    levels = np.cumsum(rate + rng.normal(0, 0.02, count)) + 200
+    for start in range(500, count, 1440):
+        levels[start:start + 40] -= np.arange(1, 41) * 2.5
+        levels[start + 40:] -= 100
+    return np.arange(count, dtype=np.int64) + START_MINUTE, np.round(levels, 2)
+
+def one_pass(timestamps, levels) -> FillRateTimeline:
+    timeline = FillRateTimeline()
+    timeline.extend(timestamps, levels)
+    return timeline
+
+def test_known_rate_steps_are_detected():
+    timestamps, levels = stepped_series()
+    segments = one_pass(timestamps, levels).segments()
+    
+    assert len(segments) == 3
+    # The first segment defers to the whole-history median
+    assert segments[0] == {'start_minute': START_MINUTE + 1, 'rate': None}
+    for segment, (change, rate) in zip(segments[1:], [(3000, 0.18), (7000, 0.09)]):
+        assert abs(segment['start_minute'] - START_MINUTE - change) <= 10
+        assert segment['rate'] == pytest.approx(rate, rel=0.05)
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_random_splits_match_one_pass(seed):
+    timestamps, levels = stepped_series(seed)
+    expected = one_pass(timestamps, levels).segments()
+    
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.choice(np.arange(1, len(timestamps)), size=40, replace=False))
+    timeline = FillRateTimeline()
+    for batch_timestamps, batch_levels in zip(np.split(timestamps, cuts), np.split(levels, cuts)):
+        timeline.extend(batch_timestamps, batch_levels)
+    assert timeline.segments() == expected
+
+def test_one_sample_at_a_time_matches_one_pass():
+    timestamps, levels = stepped_series()
+    expected = one_pass(timestamps, levels).segments()
+    
+    timeline = FillRateTimeline()
+    for row in range(len(timestamps)):
+        timeline.extend(timestamps[row:row + 1], levels[row:row + 1])
+    assert timeline.segments() == expected
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_no_change_point_on_stationary_history(seed):
+    # Constant fill rates; seed 1 / cauldron_003 used to get a false change point
+    history = generate(days=14, seed=seed)['historical_data']
+    cauldron_ids = sorted(history[0]['cauldron_levels'])
+    timestamps, levels = samples_to_columns(history, cauldron_ids)
+    for col, cauldron_id in enumerate(cauldron_ids):
+        assert len(one_pass(timestamps, levels[:, col]).segments()) == 1, cauldron_id
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_no_change_keeps_median_expected_amounts(seed):
+    # Without a change point, expected amounts are visible drain + median rate × duration as before
+    processor = DataProcessor(generate(days=7, seed=seed)['historical_data'])
+    fill_rates = processor.calculate_all_fill_rates()
+    for cauldron_id, events in processor.detect_all_drain_events().items():
+        assert len(processor.fill_rate_timeline(cauldron_id).segments()) == 1
+        for event in events:
+            expected = event['drain_amount'] + fill_rates[cauldron_id] * event['duration_minutes']
+            assert processor.calculate_expected_collection(cauldron_id, event, fill_rates[cauldron_id]) == expected
+
+def test_appended_rows_resume_from_each_cursor(monkeypatch):
+    # Tiny row blocks, so the first pass over the history is streamed in many pieces
+    monkeypatch.setattr(data_processor, 'FILL_RATE_BLOCK_BYTES', 4096)
+    timestamps, first = stepped_series(seed=2)
+    _, second = stepped_series(seed=3)
+    levels = np.column_stack((first, second))
+    expected = [one_pass(timestamps, levels[:, col]).segments() for col in range(2)]
+    
+    processor = DataProcessor.from_columns(timestamps[:2000], levels[:2000], ['a', 'b'], windowed=True)
+    processor.fill_rate_timeline('a')
+    for lo, hi in ((2000, 2001), (2001, 5000), (5000, len(timestamps))):
+        processor.append_columns(timestamps[lo:hi], levels[lo:hi])
+    
+    assert processor._fill_rate_cursors == {'a': len(timestamps), 'b': len(timestamps)}
+    assert [processor.fill_rate_timeline(cauldron_id).segments() for cauldron_id in ('a', 'b')] == expected
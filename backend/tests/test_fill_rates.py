@@ -0,0 +1,57 @@
+"""
+Vectorized fill-rate estimation must match the original per-cauldron loop
+"""
+
+import numpy as np
+import pytest
+import data_processor
+from synthetic_data import generate
+from data_processor import DataProcessor, samples_to_columns
+
+def loop_fill_rate(timestamps: np.ndarray, levels: np.ndarray) -> float:
+    """The per-step loop calculate_fill_rate used before it was vectorized"""
+    if len(levels) < 10:
+        return 0.1
+    fill_rates = []
+    for i in range(1, len(levels)):
+        time_diff = float(timestamps[i] - timestamps[i - 1])
+        level_diff = levels[i] - levels[i - 1]
+        if level_diff > 0 and time_diff > 0:
+            rate = level_diff / time_diff
+            if 0.01 < rate < 5:
+                fill_rates.append(rate)
+    return np.median(fill_rates) if fill_rates else 0.1
+
+def processor_with_flat_cauldron(seed: int, sample_minutes: int) -> DataProcessor:
+    history = generate(cauldrons=5, days=3, seed=seed, sample_minutes=sample_minutes)['historical_data']
+    cauldron_ids = sorted(history[0]['cauldron_levels'])
+    timestamps, levels = samples_to_columns(history, cauldron_ids)
+    # A cauldron that only ever drains: no qualifying step, so the 0.1 fallback applies
+    draining = np.linspace(900, 100, len(timestamps))[:, None]
+    return DataProcessor.from_columns(timestamps, np.hstack((levels, draining)), cauldron_ids + ['cauldron_flat'],
+                                      windowed=False)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('sample_minutes', [1, 5])
+def test_vectorized_rates_match_loop(seed, sample_minutes):
+    processor = processor_with_flat_cauldron(seed, sample_minutes)
+    rates = processor.calculate_all_fill_rates()
+    
+    for cauldron_id in processor.cauldron_ids:
+        expected = loop_fill_rate(processor.timestamps, processor._column(cauldron_id))
+        assert rates[cauldron_id] == expected, cauldron_id
+        assert processor.calculate_fill_rate(cauldron_id) == expected, cauldron_id
+    assert rates['cauldron_flat'] == 0.1
+
+def test_column_blocks_match_single_pass(monkeypatch):
+    processor = processor_with_flat_cauldron(1, 1)
+    whole = processor.calculate_all_fill_rates()
+    # Room for two columns' working arrays per block
+    monkeypatch.setattr(data_processor, 'FILL_RATE_BLOCK_BYTES', len(processor.timestamps) * 8 * 4 * 2)
+    assert len(list(processor._column_blocks())) == 3
+    assert processor.calculate_all_fill_rates() == whole
+
+def test_short_history_falls_back():
+    processor = processor_with_flat_cauldron(0, 1)
+    short = DataProcessor.from_columns(processor.timestamps[:5], processor.levels[:5], processor.cauldron_ids)
+    assert set(short.calculate_all_fill_rates().values()) == {0.1}
@@ -0,0 +1,47 @@
+"""
+Fleet sizing: the throughput lower bound is exact on a hand-sized case and never above a feasible fleet
+"""
+
+import math
+import numpy as np
+import pytest
+from route_optimizer import RoutingNetwork, UNLOAD_MINUTES
+from fleet_sizing import FleetSimulator, size_fleet, DISPATCH_THRESHOLDS
+
+def background(travel_minutes, max_volumes, capacity: float = 100.0) -> dict:
+    """A star network: the market linked to every cauldron"""
+    cauldrons = [{'id': f'cauldron_{i:03d}', 'max_volume': volume} for i, volume in enumerate(max_volumes, 1)]
+    return {
+        'enchanted_market': {'id': 'market_001'},
+        'cauldrons': cauldrons,
+        'couriers': [{'courier_id': 'courier_witch_01', 'max_carrying_capacity': capacity}],
+        'network': {'edges': [{'from': 'market_001', 'to': cauldron['id'], 'travel_time_minutes': minutes}
+                              for cauldron, minutes in zip(cauldrons, travel_minutes)]}
+    }
+
+def test_lower_bound_by_hand():
+    # 600 minutes filling at 5/min into 100 units: 2900 overflow = 29 trips of 10 + 10 + unloading
+    data = background([10], [100])
+    simulator = FleetSimulator(RoutingNetwork(data), data['cauldrons'], {'cauldron_001': 5.0}, {}, 100.0)
+    work = 29 * (10 + 10 + UNLOAD_MINUTES)
+    assert simulator.lower_bound(600) == math.ceil(work / (600 + 10 + UNLOAD_MINUTES)) == 2
+    assert not any(simulator.run(1, 600, threshold)['feasible'] for threshold in DISPATCH_THRESHOLDS)
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_no_smaller_fleet_than_the_bound_keeps_up(seed):
+    rng = np.random.default_rng(seed)
+    count = 8
+    data = background(rng.integers(5, 60, count).tolist(), rng.integers(300, 1000, count).tolist())
+    fill_rates = {cauldron['id']: float(rate) for cauldron, rate in zip(data['cauldrons'], rng.uniform(0.5, 3, count))}
+    levels = {cauldron['id']: float(rng.uniform(0, 0.9) * cauldron['max_volume']) for cauldron in data['cauldrons']}
+    
+    simulator = FleetSimulator(RoutingNetwork(data), data['cauldrons'], fill_rates, levels, 100.0)
+    bound = simulator.lower_bound(24 * 60)
+    assert bound >= 1
+    for couriers in range(bound):
+        assert not any(simulator.run(couriers, 24 * 60, threshold)['feasible'] for threshold in DISPATCH_THRESHOLDS)
+    
+    plan = size_fleet(data, fill_rates, levels, horizon_hours=24)
+    assert plan['lower_bound'] == bound
+    assert plan['fleet_size'] is not None and plan['fleet_size'] >= bound
+    assert {trip['witch'] for trip in plan['schedule']} <= set(range(1, plan['fleet_size'] + 1))
@@ -0,0 +1,61 @@
+"""
+Overflow forecast: exact time to max volume on a linear series, bands around it
+"""
+
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from data_processor import DataProcessor, MINUTES_PER_DAY
+from forecasting import forecast_levels, parse_horizon
+
+AS_OF = '2025-11-02T12:00:00+00:00'
+
+def forecast(level, max_volume, rate, dynamics=None, horizon_hours=24):
+    cauldrons = [{'id': 'cauldron_001', 'max_volume': max_volume}]
+    levels = {'as_of': AS_OF, 'levels': {'cauldron_001': level}}
+    return forecast_levels(cauldrons, levels, {'cauldron_001': rate}, {'cauldron_001': dynamics or {}},
+                           horizon_hours)['forecasts'][0]
+
+def test_linear_series_reaches_max_on_time():
+    # 100 -> 500 at 2/min takes 200 minutes, between two 15-minute series points
+    result = forecast(100.0, 500.0, 2.0)
+    expected_at = (datetime.fromisoformat(AS_OF) + timedelta(minutes=200)).isoformat()
+    
+    assert result['minutes_to_overflow'] == pytest.approx(200)
+    assert result['overflow_at'] == expected_at
+    # No noise and no drains: the band collapses onto the expected path
+    assert result['overflow_earliest'] == result['overflow_latest'] == expected_at
+    assert result['series']['expected'][:3] == [100.0, 130.0, 160.0]
+
+def test_noisy_rate_widens_the_band():
+    dynamics = {'fill_rate': 2.0, 'fill_rate_std': 0.5, 'fill_rate_steps': 240}
+    result = forecast(100.0, 500.0, 2.0, dynamics)
+    earliest = datetime.fromisoformat(result['overflow_earliest'])
+    latest = datetime.fromisoformat(result['overflow_latest'])
+    
+    assert result['minutes_to_overflow'] == pytest.approx(200)
+    assert earliest < datetime.fromisoformat(result['overflow_at']) < latest
+
+def test_no_overflow_within_horizon():
+    result = forecast(100.0, 500.0, 0.1, horizon_hours=24)
+    assert result['minutes_to_overflow'] is None and result['overflow_at'] is None
+
+def test_linear_history_end_to_end():
+    # Three days filling at 0.5/min from 10 without a drain: max 3000 is hit 3000 - 2169.5 = 830.5 units later
+    timestamps = 20394 * MINUTES_PER_DAY + np.arange(3 * MINUTES_PER_DAY, dtype=np.int64)
+    levels = (10 + 0.5 * np.arange(3 * MINUTES_PER_DAY, dtype=np.float64))[:, None]
+    processor = DataProcessor.from_columns(timestamps, levels, ['cauldron_001'], windowed=False)
+    
+    result = forecast_levels([{'id': 'cauldron_001', 'max_volume': 3000.0}], processor.latest_levels(),
+                             processor.calculate_all_fill_rates(), processor.cauldron_dynamics(), 48)
+    assert result['forecasts'][0]['minutes_to_overflow'] == pytest.approx(830.5 / 0.5)
+    assert result['summary']['at_risk'] == ['cauldron_001']
+
+@pytest.mark.parametrize('value, hours', [('24', 24), ('48h', 48), ('7d', 168)])
+def test_parse_horizon(value, hours):
+    assert parse_horizon(value) == hours
+
+@pytest.mark.parametrize('value', ['0', '8d', 'soon'])
+def test_parse_horizon_rejects(value):
+    with pytest.raises(ValueError):
+        parse_horizon(value)
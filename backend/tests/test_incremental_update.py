@@ -0,0 +1,31 @@
+"""
+FraudDetector.update must give exactly the analysis of a full rebuild
+"""
+
+import numpy as np
+import pytest
+from synthetic_data import generate
+from fraud_detector import FraudDetector
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_update_matches_full_rebuild(seed):
+    history = generate(cauldrons=6, days=5, seed=seed)
+    samples, tickets = history['historical_data'], history['tickets']
+    # Cut mid-day; tickets of the cut day arrive early and are re-validated once the day completes
+    split = len(samples) * 3 // 5
+    cut_date = samples[split]['timestamp'][:10]
+    early = [ticket for ticket in tickets if ticket['date'] <= cut_date]
+    late = [ticket for ticket in tickets if ticket['date'] > cut_date]
+    
+    detector = FraudDetector(samples[:split], early)
+    detector.analyze_all_tickets()
+    updated = detector.update(samples[split:], late)
+    
+    # Fill rates stay as first estimated, so the rebuild is given the same ones
+    rebuilt = FraudDetector(samples, early + late, cauldron_fill_rates=detector.cauldron_fill_rates)
+    expected = rebuilt.analyze_all_tickets()
+    
+    assert np.array_equal(updated['tickets'].rows, expected['tickets'].rows)
+    assert updated['summary'] == expected['summary']
+    assert updated['witch_trust_scores'] == expected['witch_trust_scores']
+    assert updated['witch_trust_windows'] == expected['witch_trust_windows']
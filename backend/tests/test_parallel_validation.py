@@ -0,0 +1,19 @@
+"""
+Sharded validation on a process pool must give exactly the serial analysis
+"""
+
+import numpy as np
+import pytest
+from synthetic_data import generate
+from fraud_detector import FraudDetector
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_parallel_matches_serial(seed):
+    # seed 3 has a drain starting on the last sample of a day (windowed workers used to miss it)
+    history = generate(cauldrons=6, days=5, seed=seed)
+    serial = FraudDetector(history['historical_data'], history['tickets']).analyze_all_tickets()
+    parallel = FraudDetector(history['historical_data'], history['tickets']).analyze_all_tickets(workers=3)
+    
+    assert np.array_equal(parallel['tickets'].rows, serial['tickets'].rows)
+    assert parallel['witch_trust_scores'] == serial['witch_trust_scores']
+    assert parallel['summary'] == serial['summary']
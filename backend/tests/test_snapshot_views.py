@@ -0,0 +1,32 @@
+"""
+Per-snapshot derived views: built once per key, without holding up other keys
+"""
+
+import threading
+from analysis_worker import AnalysisSnapshot
+
+def test_slow_view_does_not_block_other_keys():
+    snapshot = AnalysisSnapshot(1, {'summary': {}}, 'job')
+    started, release = threading.Event(), threading.Event()
+    builds = []
+    
+    def slow(analysis):
+        builds.append('slow')
+        started.set()
+        release.wait(5)
+        return 'slow view'
+    
+    callers = [threading.Thread(target=snapshot.derived, args=('slow', slow)) for _ in range(3)]
+    for caller in callers:
+        caller.start()
+    assert started.wait(5)
+    
+    # Answered while 'slow' is still being built
+    assert snapshot.derived('fast', lambda analysis: 'fast view') == 'fast view'
+    release.set()
+    for caller in callers:
+        caller.join(5)
+    
+    assert builds == ['slow']
+    assert snapshot.derived('slow', slow) == 'slow view'
+    assert snapshot._building == {}
@@ -0,0 +1,72 @@
+"""
+TicketIndex pages, filters and sorts exactly like a plain Python pass over the results
+"""
+
+import pytest
+from synthetic_data import generate
+from fraud_detector import FraudDetector
+from ticket_index import TicketIndex, SORTABLE_FIELDS
+from validation_results import STATUS_CODES, STATUSES
+
+@pytest.fixture(scope='module')
+def results():
+    history = generate(cauldrons=6, days=8, seed=4)
+    return FraudDetector(history['historical_data'], history['tickets']).analyze_all_tickets()['tickets']
+
+def brute_force(records, statuses=None, couriers=None, cauldrons=None, date_from=None, date_to=None, search=None,
+                sort=None, descending=False, offset=0, limit=50):
+    """The query as list comprehensions: (page ids, total, status counts ignoring the status filter)"""
+    def matches(record):
+        text = (record['ticket_id'] + ' ' + record['cauldron_id'] + ' ' + record['courier_id']).lower()
+        return ((couriers is None or record['courier_id'] in couriers)
+                and (cauldrons is None or record['cauldron_id'] in cauldrons)
+                and (date_from is None or record['date'] >= date_from)
+                and (date_to is None or record['date'] <= date_to)
+                and (search is None or search.lower() in text))
+    
+    filtered = [record for record in records if matches(record)]
+    counts = {status: sum(record['status'] == status for record in filtered) for status in STATUSES}
+    selected = [record for record in filtered if statuses is None or record['status'] in statuses]
+    if sort == 'status':
+        selected.sort(key=lambda record: STATUS_CODES[record['status']], reverse=descending)
+    elif sort == 'ticket_id':
+        selected.sort(key=lambda record: record['ticket_id'].lower(), reverse=descending)
+    elif sort is not None:
+        selected.sort(key=lambda record: record[sort], reverse=descending)
+    elif descending:
+        selected.reverse()
+    page = selected[offset:offset + limit]
+    return [record['ticket_id'] for record in page], len(selected), counts
+
+QUERIES = [
+    {},
+    {'offset': 10, 'limit': 7},
+    {'offset': 10000},
+    {'statuses': ['suspicious', 'fraudulent']},
+    {'statuses': []},
+    {'couriers': ['courier_witch_02', 'courier_witch_04'], 'sort': 'reported_amount', 'descending': True},
+    {'cauldrons': ['cauldron_003'], 'date_from': '2025-11-01', 'date_to': '2025-11-03'},
+    {'search': 'WITCH_01', 'statuses': ['valid'], 'sort': 'date', 'descending': True, 'offset': 3, 'limit': 5},
+    {'search': '00004', 'sort': 'percent_error'},
+    {'descending': True, 'limit': 20}
+] + [{'sort': field, 'descending': descending, 'limit': 1000}
+     for field in SORTABLE_FIELDS for descending in (False, True)]
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_query_matches_brute_force(results, query):
+    index = TicketIndex(results)
+    page = index.query(**query)
+    ids, total, counts = brute_force(results.to_json(), **query)
+    
+    assert [ticket['ticket_id'] for ticket in page['tickets']] == ids
+    assert page['total'] == total
+    assert page['status_counts'] == counts
+
+def test_projection_and_bad_queries(results):
+    index = TicketIndex(results)
+    page = index.query(fields=['ticket_id', 'status'], limit=3)
+    assert [set(ticket) for ticket in page['tickets']] == [{'ticket_id', 'status'}] * 3
+    
+    for bad in ({'fields': ['nope']}, {'sort': 'reason'}, {'statuses': ['lost']}):
+        with pytest.raises(ValueError):
+            index.query(**bad)
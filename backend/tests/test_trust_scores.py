@@ -0,0 +1,62 @@
+"""
+TrustScoreEngine windows and decay must match a brute-force pass over the live tickets
+"""
+
+import numpy as np
+import pytest
+from trust_scores import TrustScoreEngine, score_records
+from validation_results import STATUSES, VALID
+
+COURIERS = [f'courier_witch_{i:02d}' for i in range(1, 7)]
+
+def brute_force(tickets, weight):
+    """score_records over per-witch counts and flagged amounts, each ticket weighed by weight(day)"""
+    counts = np.zeros((len(COURIERS), len(STATUSES)))
+    amounts = np.zeros(len(COURIERS))
+    for courier, day, status, difference in tickets:
+        counts[courier, status] += weight(day)
+        if status != VALID:
+            amounts[courier] += weight(day) * abs(difference)
+    return counts, amounts
+
+def assert_records_match(actual, expected):
+    assert [record['courier_id'] for record in actual] == [record['courier_id'] for record in expected]
+    for got, want in zip(actual, expected):
+        assert got == pytest.approx(want, abs=0.011)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_windows_and_decay_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    engine = TrustScoreEngine()
+    codes = [engine.courier_code(courier_id) for courier_id in COURIERS]
+    live = []
+    
+    # Batches extend the day range both ways; some tickets are taken out and re-validated
+    for first_day, last_day in ((20400, 20430), (20380, 20400), (20430, 20520), (20300, 20520)):
+        size = int(rng.integers(20, 200))
+        batch = list(zip(rng.choice(codes, size).tolist(), rng.integers(first_day, last_day + 1, size).tolist(),
+                         rng.integers(0, len(STATUSES), size).tolist(), (rng.integers(-400, 400, size) / 2).tolist()))
+        engine.add(*map(np.array, zip(*batch)))
+        live += batch
+        
+        redone = [live.pop(int(rng.integers(len(live)))) for _ in range(min(15, len(live) // 3))]
+        engine.add(*map(np.array, zip(*redone)), sign=-1)
+        revalidated = [(courier, day, int(rng.integers(0, len(STATUSES))), difference)
+                       for courier, day, _, difference in redone]
+        engine.add(*map(np.array, zip(*revalidated)))
+        live += revalidated
+    
+    last_day = max(day for _, day, _, _ in live)
+    everything = brute_force(live, lambda day: 1)
+    assert engine.scores() == score_records(COURIERS, everything[0].astype(int), everything[1])
+    
+    for window_days in (1, 7, 30, 90, 1000):
+        for as_of in (last_day, last_day - 45):
+            counts, amounts = brute_force(live, lambda day: as_of - window_days < day <= as_of)
+            assert_records_match(engine.scores(window_days, as_of), score_records(COURIERS, counts.astype(int), amounts))
+    
+    for half_life in (7, 30):
+        for as_of in (last_day, last_day - 60):
+            counts, amounts = brute_force(live, lambda day: 0.5 ** ((as_of - day) / half_life) if day <= as_of else 0)
+            assert_records_match(engine.decayed_scores(half_life, as_of),
+                                 score_records(COURIERS, counts, amounts, decimals=2))
@@ -0,0 +1,39 @@
+"""
+Windowed fetches must cut the data's own time range evenly and reassemble it exactly
+"""
+
+import numpy as np
+import pytest
+from synthetic_data import generate
+from fixture_server import serve
+from upstream import UpstreamClient, END_OF_TIME
+
+@pytest.fixture(scope='module')
+def client():
+    history = generate(cauldrons=4, days=3, seed=5)
+    server = serve({'historical_data': history['historical_data'], 'tickets': history['tickets']}, background=True)
+    yield UpstreamClient(f"http://127.0.0.1:{server.server_address[1]}", max_windows=16)
+    server.shutdown()
+
+def test_windows_spread_samples_evenly(client):
+    windows = client.windows(0)
+    counts = [len(client.fetch_window(start, end)) for start, end in windows]
+    
+    assert len(windows) == client.max_windows
+    assert windows[0][0] == 0 and windows[-1][1] == END_OF_TIME
+    assert all(end + 1 == start for (_, end), (start, _) in zip(windows[:-1], windows[1:]))
+    # The history is in the past: no catch-all window may hold most of it
+    assert max(counts) <= 2 * sum(counts) / len(windows)
+    assert min(counts) > 0
+
+def test_windowed_fetch_matches_single_fetch(client):
+    merged_timestamps, merged_levels = client.fetch(0)['history'].columns()
+    whole = client.fetch_window(0, END_OF_TIME)
+    timestamps, levels = whole.columns()
+    
+    assert np.array_equal(merged_timestamps, timestamps)
+    assert np.array_equal(merged_levels, levels)
+
+def test_windows_after_the_last_sample(client):
+    last = int(client.fetch_window(0, END_OF_TIME).columns()[0][-1]) * 60
+    assert client.windows(last + 60) == [(last + 60, END_OF_TIME)]
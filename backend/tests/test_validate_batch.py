@@ -0,0 +1,30 @@
+"""
+The vectorized batch validation must agree with validate_ticket on every ticket
+"""
+
+import pytest
+from synthetic_data import generate
+from fraud_detector import FraudDetector
+from validation_results import result_record
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_batch_matches_single_ticket_validation(seed):
+    history = generate(cauldrons=6, days=5, seed=seed)
+    tickets = list(history['tickets'])
+    # Days without a drain: a small report passes, a large one does not
+    tickets.append({'ticket_id': 'TT_NO_DRAIN_SMALL', 'cauldron_id': 'cauldron_001', 'amount_collected': 80.0,
+                    'courier_id': 'courier_witch_01', 'date': '2024-01-01'})
+    tickets.append({'ticket_id': 'TT_NO_DRAIN_LARGE', 'cauldron_id': 'cauldron_002', 'amount_collected': 250.0,
+                    'courier_id': 'courier_witch_02', 'date': '2024-01-01'})
+    detector = FraudDetector(history['historical_data'], tickets)
+    
+    rows = detector.validate_batch(detector.tickets)
+    assert len(rows) == len(detector.tickets)
+    for row, ticket in zip(rows, detector.tickets):
+        batch = result_record(row.tolist(), ticket)
+        single = detector.validate_ticket(ticket)
+        assert batch['status'] == single['status'], ticket['ticket_id']
+        assert batch['expected_amount'] == pytest.approx(single['expected_amount'], rel=1e-12, abs=1e-9), \
+            ticket['ticket_id']
+        assert batch['percent_error'] == pytest.approx(single['percent_error'], rel=1e-12, abs=1e-9), \
+            ticket['ticket_id']
@@ -0,0 +1,188 @@
+"""
+🔮 TICKET INDEX - PAGED, FILTERED AND PROJECTED TICKET QUERIES
+Built once per analysis snapshot; a query is a few vectorized passes plus one page of dicts
+"""
+
+import numpy as np
+from typing import Dict, List
+from data_processor import date_to_day
+from validation_results import ValidationResults, STATUSES, STATUS_CODES, RESULT_FIELDS
+
+SORTABLE_FIELDS = ('ticket_id', 'cauldron_id', 'courier_id', 'date', 'reported_amount',
+                   'expected_amount', 'difference', 'percent_error', 'status')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+class TicketIndex:
+    """
+    Column indexes over one snapshot's validated tickets.
+    
+    Categorical fields are stored as integer codes (ids sorted, so codes
+    also sort), dates as epoch days; statuses and amounts are the result
+    columns themselves. Filters become boolean masks, sort orders are
+    argsorts computed once per field and direction, and only the
+    requested page is turned into (projected) dicts.
+    """
+    
+    def __init__(self, results: ValidationResults):
+        self.results = results
+        self.fields = list(RESULT_FIELDS)
+        tickets = results.source_tickets()
+        
+        self.status_codes = results.status.astype(np.int8)
+        self.courier_ids, self.courier_codes = self._encode([t['courier_id'] for t in tickets])
+        self.cauldron_ids, self.cauldron_codes = self._encode([t['cauldron_id'] for t in tickets])
+        
+        # Few distinct dates: parse each once
+        dates, date_codes = self._encode([t['date'] for t in tickets])
+        self.days = np.array([date_to_day(date) for date in dates], dtype=np.int64)[date_codes]
+        
+        # Lower-cased ticket ids for free-text search
+        self.search_ids = np.char.lower(np.array([t['ticket_id'] for t in tickets], dtype=str))
+        
+        self.status_totals = self._status_counts(None)
+        self._sort_orders = {}
+    
+    @staticmethod
+    def _encode(values: List[str]) -> tuple:
+        """Sorted distinct values plus each row's code into them"""
+        if not values:
+            return np.zeros(0, dtype=str), np.zeros(0, dtype=np.int32)
+        
+        # Dictionary-encode in first-seen order, then renumber by sorted value
+        first_seen = {}
+        codes = np.fromiter((first_seen.setdefault(value, len(first_seen)) for value in values),
+                            dtype=np.int32, count=len(values))
+        distinct = sorted(first_seen)
+        rank = np.empty(len(distinct), dtype=np.int32)
+        rank[[first_seen[value] for value in distinct]] = np.arange(len(distinct), dtype=np.int32)
+        return np.array(distinct, dtype=str), rank[codes]
+    
+    def _codes_for(self, distinct: np.ndarray, values: List[str]) -> np.ndarray:
+        """Codes of the requested values that exist in this snapshot"""
+        if len(distinct) == 0:
+            return np.zeros(0, dtype=np.int64)
+        values = np.array(values, dtype=str)
+        positions = np.searchsorted(distinct, values)
+        found = (positions < len(distinct)) & (distinct[np.minimum(positions, len(distinct) - 1)] == values)
+        return positions[found]
+    
+    def query(self, statuses: List[str] = None, couriers: List[str] = None, cauldrons: List[str] = None,
+              date_from: str = None, date_to: str = None, search: str = None, sort: str = None,
+              descending: bool = False, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE,
+              fields: List[str] = None) -> Dict:
+        """
+        One page of tickets matching every given filter.
+        
+        statuses/couriers/cauldrons match any of the listed values (None = no
+        filter, an empty list matches nothing), the date
+        range is inclusive, `search` is a case-insensitive substring of the
+        ticket, cauldron or courier id. Without `sort` tickets keep their
+        analysis order. status_counts counts the matches per status
+        ignoring the status filter (for filter buttons).
+        """
+        if fields is not None:
+            unknown = [field for field in fields if field not in self.fields]
+            if unknown:
+                raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        if sort is not None and sort not in SORTABLE_FIELDS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        unknown = [status for status in statuses or () if status not in STATUS_CODES]
+        if unknown:
+            raise ValueError(f"Unknown status(es): {', '.join(unknown)}")
+        
+        mask = self._filter_mask(couriers, cauldrons, date_from, date_to, search)
+        status_counts = self._status_counts(mask) if mask is not None else self.status_totals
+        
+        if statuses is not None:
+            in_status = np.isin(self.status_codes, [STATUS_CODES[status] for status in statuses])
+            mask = in_status if mask is None else mask & in_status
+        
+        order = self._sort_order(sort, descending)
+        if mask is None:
+            selected = order
+        elif order is None:
+            selected = np.flatnonzero(mask)
+        else:
+            selected = order[mask[order]]
+        
+        total = len(self.results) if selected is None else len(selected)
+        offset = max(0, offset)
+        if selected is None:
+            page = np.arange(offset, min(offset + limit, total))
+        else:
+            page = selected[offset:offset + limit]
+        
+        return {
+            'tickets': [self._project(record, fields) for record in self.results.records(page)],
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'status_counts': status_counts
+        }
+    
+    def _filter_mask(self, couriers, cauldrons, date_from, date_to, search) -> np.ndarray:
+        """Rows matching the non-status filters (None when nothing is filtered)"""
+        mask = None
+        
+        def narrow(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+        
+        if couriers:
+            narrow(np.isin(self.courier_codes, self._codes_for(self.courier_ids, couriers)))
+        if cauldrons:
+            narrow(np.isin(self.cauldron_codes, self._codes_for(self.cauldron_ids, cauldrons)))
+        if date_from:
+            narrow(self.days >= date_to_day(date_from))
+        if date_to:
+            narrow(self.days <= date_to_day(date_to))
+        if search:
+            needle = search.lower()
+            # Ids shared by many tickets are matched once per distinct value
+            matches = np.char.find(self.search_ids, needle) >= 0
+            for distinct, codes in ((self.courier_ids, self.courier_codes), (self.cauldron_ids, self.cauldron_codes)):
+                hits = np.flatnonzero(np.char.find(np.char.lower(distinct), needle) >= 0)
+                if len(hits):
+                    matches |= np.isin(codes, hits)
+            narrow(matches)
+        
+        return mask
+    
+    def _status_counts(self, mask: np.ndarray) -> Dict[str, int]:
+        codes = self.status_codes if mask is None else self.status_codes[mask]
+        counts = np.bincount(codes, minlength=len(STATUSES))
+        return {status: int(counts[code]) for code, status in enumerate(STATUSES)}
+    
+    def _sort_order(self, field: str, descending: bool) -> np.ndarray:
+        """Stable argsort of all tickets by `field` (None = analysis order), memoized"""
+        if field is None:
+            return np.arange(len(self.results))[::-1] if descending else None
+        
+        key = (field, descending)
+        if key not in self._sort_orders:
+            values = self._sort_key(field)
+            # Negating (rather than reversing) keeps ties in analysis order
+            self._sort_orders[key] = np.argsort(-values if descending else values, kind='stable')
+        return self._sort_orders[key]
+    
+    def _sort_key(self, field: str) -> np.ndarray:
+        """Numeric column that sorts like `field`"""
+        if field == 'status':
+            return self.status_codes.astype(np.int64)
+        if field == 'courier_id':
+            return self.courier_codes.astype(np.int64)
+        if field == 'cauldron_id':
+            return self.cauldron_codes.astype(np.int64)
+        if field == 'date':
+            return self.days
+        if field == 'ticket_id':
+            return np.unique(self.search_ids, return_inverse=True)[1].astype(np.int64)
+        return self.results.rows[field].astype(np.float64)
+    
+    @staticmethod
+    def _project(ticket: Dict, fields: List[str]) -> Dict:
+        if fields is None:
+            return ticket
+        return {field: ticket[field] for field in fields}
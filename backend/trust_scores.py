@@ -0,0 +1,198 @@
+"""
+🔮 TRUST SCORES - RUNNING PER-WITCH AGGREGATES WITH WINDOWS AND DECAY
+Witch scores from per-day partial counts, so no query rescans the ticket history
+"""
+
+import numpy as np
+from typing import Dict, List
+from validation_results import VALID, SUSPICIOUS, FRAUDULENT, STATUSES
+
+# Trust score penalties
+SUSPICIOUS_PENALTY = 2   # Was -3, now -2
+FRAUDULENT_PENALTY = 8   # Was -15, now -8
+
+# Rolling windows served next to the all-time scores (days, ending on the latest ticket day)
+TRUST_WINDOWS = {'7d': 7, '30d': 30, '90d': 90}
+
+# Half-life of a ticket's weight in the decayed scores
+TRUST_HALF_LIFE_DAYS = 30
+
+# add() switches from scattered adds to a bincount over every cell once a
+# batch has at least 1/BINCOUNT_RATIO as many tickets as there are (witch, day) cells
+BINCOUNT_RATIO = 4
+
+class TrustScoreEngine:
+    """
+    Per-witch, per-day status counts and fraud amounts, updated incrementally.
+    
+    add() folds validated tickets in (or, with sign=-1, takes them back
+    out before they are re-validated), touching only their (witch, day)
+    cells. All-time and rolling-window scores are differences of a prefix
+    sum over the day axis, built once per change and then O(witches) per
+    window; decayed scores weigh each day by 0.5 ** (age / half-life),
+    O(witches × days). Neither depends on how many tickets there are, so
+    scoring the roster stays cheap over years of history.
+    """
+    
+    def __init__(self):
+        # Interned courier ids, in first-seen order (ties in a score keep this order)
+        self.courier_ids = []
+        self._codes = {}
+        # Epoch day of column 0, and how many day columns are in use
+        self.first_day = None
+        self.last_day = None
+        self._span = 0
+        # witch × day × status counts and witch × day flagged amounts, grown by doubling
+        self._counts = np.zeros((0, 0, len(STATUSES)), dtype=np.int32)
+        self._amounts = np.zeros((0, 0))
+        # Cumulative sums over the day axis (with a leading zero column), built on demand
+        self._prefix = None
+    
+    def courier_code(self, courier_id: str) -> int:
+        code = self._codes.get(courier_id)
+        if code is None:
+            code = self._codes[courier_id] = len(self.courier_ids)
+            self.courier_ids.append(courier_id)
+        return code
+    
+    def clear(self):
+        """Forget every ticket (interned couriers and storage are kept)"""
+        self._counts[:] = 0
+        self._amounts[:] = 0
+        self.first_day = self.last_day = None
+        self._span = 0
+        self._prefix = None
+    
+    def add(self, couriers: np.ndarray, days: np.ndarray, status: np.ndarray, differences: np.ndarray,
+            sign: int = 1):
+        """Count tickets (courier codes, epoch days, status codes, differences) in, or out with sign=-1"""
+        if len(couriers) == 0:
+            return
+        days = np.asarray(days, dtype=np.int64)
+        self._reserve(len(self.courier_ids), int(days.min()), int(days.max()))
+        
+        couriers = np.asarray(couriers, dtype=np.int64)
+        columns = days - self.first_day
+        flagged = status != VALID
+        if len(couriers) * BINCOUNT_RATIO >= self._amounts.size:
+            # Big batches (a full analysis): one bincount over all cells beats scattered adds
+            cells = couriers * self._amounts.shape[1] + columns
+            self._counts.reshape(-1)[:] += (sign * np.bincount(cells * len(STATUSES) + status,
+                                                               minlength=self._counts.size)).astype(np.int32)
+            self._amounts.reshape(-1)[:] += sign * np.bincount(cells[flagged], weights=np.abs(differences[flagged]),
+                                                               minlength=self._amounts.size)
+        else:
+            np.add.at(self._counts, (couriers, columns, status), sign)
+            np.add.at(self._amounts, (couriers[flagged], columns[flagged]), sign * np.abs(differences[flagged]))
+        
+        if sign < 0:
+            # Cells left without flagged tickets hold exactly nothing (no rounding residue)
+            cells = (couriers[flagged], columns[flagged])
+            cleared = (self._counts[cells + (SUSPICIOUS,)] + self._counts[cells + (FRAUDULENT,)]) == 0
+            self._amounts[cells[0][cleared], cells[1][cleared]] = 0
+        self._prefix = None
+    
+    def _reserve(self, couriers: int, low_day: int, high_day: int):
+        """Make room for `couriers` rows and the day range [low_day, high_day]"""
+        if self.first_day is None:
+            self.first_day = self.last_day = low_day
+        first_day = min(self.first_day, low_day)
+        self.last_day = max(self.last_day, high_day)
+        span = self.last_day - first_day + 1
+        shift = self.first_day - first_day
+        
+        rows, columns = self._counts.shape[:2]
+        if couriers > rows or span > columns or shift:
+            new_rows = max(couriers, 2 * rows if couriers > rows else rows, 8)
+            new_columns = max(span, 2 * columns if span > columns else columns, 32)
+            counts = np.zeros((new_rows, new_columns, len(STATUSES)), dtype=np.int32)
+            amounts = np.zeros((new_rows, new_columns))
+            counts[:rows, shift:shift + self._span] = self._counts[:, :self._span]
+            amounts[:rows, shift:shift + self._span] = self._amounts[:, :self._span]
+            self._counts, self._amounts = counts, amounts
+        
+        self.first_day = first_day
+        self._span = span
+    
+    def scores(self, window_days: int = None, as_of: int = None) -> List[Dict]:
+        """
+        Witch records, least trustworthy first.
+        
+        Without a window: every ticket counted so far. With one: only the
+        tickets of the `window_days` days ending on `as_of` (an epoch day,
+        by default the latest ticket day), and only witches active in them.
+        """
+        if self.first_day is None:
+            return []
+        if self._prefix is None:
+            self._prefix = self._build_prefix()
+        counts, amounts = self._prefix
+        
+        as_of = self.last_day if as_of is None else as_of
+        high = min(max(as_of - self.first_day + 1, 0), self._span)
+        low = 0 if window_days is None else min(max(as_of - window_days + 1 - self.first_day, 0), high)
+        witches = len(self.courier_ids)
+        return score_records(self.courier_ids, counts[:witches, high] - counts[:witches, low],
+                             amounts[:witches, high] - amounts[:witches, low])
+    
+    def decayed_scores(self, half_life_days: float = TRUST_HALF_LIFE_DAYS, as_of: int = None) -> List[Dict]:
+        """
+        Witch records from time-decayed counts, least trustworthy first.
+        
+        A ticket `age` days older than `as_of` counts 0.5 ** (age / half_life_days)
+        of a ticket; later tickets don't count. Counts and scores are
+        therefore fractional (rounded to 2 and 1 decimals).
+        """
+        if self.first_day is None:
+            return []
+        as_of = self.last_day if as_of is None else as_of
+        ages = as_of - np.arange(self.first_day, self.first_day + self._span)
+        weights = np.where(ages >= 0, 0.5 ** (np.maximum(ages, 0) / half_life_days), 0.0)
+        
+        witches = len(self.courier_ids)
+        counts = np.tensordot(self._counts[:witches, :self._span], weights, axes=([1], [0]))
+        amounts = self._amounts[:witches, :self._span] @ weights
+        return score_records(self.courier_ids, counts, amounts, decimals=2)
+    
+    def _build_prefix(self) -> tuple:
+        witches = len(self.courier_ids)
+        counts = np.zeros((witches, self._span + 1, len(STATUSES)), dtype=np.int64)
+        np.cumsum(self._counts[:witches, :self._span], axis=1, out=counts[:, 1:])
+        amounts = np.zeros((witches, self._span + 1))
+        np.cumsum(self._amounts[:witches, :self._span], axis=1, out=amounts[:, 1:])
+        return counts, amounts
+
+def score_records(courier_ids: List[str], counts: np.ndarray, amounts: np.ndarray,
+                  decimals: int = None) -> List[Dict]:
+    """
+    Witch records from per-witch (valid, suspicious, fraudulent) counts and flagged amounts.
+    
+    Integer counts give the classic records (integer trust score, 0 fraud
+    amount when nothing was flagged); with `decimals` the counts are
+    weights and are rounded, the trust score to one decimal less.
+    """
+    witch_list = []
+    for witch_id, (valid, suspicious, fraudulent), amount in zip(courier_ids, counts.tolist(), amounts.tolist()):
+        total = valid + suspicious + fraudulent
+        if total <= 0:
+            continue
+        penalty = suspicious * SUSPICIOUS_PENALTY + fraudulent * FRAUDULENT_PENALTY
+        if decimals is None:
+            trust_score = max(0, 100 - penalty)
+            fraud_amount = amount if suspicious + fraudulent > 0 else 0
+        else:
+            trust_score = round(max(0.0, 100 - penalty), decimals - 1)
+            fraud_amount = round(amount, decimals)
+        witch_list.append({
+            'courier_id': witch_id,
+            'trust_score': trust_score,
+            'total_tickets': total if decimals is None else round(total, decimals),
+            'valid_tickets': valid if decimals is None else round(valid, decimals),
+            'suspicious_tickets': suspicious if decimals is None else round(suspicious, decimals),
+            'fraudulent_tickets': fraudulent if decimals is None else round(fraudulent, decimals),
+            'total_fraud_amount': fraud_amount,
+            'accuracy_percent': valid / total * 100
+        })
+    
+    witch_list.sort(key=lambda x: x['trust_score'])
+    return witch_list
@@ -0,0 +1,159 @@
+"""
+🔮 UPSTREAM CLIENT - CONCURRENT, POOLED FETCHES FROM THE HACKUTD API
+History is split into time windows fetched in parallel over one pooled session
+"""
+
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from ingest import ColumnBuilder, iter_json_array, read_samples, concat_builders, STREAM_CHUNK_BYTES
+from data_processor import to_epoch_minute
+from metrics import metrics, WaitClock
+
+# Largest end_date the API accepts (same bound the original single request used)
+END_OF_TIME = 2000000000
+
+SECONDS_PER_HOUR = 3600
+
+# A probe only needs the first sample of its response
+PROBE_CHUNK_BYTES = 1024
+
+class UpstreamClient:
+    """
+    Fetches /api/Data and /api/Tickets concurrently.
+    
+    The first and last sample from start_date onwards are probed, and the
+    span between them is cut into `max_windows` equal windows (none
+    narrower than `window_seconds`); the first window reaches back to
+    start_date and the last one on to END_OF_TIME. Windows are streamed
+    in parallel (tickets alongside them) over a pooled requests.Session,
+    each window is retried on its own, and the results are reassembled in
+    time order.
+    """
+    
+    def __init__(self, base_url: str, window_seconds: int = SECONDS_PER_HOUR, max_windows: int = 64,
+                 max_workers: int = 8, retries: int = 3, backoff_seconds: float = 0.5, timeout_seconds: float = 120):
+        self.base_url = base_url
+        self.window_seconds = window_seconds
+        self.max_windows = max_windows
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        
+        # One keep-alive connection per worker thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def windows(self, start_date: int) -> List[tuple]:
+        """Inclusive (start, end) epoch-second windows covering [start_date, END_OF_TIME]"""
+        first = self._with_retries(self.probe, start_date)
+        if first is None:
+            return [(start_date, END_OF_TIME)]
+        
+        span = self._last_sample_time(first) - first + 1
+        count = max(1, min(self.max_windows, span // self.window_seconds))
+        bounds = [first + span * i // count for i in range(count + 1)]
+        bounds[0] = start_date
+        bounds[-1] = END_OF_TIME + 1
+        return [(start, end - 1) for start, end in zip(bounds[:-1], bounds[1:])]
+    
+    def probe(self, start: int) -> Optional[int]:
+        """Epoch second of the first sample at or after start (None if there is none), reading only that sample"""
+        url = f"{self.base_url}/api/Data/?start_date={start}&end_date={END_OF_TIME}"
+        metrics.inc('upstream_requests_total', endpoint='probe')
+        with self.session.get(url, stream=True, timeout=self.timeout_seconds) as response:
+            response.raise_for_status()
+            for sample in iter_json_array(response.iter_content(chunk_size=PROBE_CHUNK_BYTES)):
+                return max(start, to_epoch_minute(sample['timestamp']) * 60)
+        return None
+    
+    def _last_sample_time(self, first: int) -> int:
+        """
+        Epoch second of the last sample, to within window_seconds.
+        
+        A step from the latest known sample doubles until nothing follows,
+        then the gap is bisected; each probe is one short request.
+        """
+        known, step = first, self.window_seconds
+        while True:
+            found = self._with_retries(self.probe, known + step)
+            if found is None:
+                break
+            known, step = found, 2 * step
+        
+        # Nothing at or after `beyond`, so every probe in between lands below it
+        beyond = known + step
+        while beyond - known > self.window_seconds:
+            middle = (known + beyond) // 2
+            found = self._with_retries(self.probe, middle)
+            if found is None:
+                beyond = middle
+            else:
+                known = found
+        return known
+    
+    def fetch(self, start_date: int = 0, cauldron_ids: List[str] = None) -> Dict:
+        """
+        Samples from start_date onwards plus all tickets.
+        
+        Returns {'history': ColumnBuilder, 'tickets': [...]}; raises if any
+        window still fails after its retries.
+        """
+        with metrics.stage('fetch'), ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            tickets_future = pool.submit(self._with_retries, self.fetch_tickets)
+            windows = self.windows(start_date)
+            window_futures = [
+                pool.submit(self._with_retries, self.fetch_window, start, end, cauldron_ids)
+                for start, end in windows
+            ]
+            builders = [future.result() for future in window_futures]
+            tickets = tickets_future.result()
+        
+        history = concat_builders(builders)
+        metrics.inc('samples_processed_total', len(history))
+        return {
+            'history': history,
+            'tickets': tickets
+        }
+    
+    def fetch_window(self, start: int, end: int, cauldron_ids: List[str] = None) -> ColumnBuilder:
+        """
+        Stream one inclusive [start, end] window of /api/Data into columns.
+        
+        Parsing is interleaved with the download; the 'parse' stage is the
+        time spent in the parse loop minus the time spent waiting for chunks.
+        """
+        url = f"{self.base_url}/api/Data/?start_date={start}&end_date={end}"
+        metrics.inc('upstream_requests_total', endpoint='data')
+        with self.session.get(url, stream=True, timeout=self.timeout_seconds) as response:
+            response.raise_for_status()
+            chunks = WaitClock(response.iter_content(chunk_size=STREAM_CHUNK_BYTES))
+            started = time.perf_counter()
+            builder = read_samples(chunks, cauldron_ids)
+            metrics.record_stage('parse', time.perf_counter() - started - chunks.seconds)
+            return builder
+    
+    def fetch_tickets(self) -> List[Dict]:
+        metrics.inc('upstream_requests_total', endpoint='tickets')
+        response = self.session.get(f"{self.base_url}/api/Tickets", timeout=self.timeout_seconds)
+        response.raise_for_status()
+        with metrics.stage('parse_tickets'):
+            return response.json()['transport_tickets']
+    
+    def _with_retries(self, fetch, *args):
+        """Call fetch(*args), retrying with exponential backoff on network or parse errors"""
+        for attempt in range(self.retries + 1):
+            try:
+                return fetch(*args)
+            except (requests.RequestException, ValueError) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt)
+                metrics.inc('upstream_retries_total')
+                print(f"⚠️  {fetch.__name__}{args[:2]} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
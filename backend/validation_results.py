@@ -0,0 +1,196 @@
+"""
+🔮 VALIDATION RESULTS - ONE STRUCTURED ARRAY FOR ALL VALIDATED TICKETS
+About 100 bytes per ticket; dicts are only built at the JSON boundary
+"""
+
+import numpy as np
+from typing import Dict, List
+from data_processor import from_epoch_minute
+
+# Status codes double as the severity sort order
+STATUSES = ('valid', 'suspicious', 'fraudulent')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+VALID, SUSPICIOUS, FRAUDULENT = range(len(STATUSES))
+
+# One row per validated ticket. Ids and dates stay in the ticket dicts the
+# rows point at; drain_events == 0 means no drain was matched, and
+# matched_end_minute == 0 that the ticket was not paired with a drain event.
+RESULT_DTYPE = np.dtype([
+    ('status', np.uint8),
+    ('tickets_this_day', np.int32),
+    ('drain_events', np.int32),
+    ('reported_amount', np.float64),
+    ('expected_amount', np.float64),
+    ('difference', np.float64),
+    ('percent_error', np.float64),
+    ('fill_rate_used', np.float64),
+    ('drain_start_minute', np.int32),
+    ('drain_end_minute', np.int32),
+    ('drain_duration_minutes', np.float64),
+    ('visible_drain', np.float64),
+    ('total_expected', np.float64),
+    ('matched_start_minute', np.int32),
+    ('matched_end_minute', np.int32),
+    ('itinerary_conflict', np.uint8)
+])
+
+# Keys of a materialized result dict
+RESULT_FIELDS = ('ticket_id', 'cauldron_id', 'courier_id', 'date', 'reported_amount', 'expected_amount',
+                 'difference', 'percent_error', 'status', 'matched_drain', 'matched_event', 'itinerary_conflict',
+                 'reason', 'fill_rate_used', 'tickets_this_day')
+
+# Materialized in chunks when iterating, so a full pass never holds every dict at once
+ITER_CHUNK = 4096
+
+class ValidationResults:
+    """
+    Validated tickets as rows of RESULT_DTYPE, plus the ticket dicts they belong to.
+    
+    Behaves like the list of result dicts it replaces (len, indexing,
+    iteration and JSON encoding build the dicts on the fly), while counts,
+    filters and sorts work on the columns directly. `positions` maps rows
+    to tickets for subsets; without it row i is ticket i. Never modified
+    once built, so a published snapshot can share it freely.
+    """
+    
+    def __init__(self, rows: np.ndarray, tickets: List[Dict], positions: np.ndarray = None):
+        self.rows = rows
+        # The detector's ticket list: append-only, so it can be shared with later snapshots
+        self.tickets = tickets
+        self.positions = positions
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.records(np.arange(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('result index out of range')
+        return self.records([index])[0]
+    
+    def __iter__(self):
+        for start in range(0, len(self), ITER_CHUNK):
+            yield from self.records(np.arange(start, min(start + ITER_CHUNK, len(self))))
+    
+    @property
+    def status(self) -> np.ndarray:
+        return self.rows['status']
+    
+    def ticket_positions(self) -> np.ndarray:
+        """Index into `tickets` of every row"""
+        return np.arange(len(self)) if self.positions is None else self.positions
+    
+    def source_tickets(self) -> List[Dict]:
+        """The ticket dict behind every row"""
+        if self.positions is None:
+            return self.tickets[:len(self)]
+        return [self.tickets[position] for position in self.positions.tolist()]
+    
+    def records(self, indices=None) -> List[Dict]:
+        """Result dicts for the given rows (all rows by default)"""
+        if indices is None:
+            indices = np.arange(len(self))
+        indices = np.asarray(indices, dtype=np.int64)
+        positions = indices if self.positions is None else self.positions[indices]
+        return [result_record(values, self.tickets[position])
+                for values, position in zip(self.rows[indices].tolist(), positions.tolist())]
+    
+    def subset(self, indices) -> 'ValidationResults':
+        """The given rows, in the given order"""
+        indices = np.asarray(indices, dtype=np.int64)
+        return ValidationResults(self.rows[indices], self.tickets, self.ticket_positions()[indices])
+    
+    def flagged(self) -> 'ValidationResults':
+        """Suspicious rows, then fraudulent ones"""
+        return self.subset(np.concatenate((np.flatnonzero(self.status == SUSPICIOUS),
+                                           np.flatnonzero(self.status == FRAUDULENT))))
+    
+    def status_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.status, minlength=len(STATUSES))
+        return {status: int(counts[code]) for code, status in enumerate(STATUSES)}
+    
+    def to_json(self) -> List[Dict]:
+        """What encoded_response.dumps() serializes in place of this object"""
+        return self.records()
+
+def result_record(values: tuple, ticket: Dict) -> Dict:
+    """One result dict from a row (as a tuple in RESULT_DTYPE order) and its ticket"""
+    (status, tickets_this_day, drain_events, _, expected_amount, difference, percent_error, fill_rate,
+     start_minute, end_minute, duration, visible_drain, total_expected, matched_start, matched_end,
+     itinerary_conflict) = values
+    reported_amount = ticket['amount_collected']
+    
+    if drain_events == 0:
+        # No drain matched: the amounts come straight from the report
+        if status == VALID:
+            expected_amount, difference, percent_error = reported_amount, 0, 0
+        else:
+            expected_amount = 100
+            difference = reported_amount - 100
+            percent_error = (reported_amount - 100) / 100 * 100
+        matched_drain = None
+    else:
+        matched_drain = {
+            'start_time': from_epoch_minute(start_minute).isoformat(),
+            'end_time': from_epoch_minute(end_minute).isoformat(),
+            'duration_minutes': duration,
+            'visible_drain': visible_drain,
+            'total_expected': total_expected,
+            'drain_events': drain_events
+        }
+        if expected_amount <= 0:
+            percent_error = 100
+    
+    matched_event = None
+    if matched_end:
+        matched_event = {
+            'start_time': from_epoch_minute(matched_start).isoformat(),
+            'end_time': from_epoch_minute(matched_end).isoformat()
+        }
+    
+    return {
+        'ticket_id': ticket['ticket_id'],
+        'cauldron_id': ticket['cauldron_id'],
+        'courier_id': ticket['courier_id'],
+        'date': ticket['date'],
+        'reported_amount': reported_amount,
+        'expected_amount': expected_amount,
+        'difference': difference,
+        'percent_error': percent_error,
+        'status': STATUSES[status],
+        'matched_drain': matched_drain,
+        'matched_event': matched_event,
+        'itinerary_conflict': bool(itinerary_conflict),
+        'reason': result_reason(status, drain_events, reported_amount, difference, percent_error,
+                                tickets_this_day, itinerary_conflict),
+        'fill_rate_used': fill_rate,
+        'tickets_this_day': tickets_this_day
+    }
+
+def result_reason(status: int, drain_events: int, reported_amount: float, difference: float,
+                  percent_error: float, tickets_this_day: int, itinerary_conflict: int = 0) -> str:
+    """The human-readable explanation of a result (built only when a dict is materialized)"""
+    if drain_events == 0:
+        if status == VALID:
+            return 'No significant drain detected, amount reasonable'
+        return f'Exceeds capacity ({reported_amount:.1f} > 100)'
+    
+    if itinerary_conflict and percent_error < 10:
+        reason = (f'Impossible itinerary: amount matches (±{percent_error:.1f}%) but the witch '
+                  f'could not reach this drain in time')
+    elif status == VALID:
+        reason = f'Matches expected share (±{percent_error:.1f}%)'
+    else:
+        prefix = 'FRAUD: ' if status == FRAUDULENT else ''
+        if difference > 0:
+            reason = f'{prefix}Over-reported by {difference:.2f} units (+{percent_error:.1f}%)'
+        else:
+            reason = f'{prefix}Under-reported by {abs(difference):.2f} units (-{percent_error:.1f}%)'
+    if itinerary_conflict and percent_error >= 10:
+        reason += ' [impossible itinerary]'
+    if tickets_this_day > 1:
+        reason += f' [{tickets_this_day} witches this day]'
+    return reason
@@ -1,20 +1,58 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import Dashboard from './components/Dashboard';
+import { API_URL, STREAM_URL } from './config';
 import './App.css';
 
-const API_URL = 'http://localhost:5000';
+const POLL_INTERVAL_MS = 2000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// 503 means the backend is still computing its first analysis
+const acceptPending = { validateStatus: (status) => status === 200 || status === 503 };
+
+// Ticket lists are paged by TicketTable, so the dashboard only needs these
+const ANALYSIS_FIELDS = 'summary,witch_trust_scores,cauldron_fill_rates,background';
+const ANALYSIS_URL = `${API_URL}/api/analysis?fields=${ANALYSIS_FIELDS}`;
 
 function App() {
   const [analysisData, setAnalysisData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [autoRefresh, setAutoRefresh] = useState(false);
+  const [lastUpdated, setLastUpdated] = useState(null);
 
   useEffect(() => {
     fetchAnalysis();
   }, []);
 
+  // Live deltas: patch the summary and witch scores in place, re-page the ticket tables
+  useEffect(() => {
+    const source = new EventSource(STREAM_URL);
+
+    source.addEventListener('summary', (event) => {
+      const summary = JSON.parse(event.data);
+      setAnalysisData((current) => (current ? { ...current, summary } : current));
+    });
+
+    source.addEventListener('witches', (event) => {
+      const { witches } = JSON.parse(event.data);
+      setAnalysisData((current) => {
+        if (!current) return current;
+        const byId = new Map(current.witch_trust_scores.map((witch) => [witch.courier_id, witch]));
+        witches.forEach((witch) => byId.set(witch.courier_id, witch));
+        const witchScores = [...byId.values()].sort((a, b) => a.trust_score - b.trust_score);
+        return { ...current, witch_trust_scores: witchScores };
+      });
+    });
+
+    const ticketsChanged = () => setLastUpdated(Date.now());
+    source.addEventListener('tickets', ticketsChanged);
+    source.addEventListener('status', ticketsChanged);
+
+    return () => source.close();
+  }, []);
+
   // Auto-refresh every 30 seconds if enabled
   useEffect(() => {
     if (autoRefresh) {
@@ -27,14 +65,21 @@ function App() {
     }
   }, [autoRefresh]);
 
-  const fetchAnalysis = async () => {
-    setLoading(true);
+  const fetchAnalysis = async ({ showLoading = true } = {}) => {
+    if (showLoading) {
+      setLoading(true);
+    }
     setError(null);
     
     try {
       console.log('🔮 Fetching fraud analysis...');
-      const response = await axios.get(`${API_URL}/api/analysis`);
+      let response = await axios.get(ANALYSIS_URL, acceptPending);
+      while (response.status === 503) {
+        await sleep(POLL_INTERVAL_MS);
+        response = await axios.get(ANALYSIS_URL, acceptPending);
+      }
       setAnalysisData(response.data);
+      setLastUpdated(Date.now());
       console.log('✅ Analysis loaded successfully!');
     } catch (err) {
       console.error('❌ Error fetching analysis:', err);
@@ -46,8 +91,17 @@ function App() {
 
   const refreshData = async () => {
     try {
-      await axios.post(`${API_URL}/api/refresh`);
-      fetchAnalysis();
+      // The refresh runs in the background; keep showing the current data until its job is done
+      const { data: job } = await axios.post(`${API_URL}/api/refresh`);
+      let status = job;
+      while (status.status !== 'done' && status.status !== 'failed') {
+        await sleep(POLL_INTERVAL_MS);
+        status = (await axios.get(`${API_URL}${job.status_url}`)).data;
+      }
+      if (status.status === 'failed') {
+        console.error('Refresh failed:', status.error);
+      }
+      fetchAnalysis({ showLoading: false });
     } catch (err) {
       console.error('Error refreshing data:', err);
     }
@@ -97,6 +151,7 @@ function App() {
     <div className="app-container">
       <Dashboard 
         data={analysisData} 
+        lastUpdated={lastUpdated}
         onRefresh={refreshData}
         autoRefresh={autoRefresh}
         onToggleAutoRefresh={toggleAutoRefresh}
@@ -5,10 +5,10 @@ import WitchScores from './WitchScores';
 import FactoryMap from './FactoryMap';
 import './Dashboard.css';
 
-function Dashboard({ data, onRefresh, autoRefresh, onToggleAutoRefresh }) {
+function Dashboard({ data, lastUpdated, onRefresh, autoRefresh, onToggleAutoRefresh }) {
   const [activeTab, setActiveTab] = useState('overview');
 
-  const { summary, tickets, witch_trust_scores, background } = data;
+  const { summary, witch_trust_scores, background } = data;
 
   return (
     <div className="dashboard">
@@ -72,7 +72,9 @@ function Dashboard({ data, onRefresh, autoRefresh, onToggleAutoRefresh }) {
               <div className="overview-card">
                 <h3>🚨 Recent Suspicious Activity</h3>
                 <TicketTable 
-                  tickets={tickets.filter(t => t.status !== 'valid').slice(0, 5)} 
+                  baseParams={{ status: 'suspicious,fraudulent' }}
+                  pageSize={5}
+                  refreshKey={lastUpdated}
                   compact 
                 />
               </div>
@@ -81,7 +83,7 @@ function Dashboard({ data, onRefresh, autoRefresh, onToggleAutoRefresh }) {
         )}
 
         {activeTab === 'tickets' && (
-          <TicketTable tickets={tickets} />
+          <TicketTable refreshKey={lastUpdated} />
         )}
 
         {activeTab === 'witches' && (
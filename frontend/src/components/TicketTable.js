@@ -1,26 +1,94 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
+import axios from 'axios';
+import { API_URL } from '../config';
 import './TicketTable.css';
 
-function TicketTable({ tickets, compact = false }) {
+// Only the columns the table shows are requested from the server
+const TICKET_FIELDS = 'ticket_id,cauldron_id,courier_id,date,reported_amount,expected_amount,difference,status';
+const SEARCH_DEBOUNCE_MS = 300;
+
+const COLUMNS = [
+  { field: 'ticket_id', label: 'Ticket ID' },
+  { field: 'cauldron_id', label: 'Cauldron' },
+  { field: 'courier_id', label: 'Witch' },
+  { field: 'date', label: 'Date' },
+  { field: 'reported_amount', label: 'Reported' },
+  { field: 'expected_amount', label: 'Expected' },
+  { field: 'difference', label: 'Diff' },
+  { field: 'status', label: 'Status' }
+];
+
+function TicketTable({ endpoint = '/api/tickets', baseParams = {}, pageSize = 25, refreshKey, compact = false }) {
   const [filter, setFilter] = useState('all');
   const [searchTerm, setSearchTerm] = useState('');
+  const [search, setSearch] = useState('');
+  const [dateFrom, setDateFrom] = useState('');
+  const [dateTo, setDateTo] = useState('');
+  const [sort, setSort] = useState(null);
+  const [page, setPage] = useState(1);
+  const [result, setResult] = useState(null);
+  const [error, setError] = useState(null);
 
-  // Filter tickets
-  let filteredTickets = tickets;
-  
-  if (filter !== 'all') {
-    filteredTickets = tickets.filter(ticket => ticket.status === filter);
-  }
-  
-  if (searchTerm) {
-    filteredTickets = filteredTickets.filter(ticket => 
-      ticket.ticket_id.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      ticket.cauldron_id.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      ticket.courier_id.toLowerCase().includes(searchTerm.toLowerCase())
-    );
-  }
+  const baseParamsKey = JSON.stringify(baseParams);
+
+  // Wait for typing to pause before searching
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      setSearch(searchTerm);
+      setPage(1);
+    }, SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  // Fetch one page whenever the query (or the analysis behind it) changes
+  useEffect(() => {
+    let cancelled = false;
+    const params = { ...JSON.parse(baseParamsKey), fields: TICKET_FIELDS, page, page_size: pageSize };
+    if (filter !== 'all') params.status = filter;
+    if (search) params.q = search;
+    if (dateFrom) params.date_from = dateFrom;
+    if (dateTo) params.date_to = dateTo;
+    if (sort) params.sort = sort;
+
+    axios.get(`${API_URL}${endpoint}`, { params })
+      .then((response) => {
+        if (!cancelled) {
+          setResult(response.data);
+          setError(null);
+        }
+      })
+      .catch((err) => {
+        if (!cancelled) {
+          console.error('❌ Error fetching tickets:', err);
+          setError('Failed to load tickets');
+        }
+      });
+
+    return () => { cancelled = true; };
+  }, [endpoint, baseParamsKey, filter, search, dateFrom, dateTo, sort, page, pageSize, refreshKey]);
+
+  const changeFilter = (value) => {
+    setFilter(value);
+    setPage(1);
+  };
 
-  const displayTickets = compact ? filteredTickets.slice(0, 5) : filteredTickets;
+  // Click a header to sort ascending, again for descending, a third time to reset
+  const toggleSort = (field) => {
+    if (sort === field) {
+      setSort(`-${field}`);
+    } else if (sort === `-${field}`) {
+      setSort(null);
+    } else {
+      setSort(field);
+    }
+    setPage(1);
+  };
+
+  const sortIndicator = (field) => {
+    if (sort === field) return ' ▲';
+    if (sort === `-${field}`) return ' ▼';
+    return '';
+  };
 
   const getStatusBadge = (status) => {
     const badges = {
@@ -36,37 +104,60 @@ function TicketTable({ tickets, compact = false }) {
     );
   };
 
+  const tickets = result ? result.tickets : [];
+  const counts = result ? result.status_counts : { valid: 0, suspicious: 0, fraudulent: 0 };
+  const allCount = counts.valid + counts.suspicious + counts.fraudulent;
+  const pages = result ? Math.max(result.pages, 1) : 1;
+
   return (
     <div className={`ticket-table-container ${compact ? 'compact' : ''}`}>
       {!compact && (
         <div className="table-controls">
           <div className="filter-buttons">
-            <button 
-              className={filter === 'all' ? 'active' : ''} 
-              onClick={() => setFilter('all')}
+            <button
+              className={filter === 'all' ? 'active' : ''}
+              onClick={() => changeFilter('all')}
             >
-              All ({tickets.length})
+              All ({allCount})
             </button>
-            <button 
-              className={filter === 'valid' ? 'active' : ''} 
-              onClick={() => setFilter('valid')}
+            <button
+              className={filter === 'valid' ? 'active' : ''}
+              onClick={() => changeFilter('valid')}
             >
-              ✅ Valid ({tickets.filter(t => t.status === 'valid').length})
+              ✅ Valid ({counts.valid})
             </button>
-            <button 
-              className={filter === 'suspicious' ? 'active' : ''} 
-              onClick={() => setFilter('suspicious')}
+            <button
+              className={filter === 'suspicious' ? 'active' : ''}
+              onClick={() => changeFilter('suspicious')}
             >
-              🟡 Suspicious ({tickets.filter(t => t.status === 'suspicious').length})
+              🟡 Suspicious ({counts.suspicious})
             </button>
-            <button 
-              className={filter === 'fraudulent' ? 'active' : ''} 
-              onClick={() => setFilter('fraudulent')}
+            <button
+              className={filter === 'fraudulent' ? 'active' : ''}
+              onClick={() => changeFilter('fraudulent')}
             >
-              🚨 Fraudulent ({tickets.filter(t => t.status === 'fraudulent').length})
+              🚨 Fraudulent ({counts.fraudulent})
             </button>
           </div>
-          
+
+          <div className="date-range">
+            <input
+              type="date"
+              value={dateFrom}
+              onChange={(e) => { setDateFrom(e.target.value); setPage(1); }}
+              className="date-input"
+              title="From date"
+            />
+            <span>→</span>
+            <input
+              type="date"
+              value={dateTo}
+              onChange={(e) => { setDateTo(e.target.value); setPage(1); }}
+              className="date-input"
+              title="To date"
+            />
+          </div>
+
           <input
             type="text"
             placeholder="🔍 Search tickets..."
@@ -77,22 +168,25 @@ function TicketTable({ tickets, compact = false }) {
         </div>
       )}
 
+      {error && <p className="table-error">{error}</p>}
+
       <div className="table-wrapper">
         <table className="ticket-table">
           <thead>
             <tr>
-              <th>Ticket ID</th>
-              <th>Cauldron</th>
-              <th>Witch</th>
-              <th>Date</th>
-              <th>Reported</th>
-              <th>Expected</th>
-              <th>Diff</th>
-              <th>Status</th>
+              {COLUMNS.map(({ field, label }) => (
+                <th
+                  key={field}
+                  className={compact ? '' : 'sortable'}
+                  onClick={compact ? undefined : () => toggleSort(field)}
+                >
+                  {label}{sortIndicator(field)}
+                </th>
+              ))}
             </tr>
           </thead>
           <tbody>
-            {displayTickets.map((ticket) => (
+            {tickets.map((ticket) => (
               <tr key={ticket.ticket_id} className={`row-${ticket.status}`}>
                 <td className="ticket-id">{ticket.ticket_id}</td>
                 <td>{ticket.cauldron_id.replace('cauldron_', 'C')}</td>
@@ -112,7 +206,14 @@ function TicketTable({ tickets, compact = false }) {
 
       {!compact && (
         <div className="table-footer">
-          <p>Showing {displayTickets.length} of {tickets.length} tickets</p>
+          <div className="pagination">
+            <button onClick={() => setPage(1)} disabled={page <= 1}>⏮</button>
+            <button onClick={() => setPage(page - 1)} disabled={page <= 1}>◀</button>
+            <span>Page {page} of {pages}</span>
+            <button onClick={() => setPage(page + 1)} disabled={page >= pages}>▶</button>
+            <button onClick={() => setPage(pages)} disabled={page >= pages}>⏭</button>
+          </div>
+          <p>Showing {tickets.length} of {result ? result.total : 0} tickets</p>
         </div>
       )}
     </div>
@@ -0,0 +1,4 @@
+export const API_URL = 'http://localhost:5000';
+
+// Server-sent events with live analysis deltas
+export const STREAM_URL = 'http://localhost:5001/api/stream';